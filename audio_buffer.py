@@ -1,9 +1,53 @@
 import numpy as np
 import torch
 
+
+def _reserve(storage: np.ndarray, start: int, end: int, n: int) -> tuple[np.ndarray, int, int]:
+    """Makes room for `n` more items after storage[start:end]. Returns the (possibly new) storage, start and end."""
+    size = end - start
+    if end + n <= storage.shape[0]:
+        return storage, start, end
+
+    # Compact in place when the dead head is at least as large as the live
+    # data (so each item is moved O(1) times overall), otherwise grow.
+    capacity = storage.shape[0]
+    if size + n <= capacity and start >= size:
+        storage[:size] = storage[start:end]
+    else:
+        capacity = max(capacity, 1)
+        while capacity < size + n:
+            capacity *= 2
+        grown = np.empty((capacity,) + storage.shape[1:], dtype=storage.dtype)
+        grown[:size] = storage[start:end]
+        storage = grown
+
+    return storage, 0, size
+
+
 class AudioBuffer:
-    
-    def __init__(self):
+    """
+    Growable float32 arena holding the live audio window.
+
+    |--------|======================|-----------|
+    ^storage ^start                 ^end        ^capacity
+
+    Appends write at `end` and only move data when the arena runs out of room,
+    so `submit` is amortized O(1) in the buffer length. `as_nparray` returns a
+    contiguous view into the arena; it stays valid until the next `submit`,
+    which may compact or reallocate the storage. Copy it if you need to keep it.
+
+    Submits that pass `speech_prob` also append to a VAD timeline: one VAD
+    probability and one energy (mean square) per `samples_per_chunk` chunk,
+    kept in an arena of the same kind and trimmed with the audio. Chunk i of the
+    timeline starts at sample `i * samples_per_chunk - chunk_offset` of the
+    buffer; `chunk_offset` is the part of the first chunk already trimmed.
+    Either every submit passes `speech_prob` with exactly one chunk of audio
+    or none does.
+    """
+
+    def __init__(self, initial_capacity: int = 16000 * 30, samples_per_chunk: int = 512):
+        self.initial_capacity = initial_capacity
+        self.samples_per_chunk = samples_per_chunk
         self.reset()
 
     def register_pointer(self, name: str, position: int):
@@ -13,32 +57,94 @@ class AudioBuffer:
         return self.pointers[name]
 
     def is_valid_pointer(self, name: str):
-        return 0 <= self.pointers[name] < len(self.buffer)
+        return 0 <= self.pointers[name] < self.n_samples()
+
+    def chunk_at(self, position: int) -> int:
+        """Index of the timeline chunk holding sample `position` of the buffer (e.g. a pointer)."""
+        return (position + self.chunk_offset) // self.samples_per_chunk
+
+    def chunk_start(self, chunk: int) -> int:
+        """Buffer sample where timeline chunk `chunk` starts; negative for a partly trimmed first chunk."""
+        return chunk * self.samples_per_chunk - self.chunk_offset
 
-    def submit(self, audio: np.ndarray):
-        self.buffer = np.concatenate([self.buffer, audio])
+    def submit(self, audio: np.ndarray, speech_prob: float | None = None):
+        n = audio.shape[0]
+        self._storage, self._start, self._end = _reserve(self._storage, self._start, self._end, n)
+        self._storage[self._end:self._end + n] = audio
+        self._end += n
+
+        if speech_prob is not None:
+            self._timeline, self._t_start, self._t_end = _reserve(self._timeline, self._t_start, self._t_end, 1)
+            self._timeline[self._t_end] = (speech_prob, np.dot(audio, audio) / n)
+            self._t_end += 1
 
     def trim_tail(self, n_samples: int):
-        self.buffer = self.buffer[:-n_samples]
+        self._end = max(self._start, self._end - n_samples)
+        n_chunks = -(-(self.n_samples() + self.chunk_offset) // self.samples_per_chunk)
+        self._t_end = min(self._t_end, self._t_start + n_chunks)
+        if self._t_end == self._t_start:
+            self.chunk_offset = 0
 
     def trim_head(self, n_samples: int):
-        self.buffer = self.buffer[n_samples:]
+        n_samples = min(n_samples, self.n_samples())
+        self._start += n_samples
 
         for name, position in self.pointers.items():
             self.pointers[name] = position - n_samples
 
+        chunks, self.chunk_offset = divmod(self.chunk_offset + n_samples, self.samples_per_chunk)
+        self._t_start = min(self._t_end, self._t_start + chunks)
+        if self._t_end == self._t_start:
+            self.chunk_offset = 0
+
     def reset(self):
-        self.buffer = np.array([], dtype=np.float32)
+        self._storage = np.empty(self.initial_capacity, dtype=np.float32)
+        self._start = 0
+        self._end = 0
         self.pointers = {}
 
+        # One row per chunk: VAD probability, energy.
+        self._timeline = np.empty((self.initial_capacity // self.samples_per_chunk, 2), dtype=np.float32)
+        self._t_start = 0
+        self._t_end = 0
+        self.chunk_offset = 0
+
+    def shrink(self):
+        """Moves the live data back into arenas of the initial capacity (or just large enough), releasing ones grown earlier."""
+        size = self.n_samples()
+        capacity = max(self.initial_capacity, size)
+        if self._storage.shape[0] > capacity:
+            storage = np.empty(capacity, dtype=np.float32)
+            storage[:size] = self.as_nparray()
+            self._storage, self._start, self._end = storage, 0, size
+
+        rows = self._t_end - self._t_start
+        capacity = max(self.initial_capacity // self.samples_per_chunk, rows)
+        if self._timeline.shape[0] > capacity:
+            timeline = np.empty((capacity, 2), dtype=np.float32)
+            timeline[:rows] = self._timeline[self._t_start:self._t_end]
+            self._timeline, self._t_start, self._t_end = timeline, 0, rows
+
     def clear(self):
-        self.trim_tail(self.buffer.shape[0])
+        self.trim_tail(self.n_samples())
+
+    @property
+    def buffer(self):
+        return self.as_nparray()
 
     def as_tensor(self):
-        return torch.tensor(self.buffer)
-    
+        return torch.tensor(self.as_nparray())
+
     def as_nparray(self):
-        return self.buffer
-    
+        return self._storage[self._start:self._end]
+
     def n_samples(self):
-        return self.buffer.shape[0]
\ No newline at end of file
+        return self._end - self._start
+
+    def speech_probs(self) -> np.ndarray:
+        """VAD probability of each timeline chunk, a view like `as_nparray`."""
+        return self._timeline[self._t_start:self._t_end, 0]
+
+    def chunk_energy(self) -> np.ndarray:
+        """Mean square of each timeline chunk, a view like `as_nparray`."""
+        return self._timeline[self._t_start:self._t_end, 1]
@@ -0,0 +1,65 @@
+import time
+import numpy as np
+
+from audio_buffer import AudioBuffer
+
+
+class ConcatAudioBuffer:
+    # The previous np.concatenate based implementation, kept for comparison.
+    def __init__(self):
+        self.buffer = np.array([], dtype=np.float32)
+        self.pointers = {}
+
+    def submit(self, audio: np.ndarray):
+        self.buffer = np.concatenate([self.buffer, audio])
+
+    def trim_head(self, n_samples: int):
+        self.buffer = self.buffer[n_samples:]
+
+    def as_nparray(self):
+        return self.buffer
+
+    def n_samples(self):
+        return self.buffer.shape[0]
+
+
+def run(buffer, chunks):
+    # Mimics the main loop during continuous speech: one submit and one length
+    # query per 512-sample chunk, and no VAD cut until the end.
+    per_chunk = np.empty(len(chunks), dtype=np.float64)
+    for i, chunk in enumerate(chunks):
+        t0 = time.perf_counter()
+        buffer.submit(chunk)
+        buffer.n_samples()
+        per_chunk[i] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    buffer.as_nparray()
+    buffer.trim_head(buffer.n_samples())
+    cut = time.perf_counter() - t0
+
+    return per_chunk, cut
+
+
+def main(sampling_rate=16000, samples_per_chunk=512):
+    rng = np.random.default_rng(0)
+
+    print(f"{'impl':<8} {'seconds':>8} {'total ms':>10} {'mean us':>9} {'last 10% us':>12} {'cut us':>8}")
+    for seconds in (30, 60, 120):
+        n_chunks = seconds * sampling_rate // samples_per_chunk
+        chunks = [
+            rng.uniform(-0.5, 0.5, samples_per_chunk).astype(np.float32)
+            for _ in range(n_chunks)
+        ]
+
+        for name, buffer in (("concat", ConcatAudioBuffer()), ("arena", AudioBuffer())):
+            per_chunk, cut = run(buffer, chunks)
+            tail = per_chunk[-max(1, n_chunks // 10):]
+            print(
+                f"{name:<8} {seconds:>8} {per_chunk.sum() * 1e3:>10.2f} "
+                f"{per_chunk.mean() * 1e6:>9.2f} {tail.mean() * 1e6:>12.2f} {cut * 1e6:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
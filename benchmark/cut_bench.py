@@ -0,0 +1,93 @@
+import sys
+import numpy as np
+import soundfile as sf
+from silero_vad import load_silero_vad
+
+from audio_buffer import AudioBuffer
+from benchmark.music_bench import synth_speech
+from cut_planner import CutPlanner
+from speech_gate import levels_db
+from streaming_vad import StreamingVAD
+
+# python -m benchmark.cut_bench [audio.wav]
+#
+# Cuts a 16 kHz mono file (or synthetic talk with a long monologue in the
+# middle) the way the session does, once with the old rule (split in the
+# middle of the pause, whole buffer sent) and once with CutPlanner, and
+# compares segment lengths, leading silence sent to Whisper and the level
+# at the split points.
+
+SR = 16000
+SAMPLES_PER_CHUNK = 512
+THRESHOLD = 0.25
+CUT_OFF_SAMPLES = 38000
+MAX_SEGMENT_SAMPLES = 16000 * 25
+
+
+def synthetic_talk(rng: np.random.Generator) -> np.ndarray:
+    parts = []
+    for seconds, pause in ((8, 4), (6, 3), (90, 3), (10, 4)):
+        # synth_speech pauses for at most 0.8 s, far below the cut-off, so the 90 s part is one monologue.
+        parts += [synth_speech(rng, seconds), np.zeros(pause * SR, dtype=np.float32)]
+    audio = np.concatenate(parts)
+    return audio + rng.normal(0, 0.003, audio.shape[0]).astype(np.float32)
+
+
+def cut(audio: np.ndarray, probs: np.ndarray, planner: CutPlanner | None) -> list[tuple[int, int, float]]:
+    """(segment length, leading silence, split level in dBFS) of each segment."""
+    buffer = AudioBuffer(samples_per_chunk=SAMPLES_PER_CHUNK)
+    cont_non_speech = 0
+    segments = []
+    for i, prob in enumerate(probs.tolist()):
+        chunk = audio[i * SAMPLES_PER_CHUNK:(i + 1) * SAMPLES_PER_CHUNK]
+        buffer.submit(chunk, prob)
+        cont_non_speech = cont_non_speech + SAMPLES_PER_CHUNK if prob < THRESHOLD else 0
+
+        start = 0 if planner is None else planner.speech_start(buffer)
+        forced = None if planner is None else planner.forced_cut(buffer, start)
+        if cont_non_speech <= CUT_OFF_SAMPLES and forced is None:
+            continue
+        if forced is not None:
+            split = forced
+        elif planner is None:
+            split = buffer.n_samples() - cont_non_speech // 2
+        else:
+            split = planner.silence_cut(buffer, cont_non_speech)
+
+        speech = np.flatnonzero(buffer.speech_probs() >= THRESHOLD)
+        if speech.shape[0]:
+            lead = max(0, buffer.chunk_start(int(speech[0])) - start)
+            energy = buffer.chunk_energy()[buffer.chunk_at(min(split, buffer.n_samples() - 1))]
+            segments.append((split - start, lead, float(levels_db(energy))))
+        buffer.trim_head(split)
+        cont_non_speech = min(cont_non_speech, buffer.n_samples())
+    return segments
+
+
+def main():
+    if len(sys.argv) > 1:
+        audio, sr = sf.read(sys.argv[1], dtype="float32")
+        if sr != SR or audio.ndim != 1:
+            raise ValueError(f"{sys.argv[1]}: expected 16 kHz mono audio")
+    else:
+        audio = synthetic_talk(np.random.default_rng(0))
+    audio = audio[:audio.shape[0] // SAMPLES_PER_CHUNK * SAMPLES_PER_CHUNK]
+
+    vad = StreamingVAD(load_silero_vad(), samples_per_chunk=SAMPLES_PER_CHUNK)
+    block = vad.max_chunks * SAMPLES_PER_CHUNK
+    probs = np.concatenate([vad(audio[i:i + block]) for i in range(0, audio.shape[0], block)])
+
+    print(f"{'cuts':<8} {'segments':>8} {'max s':>7} {'mean s':>7} {'lead s':>7} {'split dBFS':>10}")
+    for name, planner in (("middle", None), ("planner", CutPlanner(threshold=THRESHOLD, max_segment_samples=MAX_SEGMENT_SAMPLES))):
+        segments = np.array(cut(audio, probs, planner))
+        if segments.shape[0] == 0:
+            print(f"{name:<8} {0:>8}")
+            continue
+        print(
+            f"{name:<8} {segments.shape[0]:>8} {segments[:, 0].max() / SR:>7.1f} {segments[:, 0].mean() / SR:>7.1f} "
+            f"{segments[:, 1].sum() / SR:>7.1f} {segments[:, 2].mean():>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import io
+import time
+import numpy as np
+import soundfile as sf
+
+from benchmark.vad_bench import synthetic_speech
+from utils import AUDIO_ENCODINGS, encode_audio
+
+# python -m benchmark.encode_bench
+#
+# Upload payload size and encode time per segment length for every encoding
+# in utils.AUDIO_ENCODINGS, against the previous np_to_wav path.
+
+REPEATS = 20
+
+
+def legacy_wav(audio, sampling_rate):
+    # np_to_wav before encode_audio: a range scan with two boolean temporaries, then float WAV conversion.
+    if not np.all(np.logical_and(-1.0 <= audio, audio <= 1.0)):
+        raise ValueError("Audio range must be in [-1, 1]")
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sampling_rate, format="WAV")
+    return buffer.getvalue()
+
+
+def timed(fn):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(REPEATS):
+        data = fn()
+    return data, (time.perf_counter() - t0) / REPEATS
+
+
+def main():
+    print(f"{'seconds':>7} {'encoding':<12} {'KB':>8} {'vs wav':>7} {'encode ms':>10}")
+    for seconds in (10, 30):
+        audio = synthetic_speech(seconds)
+        legacy, legacy_time = timed(lambda: legacy_wav(audio, 16000))
+        print(f"{seconds:>7} {'legacy wav':<12} {len(legacy) / 1024:>8.1f} {1.0:>7.2f} {legacy_time * 1000:>10.2f}")
+        for encoding in AUDIO_ENCODINGS:
+            (data, _, _), encode_time = timed(lambda: encode_audio(audio, 16000, encoding))
+            print(f"{seconds:>7} {encoding:<12} {len(data) / 1024:>8.1f} {len(data) / len(legacy):>7.2f} {encode_time * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
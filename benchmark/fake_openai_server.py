@@ -0,0 +1,141 @@
+import asyncio
+import json
+import random
+
+# A minimal OpenAI-compatible HTTP/1.1 server for exercising the remote providers offline.
+# Serves /chat/completions and /audio/transcriptions (verbose_json) under any prefix,
+# with keep-alive, a heavy-tailed response latency and a configurable 503 rate.
+# Chat requests with "stream": true are answered as server-sent events, one word per chunk.
+#
+# python -m benchmark.fake_openai_server [port]
+
+
+class FakeOpenAIServer:
+    """
+    Each response takes `latency` seconds, or `slow_latency` with probability
+    `slow_rate`, and fails with 503 with probability `error_rate`. Streamed
+    responses then send one word every `token_latency` seconds.
+    """
+
+    def __init__(self, latency: float = 0.2, slow_latency: float = 3.0, slow_rate: float = 0.05, error_rate: float = 0.0, token_latency: float = 0.02, seed: int = 0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+        self.server: asyncio.AbstractServer | None = None
+        self.handlers: set[asyncio.Task] = set()
+        self.requests = 0
+        self.connections = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts listening and returns the base URL to hand to the providers."""
+        self.server = await asyncio.start_server(self.handle, host, port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/v1"
+
+    async def stop(self):
+        self.server.close()
+        for task in self.handlers:
+            task.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def response_body(self, path: str, body: bytes) -> dict:
+        if path.endswith("/chat/completions"):
+            prompt = json.loads(body)["messages"][-1]["content"]
+            return {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "fake",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f"[translated] {prompt[-40:]}"}
+                }],
+                "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": 16, "total_tokens": len(body) // 4 + 16},
+            }
+        return {
+            "task": "transcribe",
+            "language": "ja",
+            "duration": 1.0,
+            "text": "fake transcript",
+            "segments": [{
+                "id": 0, "seek": 0, "start": 0.0, "end": 1.0, "text": "fake transcript", "tokens": [],
+                "temperature": 0.0, "avg_logprob": -0.2, "compression_ratio": 1.0, "no_speech_prob": 0.0
+            }],
+        }
+
+    async def write_stream(self, writer: asyncio.StreamWriter, completion: dict):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        words = completion["choices"][0]["message"]["content"].split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else f" {word}"}
+            await _write_chunk(writer, {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            await asyncio.sleep(self.token_latency)
+        await _write_chunk(writer, {**base, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]})
+        await _write_chunk(writer, "[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+
+                await asyncio.sleep(self.slow_latency if self.rng.random() < self.slow_rate else self.latency)
+                if self.rng.random() < self.error_rate:
+                    status, payload = "503 Service Unavailable", {"error": {"message": "overloaded", "type": "server_error"}}
+                else:
+                    status, payload = "200 OK", self.response_body(path, body)
+
+                if status.startswith("200") and json.loads(body or b"{}").get("stream"):
+                    await self.write_stream(writer, payload)
+                    continue
+
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass # Client went away (e.g. a cancelled hedge) or the server is stopping
+        finally:
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+async def _write_chunk(writer: asyncio.StreamWriter, event: dict | str):
+    data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode()
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    await writer.drain()
+
+
+async def _serve(port: int):
+    server = FakeOpenAIServer()
+    print(f"Serving on {await server.start(port=port)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8808))
@@ -0,0 +1,145 @@
+import random
+import sys
+import time
+
+from transcribe.hallucination_filter import KNOWN_HALLUCINATIONS, AhoCorasick, HallucinationFilter
+from translate.translation_cache import normalize_text
+
+# python -m benchmark.hallucination_bench [labelled.tsv]
+#
+# Runs HallucinationFilter over labelled transcript segments and reports what
+# each rule caught, how many LLM calls and Telegram messages that saves, the
+# real lines it wrongly dropped and its cost per segment. The TSV has one
+# segment per line: "1" or "0" (hallucination or not), a tab, the text.
+# Without a file it uses a synthetic mix of livestream chatter and typical
+# Whisper output on silence, music and noise.
+#
+# Also times the Aho-Corasick blocklist against checking every phrase with
+# `in`, for blocklists of growing size.
+
+SPEECH = [
+    "今日はね、新しいゲームをやっていこうと思います",
+    "えっと、コメントありがとうございます",
+    "ちょっと待って、これどうやって進むの？",
+    "みんなこんばんは、今日も来てくれてありがとう",
+    "このボス強すぎない？",
+    "あははは、それは無理だって",
+    "昨日の配信見てくれた人いる？",
+    "次は右のほうに行ってみようかな",
+    "スパチャありがとうございます、嬉しい",
+    "お腹すいたなあ、ラーメン食べたい",
+    "大家晚上好，今天我们来玩这个游戏",
+    "这个地方我之前来过吗",
+    "谢谢你的礼物，太感谢了",
+    "So today we're going to try something new",
+    "wait, where did that come from",
+    "ok let's go, one more try",
+    "1000円のガチャを10連回します",
+    "はいはいはい、わかったわかった",
+    "そうそうそうそう",
+    "哈哈哈哈哈哈",
+    "No, no, no, no, no!",
+    "今日はご視聴ありがとうございました、また明日も配信します",
+]
+
+HALLUCINATIONS = [
+    "ご視聴ありがとうございました",
+    "ご視聴ありがとうございました。",
+    "チャンネル登録よろしくお願いします！",
+    "最後までご視聴いただきありがとうございます。次の動画でお会いしましょう",
+    "请不吝点赞 订阅 转发 打赏支持明镜与点点栏目",
+    "字幕由Amara.org社区提供",
+    "中文字幕制作：小明",
+    "Thanks for watching!",
+    "Subtitles by the Amara.org community",
+    "you",
+    "Thank you.",
+    "作詞・作曲・編曲 初音ミク",
+    "ありがとう ありがとう ありがとう ありがとう ありがとう ありがとう",
+    "うんうんうんうんうんうんうんうんうんうんうんうんうんうんうんうん",
+    "I'm going to go to the store. I'm going to go to the store. I'm going to go to the store. I'm going to go to the store.",
+]
+
+
+def synthetic_corpus(n: int = 2000, hallucination_share: float = 0.2) -> list[tuple[bool, str, float | None]]:
+    rng = random.Random(0)
+    corpus = []
+    for _ in range(n):
+        if rng.random() < hallucination_share:
+            # Some hallucinations only show up as a low avg_logprob.
+            if rng.random() < 0.2:
+                corpus.append((True, rng.choice(SPEECH), rng.uniform(-1.6, -1.05)))
+            else:
+                corpus.append((True, rng.choice(HALLUCINATIONS), rng.uniform(-0.9, -0.2)))
+        else:
+            corpus.append((False, rng.choice(SPEECH), rng.uniform(-0.7, -0.1)))
+    return corpus
+
+
+def file_corpus(path: str) -> list[tuple[bool, str, float | None]]:
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            label, _, text = line.rstrip("\n").partition("\t")
+            if text:
+                corpus.append((label.strip() == "1", text, None))
+    return corpus
+
+
+def blocklist_timing():
+    rng = random.Random(1)
+    texts = [normalize_text(text) for text in SPEECH + HALLUCINATIONS] * 50
+    alphabet = "あいうえおかきくけこさしすせそたちつてとなにぬねの"
+    print(f"{'phrases':>8} {'aho-corasick us':>16} {'naive `in` us':>14}")
+    for extra in (0, 200, 2000):
+        phrases = [normalize_text(p) for p in KNOWN_HALLUCINATIONS]
+        phrases += ["".join(rng.choice(alphabet) for _ in range(rng.randint(6, 16))) for _ in range(extra)]
+        automaton = AhoCorasick(phrases)
+
+        t0 = time.perf_counter()
+        for text in texts:
+            automaton.find(text)
+        ac = (time.perf_counter() - t0) / len(texts)
+
+        t0 = time.perf_counter()
+        for text in texts:
+            [p for p in phrases if p in text]
+        naive = (time.perf_counter() - t0) / len(texts)
+        print(f"{len(phrases):>8} {ac * 1e6:>16.1f} {naive * 1e6:>14.1f}")
+
+
+def main():
+    corpus = file_corpus(sys.argv[1]) if len(sys.argv) > 1 else synthetic_corpus()
+    hallucination_filter = HallucinationFilter()
+
+    caught = missed = wrongly_dropped = 0
+    dropped_examples = []
+    t0 = time.perf_counter()
+    for is_hallucination, text, avg_logprob in corpus:
+        kept = hallucination_filter.check(text, avg_logprob=avg_logprob)
+        if kept is None and is_hallucination:
+            caught += 1
+        elif kept is None:
+            wrongly_dropped += 1
+            dropped_examples.append(text)
+        elif is_hallucination:
+            missed += 1
+    elapsed = time.perf_counter() - t0
+
+    n_hallucinations = sum(is_hallucination for is_hallucination, _, _ in corpus)
+    stats = hallucination_filter.stats()
+    print(f"{len(corpus)} segments, {n_hallucinations} hallucinations")
+    print("rule hits: " + ", ".join(f"{rule} {stats[rule]}" for rule in HallucinationFilter.RULES))
+    print(
+        f"caught {caught}/{n_hallucinations} ({caught / max(1, n_hallucinations):.0%}), "
+        f"missed {missed}, real lines dropped {wrongly_dropped}"
+        + (f" (e.g. {dropped_examples[0]!r})" if dropped_examples else "")
+    )
+    print(f"LLM calls and Telegram messages saved: {caught + wrongly_dropped} of {len(corpus)} ({stats['reject_rate']:.0%})")
+    print(f"filter cost {elapsed * 1e6 / len(corpus):.1f} us per segment")
+    print()
+    blocklist_timing()
+
+
+if __name__ == "__main__":
+    main()
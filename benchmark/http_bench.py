@@ -0,0 +1,111 @@
+import asyncio
+import time
+import numpy as np
+from openai import AsyncOpenAI
+
+from benchmark.fake_openai_server import FakeOpenAIServer
+from http_client import ClientPool, RequestPolicy
+from transcribe.provider.openai_whisper import OpenAIWhisperBlockTranscriber
+from translate.llm_translate import OpenAICompatibleLLMProvider
+
+# python -m benchmark.http_bench
+#
+# Runs translations and remote transcriptions against a local fake
+# OpenAI-compatible server with a heavy latency tail and some 503s, with
+# and without retries and hedging.
+
+REQUESTS = 400
+CONCURRENCY = 4
+LATENCY = 0.1
+SLOW_LATENCY = 2.0
+SLOW_RATE = 0.05
+ERROR_RATE = 0.03
+
+
+async def run_requests(call) -> tuple[list[float], int]:
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                await call(i)
+                latencies.append(time.perf_counter() - t0)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    return latencies, failures
+
+
+async def bench(name: str, make_call):
+    server = FakeOpenAIServer(latency=LATENCY, slow_latency=SLOW_LATENCY, slow_rate=SLOW_RATE, error_rate=ERROR_RATE)
+    base_url = await server.start()
+    call, policy, close = make_call(base_url)
+    t0 = time.perf_counter()
+    latencies, failures = await run_requests(call)
+    wall = time.perf_counter() - t0
+    await close()
+    await server.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0, 0, 0)
+    extra = f"  {policy.stats()}" if policy is not None else ""
+    print(f"{name:<18} {p50 * 1000:>7.0f} {p95 * 1000:>7.0f} {p99 * 1000:>7.0f} {failures:>6} {server.requests:>9} {server.connections:>6} {wall:>7.1f}{extra}")
+
+
+def direct_llm(base_url):
+    # What the provider did before: its own client, the SDK's default retries, no deadline or hedging.
+    client = AsyncOpenAI(base_url=base_url, api_key="fake")
+
+    async def call(i):
+        await client.chat.completions.create(model="fake", messages=[{"role": "user", "content": f"line {i}"}])
+
+    return call, None, client.close
+
+
+def pooled_llm(hedge: bool):
+    def make(base_url):
+        pool = ClientPool()
+        policy = RequestPolicy(attempt_timeout=5.0, hedge=hedge, backoff_base=0.05)
+        # Two providers on the same endpoint, as with several sessions, share one connection pool.
+        providers = [OpenAICompatibleLLMProvider(base_url, "fake", "fake", policy=policy) for _ in range(2)]
+        for provider in providers:
+            provider.openai = pool.openai(base_url, "fake")
+
+        async def call(i):
+            await providers[i % 2].translate(f"line {i}")
+
+        return call, policy, pool.aclose
+    return make
+
+
+def pooled_stt(hedge: bool):
+    def make(base_url):
+        pool = ClientPool()
+        policy = RequestPolicy(attempt_timeout=5.0, hedge=hedge, backoff_base=0.05)
+        transcriber = OpenAIWhisperBlockTranscriber(base_url, "fake", policy=policy)
+        transcriber.openai_client = pool.openai(base_url, "fake")
+        audio = np.zeros(16000 * 5, dtype=np.float32)
+
+        async def call(i):
+            await transcriber.transcribe(audio, "whisper-1", None, 0.9, " ".join)
+
+        return call, policy, pool.aclose
+    return make
+
+
+async def main():
+    print(f"{REQUESTS} requests, {CONCURRENCY} concurrent, {LATENCY * 1000:.0f} ms typical, "
+          f"{SLOW_RATE:.0%} take {SLOW_LATENCY:.1f}s, {ERROR_RATE:.0%} fail with 503")
+    print(f"{'client':<18} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'failed':>6} {'sent reqs':>9} {'conns':>6} {'wall s':>7}")
+    await bench("llm direct", direct_llm)
+    await bench("llm retry", pooled_llm(hedge=False))
+    await bench("llm retry+hedge", pooled_llm(hedge=True))
+    await bench("stt retry", pooled_stt(hedge=False))
+    await bench("stt retry+hedge", pooled_stt(hedge=True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
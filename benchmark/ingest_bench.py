@@ -0,0 +1,81 @@
+import asyncio
+import time
+import numpy as np
+
+from net_stream.pcm_ingest import FFmpegPCMReader, PCMRing
+
+# python -m benchmark.ingest_bench
+#
+# Pushes PCM through `cat` (standing in for ffmpeg) as fast as the consumer
+# takes it, and compares the old queue-of-bytes path with PCMRing.
+
+SECONDS = 600
+SAMPLES_PER_CHUNK = 512
+READ_CHUNKS = 8
+PCM_PATH = "/tmp/ingest_bench.pcm"
+
+
+async def queue_path():
+    # What BilibiliLive / FFmpegServer did before: 1 KB bytes objects on an unbounded queue.
+    process = await asyncio.create_subprocess_exec("cat", PCM_PATH, stdout=asyncio.subprocess.PIPE)
+    queue = asyncio.Queue()
+    bytes_per_chunk = 2 * SAMPLES_PER_CHUNK
+
+    async def reader_worker():
+        while True:
+            buf = bytearray()
+            while len(buf) < bytes_per_chunk:
+                piece = await process.stdout.read(bytes_per_chunk - len(buf))
+                if not piece: break
+                buf.extend(piece)
+            if not buf: break
+            await queue.put(bytes(buf))
+        await queue.put(None)
+
+    reader = asyncio.create_task(reader_worker())
+    total = 0
+    while True:
+        chunks = []
+        for _ in range(READ_CHUNKS):
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        if not chunks:
+            break
+        audio = np.concatenate([np.frombuffer(c, dtype=np.int16) for c in chunks]).astype(np.float32) / 32768.0
+        total += audio.shape[0]
+        if len(chunks) < READ_CHUNKS:
+            break
+    await reader
+    await process.wait()
+    return total
+
+
+async def ring_path():
+    ring = PCMRing(16000 * 60, overflow="block")
+    reader = FFmpegPCMReader(["cat", PCM_PATH], ring)
+    await reader.start()
+    total = 0
+    while (audio := await ring.read(READ_CHUNKS * SAMPLES_PER_CHUNK)) is not None:
+        total += audio.shape[0]
+    await reader.stop()
+    return total
+
+
+def main():
+    rng = np.random.default_rng(0)
+    rng.integers(-8000, 8000, SECONDS * 16000).astype(np.int16).tofile(PCM_PATH)
+
+    print(f"{SECONDS}s of PCM, reads of {READ_CHUNKS * SAMPLES_PER_CHUNK} samples")
+    print(f"{'path':<8} {'wall ms':>8} {'cpu ms / audio min':>19}")
+    for name, path in (("queue", queue_path), ("ring", ring_path)):
+        t_cpu, t_wall = time.process_time(), time.perf_counter()
+        total = asyncio.run(path())
+        wall, cpu = time.perf_counter() - t_wall, time.process_time() - t_cpu
+        assert total == SECONDS * 16000, total
+        print(f"{name:<8} {wall * 1000:>8.0f} {cpu * 1000 / (SECONDS / 60):>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import time
+
+from transcribe.overlap_stitch import stitch_overlap
+
+# python -m benchmark.overlap_stitch_bench
+#
+# Checks stitch_overlap on pairs of transcripts of overlapping segments
+# (duplicated words removed, words that only share a prefix with the
+# previous tail kept, unrelated text untouched) and times it.
+
+CASES = [
+    # (previous, current, expected)
+    ("今日はいい天気ですね。散歩に行き", "散歩に行きましょう。公園まで", "ましょう。公園まで"),
+    ("and then we went", "We went home after that.", "home after that."),
+    ("全然関係ない話", "まったく別の話です", "まったく別の話です"),
+    ("", "abc", "abc"),
+    # Prefix-sharing words must survive.
+    ("the cat", "the cathedral is big", "cathedral is big"),
+    ("I like to play", "player one is ready", "player one is ready"),
+    ("we talked about art", "artificial intelligence today", "artificial intelligence today"),
+    # A word cut in half on the previous side is kept whole on this one.
+    ("and then we wen", "went home after that.", "went home after that."),
+]
+
+
+def main(repeat: int = 2000):
+    failures = 0
+    for previous, current, expected in CASES:
+        result = stitch_overlap(previous, current)
+        ok = result == expected
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {previous!r} + {current!r} -> {result!r}" + ("" if ok else f" (expected {expected!r})"))
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for previous, current, _ in CASES:
+            stitch_overlap(previous, current)
+    per_call = (time.perf_counter() - t0) / (repeat * len(CASES))
+    print(f"{per_call * 1e6:.1f} us per stitch")
+
+    if failures:
+        raise SystemExit(f"{failures} of {len(CASES)} cases failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import sys
+import time
+import numpy as np
+from silero_vad import load_silero_vad
+
+from benchmark.stubs import StubBot, StubLLMProvider, StubWhisperModel
+from latency_trace import LatencyMetrics
+from live_session import SessionManager
+from model_registry import ModelRegistry
+from net_stream.replay import ReplayStream
+
+# python -m benchmark.pipeline_bench <16 kHz mono wav or s16le pcm> [speed] [rooms] [stub stt realtime factor]
+#
+# Replays the file into `rooms` sessions at `speed` x real time (0 = as fast as
+# possible) through the real VAD, session and translation pipeline, with the
+# Whisper model, LLM and Telegram bot replaced by the stubs in benchmark.stubs.
+# Needs no network and no Whisper weights.
+#
+# Lag control only makes sense against the real-time clock, so it is enabled
+# at speed 1 only. A stub STT realtime factor above 1 / rooms overloads the
+# pipeline and shows the degradation steps.
+
+SESSION_CONFIG = {
+    "ffmpeg_path": None,
+    "vad_threshold": 0.25,
+    "vad_cut_off_samples": 38000,
+    "min_speech_samples": 4000,
+    "vad_samples_per_chunk": 512,
+    "vad_batch_chunks": 8,
+    "translate_concurrency": 4,
+    "translate_max_pending": 16,
+    "translate_context_tokens": 1500,
+    "translate_streaming": True,
+    "translate_edit_interval": 1.0,
+    "stt_streaming": False,
+    "stt_stream_iter_samples": 16000,
+    "lag_thresholds": (15.0, 30.0, 60.0, 90.0),
+    "speculative_cut_samples": 12000,
+    "music_detection": True,
+    "music_action": "mark",
+    "hallucination_filter": True,
+    "speech_gate": True,
+    "max_segment_samples": 16000 * 25,
+    "segment_overlap_samples": 16000,
+    "idle_reset_samples": 16000 * 30,
+    "hibernate_samples": 16000 * 600,
+}
+STT_MAX_INFLIGHT = 8
+STUB_STT_REALTIME_FACTOR = 0.1
+STUB_LLM_LATENCY = 0.4
+STUB_SEND_LATENCY = 0.05
+STUB_FLOOD_LIMIT = 3 # Requests per chat per second before the stub bot answers RetryAfter
+SAMPLE_INTERVAL = 0.1
+
+async def sample_queues(manager, streams, llm, samples):
+    while True:
+        stt_stats = manager.stt.stats() if manager.stt is not None else {"inflight": 0, "backlog_seconds": 0.0}
+        samples["audio backlog (s)"].append(sum(s.audio_buffer.backlog_seconds() for s in streams if hasattr(s, "audio_buffer")))
+        samples["stt inflight"].append(stt_stats["inflight"])
+        samples["stt backlog (s)"].append(stt_stats["backlog_seconds"])
+        samples["llm inflight"].append(llm.inflight)
+        samples["delivery backlog"].append(manager.delivery.backlog())
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+async def run(path, speed, n_rooms, stt_realtime_factor):
+    registry = ModelRegistry()
+    registry.register("silero_vad", load_silero_vad)
+    registry.register("whisper", lambda: StubWhisperModel(realtime_factor=stt_realtime_factor))
+    await registry.preload_async("silero_vad", "whisper")
+
+    streams = []
+
+    def stream_factory(room_id):
+        stream = ReplayStream(path, speed=speed)
+        streams.append(stream)
+        return stream
+
+    llm = StubLLMProvider(base_latency=STUB_LLM_LATENCY)
+    bot = StubBot(send_latency=STUB_SEND_LATENCY, flood_limit=STUB_FLOOD_LIMIT)
+    metrics = LatencyMetrics()
+    config = dict(SESSION_CONFIG, lag_thresholds=SESSION_CONFIG["lag_thresholds"] if speed == 1 else None)
+    manager = SessionManager(bot, stream_factory, llm, registry, config, stt_max_inflight=STT_MAX_INFLIGHT, metrics=metrics)
+
+    samples = {"audio backlog (s)": [], "stt inflight": [], "stt backlog (s)": [], "llm inflight": [], "delivery backlog": []}
+    sampler = asyncio.create_task(sample_queues(manager, streams, llm, samples))
+
+    t0 = time.perf_counter()
+    for room_id in range(n_rooms):
+        manager.subscribe(room_id, chat_id=room_id)
+    stt_stats, session_stats = None, {}
+    while manager.sessions:
+        if manager.stt is not None:
+            stt_stats = manager.stt.stats()
+        for room_id, session in manager.sessions.items():
+            session_stats[room_id] = dict(session.lag.stats(), merged=session.merged_segments, dropped=session.dropped_segments, speculation=session.speculation_stats())
+        await asyncio.sleep(SAMPLE_INTERVAL)
+    await manager.delivery.join()
+    wall = time.perf_counter() - t0
+    delivery_stats = manager.delivery.stats()
+
+    sampler.cancel()
+    manager.stream_executor.shutdown()
+    return metrics, streams, wall, samples, stt_stats, session_stats, delivery_stats
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    path = sys.argv[1]
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    n_rooms = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    stt_realtime_factor = float(sys.argv[4]) if len(sys.argv) > 4 else STUB_STT_REALTIME_FACTOR
+
+    metrics, streams, wall, samples, stt_stats, session_stats, delivery_stats = asyncio.run(run(path, speed, n_rooms, stt_realtime_factor))
+
+    audio_seconds = sum(s.duration for s in streams)
+    print(f"{n_rooms} room(s) x {streams[0].duration:.1f}s at speed {speed or 'max'}: {metrics.segments} segments delivered")
+    print(f"wall {wall:.1f}s, pipeline realtime factor {wall / audio_seconds:.3f} (wall s / audio s)")
+    if stt_stats:
+        print(f"stt realtime factor {stt_stats['realtime_factor']:.3f}")
+
+    print(f"{'stage':<18} {'p50 s':>7} {'p95 s':>7} {'max s':>7}")
+    for stage, s in metrics.summary().items():
+        print(f"{stage:<18} {s['p50']:>7.3f} {s['p95']:>7.3f} {s['max']:>7.3f}")
+    tokens = metrics.token_summary()
+    if tokens:
+        print(f"llm prompt tokens p50 {tokens['prompt_p50']:.0f} p95 {tokens['prompt_p95']:.0f}, context tokens p50 {tokens['context_p50']:.0f} ({tokens['calls']} calls)")
+
+    print(f"{'queue':<22} {'mean':>7} {'max':>7}")
+    for name, values in samples.items():
+        if values:
+            print(f"{name:<22} {np.mean(values):>7.2f} {np.max(values):>7.2f}")
+
+    for room_id, s in session_stats.items():
+        print(
+            f"room {room_id}: lag level {s['level']}, max lag {s['max_lag_seconds']:.1f}s, {s['step_downs']} step downs, "
+            f"{s['merged']} segments merged, {s['dropped']} dropped, "
+            f"speculation hit rate {s['speculation']['hit_rate']:.0%} ({s['speculation']['hits']} / {s['speculation']['hits'] + s['speculation']['misses']})"
+        )
+    if metrics.gate_checked:
+        print(f"speech gate: {metrics.gate_rejected} of {metrics.gate_checked} segments rejected before STT")
+    print(f"delivery: {delivery_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import time
+import numpy as np
+from silero_vad import load_silero_vad
+
+from benchmark.music_bench import synth_speech
+from speech_gate import SpeechGate, chunk_energy
+from streaming_vad import StreamingVAD
+
+# python -m benchmark.speech_gate_bench
+#
+# Scores synthetic speech phrases and noise events (clicks, hiss bursts,
+# hum) over a noisy background with Silero, the way the session does, then
+# runs SpeechGate on every one that Silero would have cut as a segment of at
+# least MIN_SPEECH_SAMPLES. Reports how many STT calls the gate saves, how
+# much speech it wrongly rejects, and its cost per segment.
+
+SR = 16000
+SAMPLES_PER_CHUNK = 512
+THRESHOLD = 0.5
+MIN_SPEECH_SAMPLES = 4000
+NOISE_STD = 0.01
+N_SEGMENTS = 200
+
+
+def noise_event(rng: np.random.Generator) -> np.ndarray:
+    n = int(rng.uniform(0.3, 1.5) * SR)
+    kind = rng.integers(3)
+    if kind == 0:
+        # Sparse clicks (keyboard, mouse, game sounds).
+        out = np.zeros(n, dtype=np.float32)
+        for start in rng.integers(0, n - 200, rng.integers(2, 6)):
+            out[start:start + 200] += rng.normal(0, 0.3, 200) * np.exp(-np.arange(200) / 40)
+        return out
+    if kind == 1:
+        # A burst of broadband hiss.
+        return (rng.normal(0, 0.03, n) * np.hanning(n)).astype(np.float32)
+    t = np.arange(n) / SR
+    return (0.02 * np.sin(2 * np.pi * rng.choice((50, 60)) * t) * np.hanning(n)).astype(np.float32)
+
+
+def score(vad: StreamingVAD, audio: np.ndarray) -> np.ndarray:
+    block = vad.max_chunks * SAMPLES_PER_CHUNK
+    return np.concatenate([vad(audio[i:i + block]) for i in range(0, audio.shape[0], block)])
+
+
+def corpus(rng: np.random.Generator) -> list[tuple[bool, np.ndarray]]:
+    segments = []
+    for i in range(N_SEGMENTS):
+        is_speech = i % 2 == 0
+        audio = synth_speech(rng, rng.uniform(1.0, 4.0)) if is_speech else noise_event(rng)
+        segments.append((is_speech, audio + rng.normal(0, NOISE_STD, audio.shape[0]).astype(np.float32)))
+    return segments
+
+
+def main():
+    rng = np.random.default_rng(0)
+    vad = StreamingVAD(load_silero_vad(), samples_per_chunk=SAMPLES_PER_CHUNK)
+    gate = SpeechGate(threshold=THRESHOLD, samples_per_chunk=SAMPLES_PER_CHUNK)
+
+    background = rng.normal(0, NOISE_STD, 10 * SR).astype(np.float32)
+    gate.observe(background, score(vad, background))
+
+    counts = {True: [0, 0], False: [0, 0]} # label -> [segments cut by VAD, rejected by the gate]
+    cpu = 0.0
+    for is_speech, audio in corpus(rng):
+        audio = audio[:audio.shape[0] // SAMPLES_PER_CHUNK * SAMPLES_PER_CHUNK]
+        probs = score(vad, audio)
+        if (probs >= THRESHOLD).sum() * SAMPLES_PER_CHUNK < MIN_SPEECH_SAMPLES:
+            continue # Never reaches STT, gate or not.
+        t0 = time.process_time()
+        passed = gate.check(probs, chunk_energy(audio, SAMPLES_PER_CHUNK))
+        cpu += time.process_time() - t0
+        counts[is_speech][0] += 1
+        counts[is_speech][1] += not passed
+
+    stt_calls = counts[True][0] + counts[False][0]
+    print(f"{stt_calls} segments would reach STT: {counts[True][0]} speech, {counts[False][0]} noise")
+    print(f"gate rejected {counts[False][1]} / {counts[False][0]} noise segments and {counts[True][1]} / {counts[True][0]} speech segments")
+    if stt_calls:
+        print(f"STT calls saved {counts[False][1] / stt_calls:.0%}, cost {cpu * 1e6 / stt_calls:.0f} CPU us per segment")
+    print(f"gate stats: {gate.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import sys
+import time
+import numpy as np
+import soundfile as sf
+from faster_whisper import WhisperModel
+from silero_vad import load_silero_vad
+
+from streaming_vad import StreamingVAD
+from transcribe.provider.faster_whisper import FasterWhisperBlockTranscriber, WhisperTranscribeStream, warmup_whisper_model
+
+# python -m benchmark.streaming_ttfw_bench <16 kHz mono wav> [model_size_or_path]
+#
+# Replays the file on a virtual clock: audio arrives in real time, a single
+# decoder runs one job at a time and each job takes as long as it really took.
+# Time to first word = virtual time the word is emitted - time it was spoken.
+
+SAMPLING_RATE = 16000
+SAMPLES_PER_CHUNK = 512
+VAD_THRESHOLD = 0.25
+VAD_CUT_OFF_SAMPLES = 38000
+MIN_SPEECH_SAMPLES = 4000
+STREAM_ITER_SAMPLES = 16000
+
+
+def vad_probs(audio):
+    vad = StreamingVAD(load_silero_vad(), max_chunks=32, samples_per_chunk=SAMPLES_PER_CHUNK)
+    block = 32 * SAMPLES_PER_CHUNK
+    return np.concatenate([vad(audio[i:i + block]) for i in range(0, audio.shape[0], block)])
+
+
+def cuts(probs):
+    # Same cut logic as RoomSession, yielding (chunk index of the cut, utterance start sample, utterance end sample, is long enough)
+    buffer_start, n_samples, cont_non_speech = 0, 0, 0
+    for i, prob in enumerate(probs):
+        n_samples += SAMPLES_PER_CHUNK
+        cont_non_speech = cont_non_speech + SAMPLES_PER_CHUNK if prob < VAD_THRESHOLD else 0
+        if cont_non_speech > VAD_CUT_OFF_SAMPLES:
+            speech_samples = n_samples - cont_non_speech
+            yield i, buffer_start, buffer_start + n_samples - cont_non_speech // 2, speech_samples >= MIN_SPEECH_SAMPLES
+            keep = cont_non_speech // 2
+            buffer_start += n_samples - keep
+            n_samples = keep
+            cont_non_speech = keep
+
+
+def first_speech_time(probs, start, end):
+    for i in range(start // SAMPLES_PER_CHUNK, end // SAMPLES_PER_CHUNK):
+        if probs[i] >= VAD_THRESHOLD:
+            return i * SAMPLES_PER_CHUNK / SAMPLING_RATE
+    return start / SAMPLING_RATE
+
+
+def block_mode(model, audio, probs):
+    stt = FasterWhisperBlockTranscriber(model=model)
+    decoder_free, latencies = 0.0, []
+    for chunk_idx, start, end, long_enough in cuts(probs):
+        if not long_enough:
+            continue
+        t_cut = (chunk_idx + 1) * SAMPLES_PER_CHUNK / SAMPLING_RATE
+        t0 = time.perf_counter()
+        text = stt.transcribe(audio[start:end], "", segment_max_no_speech_prob=0.75, segments_merge_fn=" ".join)
+        decoder_free = max(t_cut, decoder_free) + time.perf_counter() - t0
+        if text.strip():
+            latencies.append(decoder_free - first_speech_time(probs, start, end))
+    return latencies
+
+
+def streaming_mode(model, audio, probs):
+    stream = WhisperTranscribeStream(model=model)
+    cut_chunks = {chunk_idx: long_enough for chunk_idx, start, end, long_enough in cuts(probs)}
+
+    decoder_free, fed, pending, latencies = 0.0, 0, 0, []
+    utterance_has_output = False
+
+    def run(job):
+        nonlocal decoder_free
+        t0 = time.perf_counter()
+        words = job()
+        decoder_free = max(now, decoder_free) + time.perf_counter() - t0
+        return words
+
+    for chunk_idx in range(len(probs)):
+        now = (chunk_idx + 1) * SAMPLES_PER_CHUNK / SAMPLING_RATE
+        pending += SAMPLES_PER_CHUNK
+
+        if chunk_idx in cut_chunks:
+            stream.submit_audio(audio[fed:fed + pending])
+            fed, pending = fed + pending, 0
+            words = run(stream.flush) if cut_chunks[chunk_idx] else (stream.skip() or [])
+            if words and not utterance_has_output:
+                latencies.append(decoder_free - words[0][1])
+            utterance_has_output = False
+        elif pending >= STREAM_ITER_SAMPLES and decoder_free <= now:
+            stream.submit_audio(audio[fed:fed + pending])
+            fed, pending = fed + pending, 0
+            words = run(stream.do_whisper_iter)
+            if words and not utterance_has_output:
+                latencies.append(decoder_free - words[0][1])
+                utterance_has_output = True
+
+    return latencies
+
+
+def main():
+    audio, sampling_rate = sf.read(sys.argv[1], dtype="float32")
+    if sampling_rate != SAMPLING_RATE or audio.ndim != 1:
+        raise ValueError("Expected a 16 kHz mono file")
+
+    model = WhisperModel(sys.argv[2] if len(sys.argv) > 2 else "large-v2", download_root="./whisper_cache/")
+    warmup_whisper_model(model)
+    probs = vad_probs(audio)
+
+    print(f"{audio.shape[0] / SAMPLING_RATE:.1f}s of audio")
+    print(f"{'mode':<10} {'utterances':>10} {'ttfw p50 s':>10} {'ttfw p95 s':>10}")
+    for name, fn in (("block", block_mode), ("streaming", streaming_mode)):
+        latencies = fn(model, audio, probs)
+        if latencies:
+            print(f"{name:<10} {len(latencies):>10} {np.percentile(latencies, 50):>10.2f} {np.percentile(latencies, 95):>10.2f}")
+        else:
+            print(f"{name:<10} {0:>10} {'-':>10} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
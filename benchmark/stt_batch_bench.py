@@ -0,0 +1,64 @@
+import asyncio
+import sys
+import time
+import numpy as np
+from faster_whisper import WhisperModel
+
+from benchmark.vad_bench import synthetic_speech
+from transcribe.async_transcriber import AsyncBlockTranscriber
+from transcribe.batch_scheduler import BatchedTranscribeScheduler
+from transcribe.provider.faster_whisper import FasterWhisperBlockTranscriber, warmup_whisper_model
+
+# python -m benchmark.stt_batch_bench [model_size_or_path]
+WHISPER_MODEL_CONFIG = {
+    "model_size_or_path": sys.argv[1] if len(sys.argv) > 1 else "large-v2",
+    "download_root": "./whisper_cache/"
+}
+SEGMENTS_PER_STREAM = 4
+SPEEDUP = 4.0 # Segments arrive this many times faster than real time
+BATCH_MAX_WAIT = 0.3
+
+
+async def stream(stt, rng, latencies, audio_seconds):
+    for _ in range(SEGMENTS_PER_STREAM):
+        seconds = rng.uniform(3.0, 12.0)
+        await asyncio.sleep(seconds / SPEEDUP)
+
+        audio = synthetic_speech(seconds, seed=int(rng.integers(1 << 30)))
+        t0 = time.perf_counter()
+        await stt.transcribe(audio, "", segment_max_no_speech_prob=0.75, segments_merge_fn=" ".join, language=None)
+        latencies.append(time.perf_counter() - t0)
+        audio_seconds.append(seconds)
+
+
+async def run(stt, n_streams):
+    latencies, audio_seconds = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        stream(stt, np.random.default_rng(i), latencies, audio_seconds) for i in range(n_streams)
+    ])
+    wall = time.perf_counter() - t0
+    stats = stt.stats()
+    stt.close()
+    return sum(audio_seconds) / wall, np.percentile(latencies, 50), np.percentile(latencies, 95), stats
+
+
+def main():
+    model = WhisperModel(**WHISPER_MODEL_CONFIG)
+    warmup_whisper_model(model)
+    transcriber = FasterWhisperBlockTranscriber(model=model)
+
+    print(f"model: {WHISPER_MODEL_CONFIG['model_size_or_path']}, {SEGMENTS_PER_STREAM} segments/stream, arrival x{SPEEDUP}")
+    print(f"{'streams':>7} {'mode':<12} {'audio s / s':>11} {'p50 s':>7} {'p95 s':>7} {'mean batch':>10}")
+    for n_streams in (1, 4, 16):
+        modes = (
+            ("sequential", lambda: AsyncBlockTranscriber(transcriber, max_inflight=64)),
+            ("batched", lambda: BatchedTranscribeScheduler(transcriber, max_batch_size=8, max_wait=BATCH_MAX_WAIT, max_inflight=64, streams=n_streams)),
+        )
+        for name, make_stt in modes:
+            throughput, p50, p95, stats = asyncio.run(run(make_stt(), n_streams))
+            print(f"{n_streams:>7} {name:<12} {throughput:>11.2f} {p50:>7.2f} {p95:>7.2f} {stats.get('mean_batch_size', 1.0):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from telegram.error import RetryAfter
+
+from translate.translation_context import estimate_tokens
+
+# Offline stand-ins for the Whisper model, the LLM provider and the Telegram bot.
+# They only simulate latency; timings come from the pipeline's own SegmentTraces.
+
+
+class _Segment:
+    def __init__(self, text):
+        self.text = text
+        self.no_speech_prob = 0.0
+        self.avg_logprob = -0.3
+        self.compression_ratio = 1.5
+
+
+class StubWhisperModel:
+    """Takes `realtime_factor` x the audio duration (blocking, like the real decoder) and returns one segment."""
+
+    def __init__(self, realtime_factor: float = 0.1, words_per_second: float = 2.5, sampling_rate: int = 16000):
+        self.realtime_factor = realtime_factor
+        self.words_per_second = words_per_second
+        self.sampling_rate = sampling_rate
+
+    def transcribe(self, audio, initial_prompt=None, language=None, **kwargs):
+        seconds = audio.shape[0] / self.sampling_rate
+        time.sleep(seconds * self.realtime_factor)
+        # Numbered words, so the hallucination filter does not take the text for a loop.
+        return [_Segment(" ".join(f"word{i}" for i in range(max(1, int(seconds * self.words_per_second)))))], None
+
+
+class StubLLMProvider:
+    """
+    Produces the first token after `base_latency` plus `per_char_latency`
+    per prompt character (source line plus context), then one word per
+    `token_latency`, streamed to `on_partial` if given. Reports estimated
+    token usage to the context like the real provider.
+    """
+
+    def __init__(self, base_latency: float = 0.4, per_char_latency: float = 0.002, token_latency: float = 0.03, cache=None):
+        self.base_latency = base_latency
+        self.per_char_latency = per_char_latency
+        self.token_latency = token_latency
+        self.cache = cache
+        self.inflight = 0
+        self.calls = 0
+
+    async def translate(self, src_text: str, context=None, on_partial=None) -> str:
+        if self.cache is not None:
+            return await self.cache.lookup(src_text, lambda text: self.translate_uncached(text, context, on_partial))
+        return await self.translate_uncached(src_text, context, on_partial)
+
+    async def translate_uncached(self, src_text: str, context=None, on_partial=None) -> str:
+        prompt = src_text
+        if context is not None and context.enabled:
+            prompt = "".join(message["content"] for message in context.messages()) + src_text
+        context_tokens = context.tokens if context is not None else 0
+
+        result = f"[translated] {src_text}"
+        words = result.split(" ")
+
+        self.calls += 1
+        self.inflight += 1
+        try:
+            await asyncio.sleep(self.base_latency + self.per_char_latency * len(prompt))
+            for i in range(len(words)):
+                if on_partial is not None:
+                    on_partial(" ".join(words[:i + 1]))
+                await asyncio.sleep(self.token_latency)
+        finally:
+            self.inflight -= 1
+
+        if context is not None:
+            context.record_call(estimate_tokens(prompt), 0, estimate_tokens(result), context_tokens)
+        return result
+
+
+class _Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class StubBot:
+    """
+    Takes `send_latency` per message or edit and only counts what it sends.
+    With `flood_limit`, a chat getting more than that many requests within a
+    second gets RetryAfter like from Telegram.
+    """
+
+    def __init__(self, send_latency: float = 0.05, flood_limit: int | None = None):
+        self.send_latency = send_latency
+        self.flood_limit = flood_limit
+        self.recent: dict[int, deque] = defaultdict(deque)
+        self.sent_messages = 0
+        self.edited_messages = 0
+        self.flood_errors = 0
+
+    def _check_flood(self, chat_id):
+        if self.flood_limit is None:
+            return
+        now = time.monotonic()
+        recent = self.recent[chat_id]
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        if len(recent) >= self.flood_limit:
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        recent.append(now)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._check_flood(chat_id)
+        await asyncio.sleep(self.send_latency)
+        self.sent_messages += 1
+        return _Message(self.sent_messages)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._check_flood(chat_id)
+        await asyncio.sleep(self.send_latency)
+        self.edited_messages += 1
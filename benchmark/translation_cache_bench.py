@@ -0,0 +1,69 @@
+import asyncio
+import os
+import random
+import tempfile
+
+from benchmark.stubs import StubLLMProvider
+from translate.translation_cache import TranslationCache
+
+# python -m benchmark.translation_cache_bench [transcript.txt]
+#
+# Feeds transcript lines (one per line, e.g. collected from the bot's logs)
+# through a TranslationCache in front of the stub LLM and reports how many
+# LLM calls it saves, then replays them as a second session to show the
+# disk tier. Without a file each session gets a synthetic stream transcript:
+# Zipf-distributed stock phrases written with varying punctuation and width,
+# mixed with lines that never repeat.
+
+LINES = 3000
+STOCK_SHARE = 0.3
+STOCK_PHRASES = [
+    "ありがとうございます", "こんばんは", "おやすみなさい", "よろしくお願いします", "すごい", "やばい",
+    "なるほど", "えーっと", "うんうん", "初見さんいらっしゃい", "スパチャありがとう", "おつかれさま",
+    "ちょっと待って", "本当に", "かわいい", "それではまた明日", "メンバーシップありがとうございます",
+    "今日の配信はここまで", "お疲れ様でした", "はいはい",
+]
+DECORATIONS = ["", "！", "。", "!", "～", "…", " ", "！！", "？"]
+
+
+def synthetic_transcript(session: int) -> list[str]:
+    rng = random.Random(session)
+    weights = [1 / (rank + 1) for rank in range(len(STOCK_PHRASES))]
+    lines = []
+    for i in range(LINES):
+        if rng.random() < STOCK_SHARE:
+            line = rng.choices(STOCK_PHRASES, weights)[0] + rng.choice(DECORATIONS)
+            lines.append(line if rng.random() < 0.8 else line.replace("!", "！").replace("～", "~"))
+        else:
+            lines.append(f"{session}回目の配信の{i}番目の話題について話します")
+    return lines
+
+
+async def run_session(lines: list[str], disk_path: str) -> dict:
+    cache = TranslationCache(disk_path=disk_path)
+    llm = StubLLMProvider(base_latency=0.0, per_char_latency=0.0, cache=cache)
+    for line in lines:
+        await llm.translate(line)
+    stats = cache.stats()
+    cache.close()
+    assert stats["llm_calls"] == llm.calls
+    return stats
+
+
+def main():
+    import sys
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            transcript = [line.strip() for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_path = os.path.join(tmp, "cache.sqlite3")
+        for session, name in enumerate(("first session", "second session")):
+            lines = transcript if len(sys.argv) > 1 else synthetic_transcript(session)
+            stats = asyncio.run(run_session(lines, disk_path))
+            print(f"{name:<15} {len(lines)} lines, {stats['llm_calls']} LLM calls, hit rate {stats['hit_rate']:.1%} "
+                  f"(memory {stats['memory_hits']}, disk {stats['disk_hits']}, uncacheable {stats['uncacheable']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import time
+import numpy as np
+import torch
+from silero_vad import load_silero_vad
+
+from streaming_vad import StreamingVAD
+
+
+def synthetic_speech(seconds, sampling_rate=16000, seed=0):
+    # Voiced bursts (harmonic tone with a syllable-rate envelope) over a noise floor.
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * sampling_rate) / sampling_rate
+    voiced = sum(np.sin(2 * np.pi * f0 * t) / k for k, f0 in enumerate((180, 360, 540), start=1))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.2 * t) > -0.3)
+    audio = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(t.shape)
+    return audio.astype(np.float32)
+
+
+def per_chunk(model, audio, samples_per_chunk=512):
+    # What the main loop did before: one dispatch, tensor and .item() sync per chunk.
+    probs = []
+    for i in range(0, audio.shape[0], samples_per_chunk):
+        audio_tensor = torch.from_numpy(audio[i:i + samples_per_chunk].astype('float32'))
+        probs.append(model(audio_tensor, 16000).item())
+    return np.array(probs)
+
+
+def streaming(model, audio, n_chunks, samples_per_chunk=512):
+    vad = StreamingVAD(model, max_chunks=n_chunks, samples_per_chunk=samples_per_chunk)
+    block = n_chunks * samples_per_chunk
+    return np.concatenate([vad(audio[i:i + block]) for i in range(0, audio.shape[0], block)])
+
+
+def main(seconds=60):
+    audio = synthetic_speech(seconds)
+    print(f"torch threads: {torch.get_num_threads()}, audio: {seconds}s")
+    print(f"{'mode':<14} {'cpu ms / audio s':>17} {'wall ms / audio s':>18} {'max |dp|':>9}")
+
+    model = load_silero_vad()
+    t_cpu, t_wall = time.process_time(), time.perf_counter()
+    reference = per_chunk(model, audio)
+    cpu, wall = time.process_time() - t_cpu, time.perf_counter() - t_wall
+    print(f"{'per-chunk':<14} {cpu * 1e3 / seconds:>17.2f} {wall * 1e3 / seconds:>18.2f} {0.0:>9.2g}")
+
+    for n_chunks in (1, 8, 32):
+        model.reset_states()
+        t_cpu, t_wall = time.process_time(), time.perf_counter()
+        probs = streaming(model, audio, n_chunks)
+        cpu, wall = time.process_time() - t_cpu, time.perf_counter() - t_wall
+        diff = np.abs(probs - reference).max()
+        print(f"{f'streaming x{n_chunks}':<14} {cpu * 1e3 / seconds:>17.2f} {wall * 1e3 / seconds:>18.2f} {diff:>9.2g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import numpy as np
+
+from audio_buffer import AudioBuffer
+
+
+class CutPlanner:
+    """
+    Places segment boundaries from an AudioBuffer's VAD timeline instead of
+    the bare silence counter.
+
+    `speech_start`  where a segment should begin: `lead_pad_samples` before
+                    its first speech chunk, so leading silence is not sent
+                    to Whisper.
+    `silence_cut`   where to split once the trailing silence is long enough:
+                    the quietest chunk in the middle half of the silence,
+                    rather than its exact middle.
+    `forced_cut`    where to split a segment that has grown past
+                    `max_segment_samples` without a long enough pause: the
+                    quietest chunk in its last `search_fraction`, preferring
+                    chunks below the VAD threshold. Keeps Whisper inputs and
+                    decode times bounded on monologues. None disables it.
+
+    Splits fall in the middle of the chosen chunk. All positions are buffer
+    samples.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.5,
+            lead_pad_samples: int = 3200,
+            max_segment_samples: int | None = 16000 * 25,
+            search_fraction: float = 0.3
+        ):
+        self.threshold = threshold
+        self.lead_pad_samples = lead_pad_samples
+        self.max_segment_samples = max_segment_samples
+        self.search_fraction = search_fraction
+
+    def _split_at(self, buffer: AudioBuffer, chunk: int) -> int:
+        position = buffer.chunk_start(chunk) + buffer.samples_per_chunk // 2
+        return min(max(position, 0), buffer.n_samples())
+
+    def _quietest(self, buffer: AudioBuffer, begin: int, end: int) -> int:
+        """Quietest chunk between buffer samples `begin` and `end`, favouring non-speech ones."""
+        first, last = buffer.chunk_at(begin), buffer.chunk_at(max(begin, end - 1)) + 1
+        energy = buffer.chunk_energy()[first:last]
+        if energy.shape[0] == 0:
+            return first
+        # Speech chunks only win when there is no non-speech chunk at all.
+        penalty = np.where(buffer.speech_probs()[first:last] >= self.threshold, np.inf, 0.0)
+        scores = energy + penalty
+        if np.isinf(scores).all():
+            scores = energy
+        return first + int(np.argmin(scores))
+
+    def speech_start(self, buffer: AudioBuffer) -> int:
+        speech = buffer.speech_probs() >= self.threshold
+        first = int(np.argmax(speech))
+        if first == 0 and not speech[:1].any():
+            return 0
+        return max(0, buffer.chunk_start(first) - self.lead_pad_samples)
+
+    def silence_cut(self, buffer: AudioBuffer, silence_samples: int) -> int:
+        """Split inside the trailing `silence_samples` of non-speech."""
+        silence_start = buffer.n_samples() - silence_samples
+        quarter = silence_samples // 4
+        return self._split_at(buffer, self._quietest(buffer, silence_start + quarter, buffer.n_samples() - quarter))
+
+    def forced_cut(self, buffer: AudioBuffer, start: int) -> int | None:
+        """Split for a segment starting at `start` that is too long, or None while it is not."""
+        if self.max_segment_samples is None or buffer.n_samples() - start <= self.max_segment_samples:
+            return None
+        end = start + self.max_segment_samples
+        begin = end - int(self.max_segment_samples * self.search_fraction)
+        return self._split_at(buffer, self._quietest(buffer, begin, end))
@@ -0,0 +1,272 @@
+import asyncio
+import datetime
+import logging
+import time
+from collections import deque
+
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import ExtBot
+
+from latency_trace import LatencyMetrics
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_CHARS = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` saved up. `pause` empties it until a deadline (Retry-After)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now <= self.updated:
+            return # Paused
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(max(self.paused_until - now, (1 - self.tokens) / self.rate))
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.paused_until)
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_CHARS) -> list[str]:
+    """Splits text longer than one Telegram message, preferring line breaks."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+class _Item:
+    def __init__(self, text: str, coalesce: bool = False, message: asyncio.Future | None = None, split: bool = False):
+        self.text = text
+        self.coalesce = coalesce
+        self.message = message # Set for edits: the future of the message being edited
+        self.split = split # For edits: send text past the first message as new messages instead of truncating it
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+    def resolve(self, result):
+        if not self.future.done():
+            self.future.set_result(result)
+
+
+class DeliveryScheduler:
+    """
+    Sends and edits Telegram messages through a token bucket per chat and a
+    global one, so bursts queue up instead of running into flood limits.
+
+    Each chat is served in FIFO order by its own worker task. When several
+    coalescible messages are waiting for a chat, they go out as one message
+    of up to 4096 characters; longer texts are split rather than truncated.
+    A pending edit of a message is replaced by a newer edit of the same
+    message. An edit with `split` puts the first 4096 characters in the
+    message and sends the rest as new messages right after it; other edits
+    are truncated, which suits progressive ones. On 429 the chat is paused for the Retry-After the API asks for
+    and the request is retried. Other errors are logged and the item
+    dropped, so failures do not turn into more traffic.
+
+    Telegram allows about one message per second in a chat, 20 per minute in
+    a group and 30 per second overall; the defaults stay a little under.
+    Delivery lag (enqueue to sent) goes to `metrics`.
+    """
+
+    def __init__(
+            self,
+            bot: ExtBot,
+            metrics: LatencyMetrics | None = None,
+            chat_rate: float = 1.0,
+            chat_burst: float = 3.0,
+            group_rate: float = 18 / 60,
+            group_burst: float = 3.0,
+            global_rate: float = 25.0,
+            global_burst: float = 25.0,
+            max_retries: int = 3
+        ):
+        self.bot = bot
+        self.metrics = metrics
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_buckets: dict[int, TokenBucket] = {}
+        self.queues: dict[int, deque[_Item]] = {}
+        self.pending_edits: dict[tuple[int, int], _Item] = {}
+        self.workers: dict[int, asyncio.Task] = {}
+
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.superseded_edits = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.max_lag = 0.0
+
+    def _enqueue(self, chat_id: int, item: _Item):
+        self.queues.setdefault(chat_id, deque()).append(item)
+        if chat_id not in self.workers or self.workers[chat_id].done():
+            self.workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+
+    def send(self, chat_id: int, text: str, coalesce: bool = True) -> asyncio.Future:
+        """Queues a message. The future resolves to the sent Message (or None if it failed)."""
+        item = _Item(text, coalesce)
+        self._enqueue(chat_id, item)
+        return item.future
+
+    def edit(self, chat_id: int, message: asyncio.Future, text: str, split: bool = False) -> asyncio.Future:
+        """Queues an edit of a message returned by `send`. A still-pending edit of the same message just gets the new text."""
+        key = (chat_id, id(message))
+        pending = self.pending_edits.get(key)
+        if pending is not None:
+            pending.text = text
+            pending.split = split
+            self.superseded_edits += 1
+            return pending.future
+        item = _Item(text, message=message, split=split)
+        self.pending_edits[key] = item
+        self._enqueue(chat_id, item)
+        return item.future
+
+    def broadcast(self, chat_ids, text: str) -> asyncio.Future:
+        """Queues `text` to every chat; the future resolves once all of them are done."""
+        return asyncio.gather(*(self.send(chat_id, text) for chat_id in chat_ids))
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            if chat_id < 0:
+                self.chat_buckets[chat_id] = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return self.chat_buckets[chat_id]
+
+    def _take(self, queue: deque[_Item]) -> list[_Item]:
+        items = [queue.popleft()]
+        if not items[0].coalesce:
+            return items
+        length = len(items[0].text)
+        while queue and queue[0].coalesce and length + len(COALESCE_SEPARATOR) + len(queue[0].text) <= MAX_MESSAGE_CHARS:
+            length += len(COALESCE_SEPARATOR) + len(queue[0].text)
+            items.append(queue.popleft())
+        return items
+
+    async def _call(self, chat_id: int, bucket: TokenBucket, request):
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await request()
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, datetime.timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.rate_limited += 1
+                logger.warning(f"Rate limited in chat {chat_id}, retrying after {retry_after}s (attempt {attempt + 1}/{self.max_retries + 1})")
+                bucket.pause(retry_after)
+        raise RuntimeError(f"Still rate limited after {self.max_retries + 1} attempts")
+
+    async def _deliver(self, chat_id: int, bucket: TokenBucket, items: list[_Item]):
+        if items[0].message is not None:
+            item = items[0]
+            del self.pending_edits[(chat_id, id(item.message))]
+            message = None if item.message.cancelled() else item.message.result()
+            if message is None:
+                item.resolve(None)
+                return
+            parts = split_message(item.text) if item.split else [item.text[:MAX_MESSAGE_CHARS]]
+            try:
+                await self._call(chat_id, bucket, lambda: self.bot.edit_message_text(text=parts[0], chat_id=chat_id, message_id=message.message_id))
+            except BadRequest as e:
+                if "not modified" not in str(e):
+                    raise
+            self.edited += 1
+            for part in parts[1:]:
+                await self._call(chat_id, bucket, lambda: self.bot.send_message(chat_id=chat_id, text=part))
+                self.sent += 1
+            item.resolve(message)
+            return
+
+        text = COALESCE_SEPARATOR.join(item.text for item in items)
+        message = None
+        for part in split_message(text):
+            message = await self._call(chat_id, bucket, lambda: self.bot.send_message(chat_id=chat_id, text=part))
+        self.sent += 1
+        self.coalesced += len(items) - 1
+        for item in items:
+            item.resolve(message)
+
+    async def _worker(self, chat_id: int):
+        queue = self.queues[chat_id]
+        bucket = self._bucket(chat_id)
+        while queue:
+            items = self._take(queue)
+            try:
+                await self._deliver(chat_id, bucket, items)
+            except Exception as e:
+                self.failed += len(items)
+                logger.error(f"Failed to deliver to chat {chat_id}: {e}")
+                for item in items:
+                    item.resolve(None)
+                continue
+            now = time.monotonic()
+            for item in items:
+                lag = now - item.enqueued_at
+                self.max_lag = max(self.max_lag, lag)
+                if self.metrics is not None:
+                    self.metrics.observe_delivery(lag)
+
+    def backlog(self, chat_ids=None) -> int:
+        """Requests waiting to go out, in total or for the busiest of `chat_ids`."""
+        if chat_ids is None:
+            return sum(len(queue) for queue in self.queues.values())
+        return max((len(self.queues.get(chat_id, ())) for chat_id in chat_ids), default=0)
+
+    async def join(self, timeout: float | None = None):
+        """Waits until everything queued so far has been delivered (or `timeout` passes)."""
+        workers = [task for task in self.workers.values() if not task.done()]
+        if workers:
+            await asyncio.wait(workers, timeout=timeout)
+
+    def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        for queue in self.queues.values():
+            for item in queue:
+                item.future.cancel()
+            queue.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self.backlog(),
+            "sent": self.sent,
+            "edited": self.edited,
+            "coalesced": self.coalesced,
+            "superseded_edits": self.superseded_edits,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "max_lag_seconds": self.max_lag,
+        }
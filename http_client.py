@@ -0,0 +1,205 @@
+import asyncio
+import inspect
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def _close_result(result):
+    """Closes a response nobody will read (e.g. a stream that lost a hedge race), so its pooled connection is released."""
+    close = getattr(result, "aclose", None) or getattr(result, "close", None)
+    if close is None:
+        return
+    try:
+        closed = close()
+        if inspect.isawaitable(closed):
+            await closed
+    except Exception as e:
+        logger.debug(f"Closing an unused response failed: {e}")
+
+
+class ClientPool:
+    """
+    Process-wide HTTP clients for the remote LLM and STT providers.
+
+    Every provider pointing at the same endpoint shares one AsyncOpenAI
+    client and so one keep-alive connection pool. The OpenAI client's own
+    retries are turned off; RequestPolicy handles retries and deadlines.
+    """
+
+    def __init__(self, max_connections: int = 32, max_keepalive_connections: int = 16, keepalive_expiry: float = 60.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.openai_clients: dict[tuple[str, str], AsyncOpenAI] = {}
+
+    def openai(self, base_url: str, api_key: str) -> AsyncOpenAI:
+        key = (base_url, api_key)
+        if key not in self.openai_clients:
+            self.openai_clients[key] = AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=self.limits, timeout=httpx.Timeout(None, connect=10.0))
+            )
+        return self.openai_clients[key]
+
+    async def aclose(self):
+        for client in self.openai_clients.values():
+            await client.close()
+        self.openai_clients.clear()
+
+
+client_pool = ClientPool()
+
+
+def is_retryable(e: Exception) -> bool:
+    """Timeouts, connection errors, 408, 429 and 5xx are worth another try; other errors are not."""
+    if isinstance(e, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if type(e).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+class RequestPolicy:
+    """
+    Runs a remote request with a per-attempt timeout, an overall deadline and
+    retries with full-jitter exponential backoff.
+
+    With `hedge`, a duplicate request is sent if the first one has not
+    answered after the `hedge_quantile` of recent latencies (once
+    `hedge_min_samples` are known); the first answer wins and the other is
+    cancelled. Hedging trades a few extra requests for a shorter tail, so it
+    is meant for idempotent calls such as translation and transcription.
+
+    Latencies are kept per `window` passed to `run`, so calls that measure
+    different things (e.g. time to the headers of a streamed response vs.
+    time to a full completion) do not share a hedge delay.
+    """
+
+    def __init__(
+            self,
+            attempt_timeout: float = 30.0,
+            deadline: float = 60.0,
+            max_attempts: int = 3,
+            backoff_base: float = 0.5,
+            backoff_max: float = 8.0,
+            hedge: bool = False,
+            hedge_quantile: float = 95.0,
+            hedge_min_samples: int = 20,
+            retryable: Callable[[Exception], bool] = is_retryable
+        ):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+
+        self.latencies: dict[str, deque] = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def hedge_delay(self, window: str = "default") -> float | None:
+        latencies = self.latencies.get(window, ())
+        if not self.hedge or len(latencies) < self.hedge_min_samples:
+            return None
+        return float(np.percentile(latencies, self.hedge_quantile))
+
+    async def _timed(self, make_request: Callable[[], Awaitable[T]], window: str) -> T:
+        t0 = time.monotonic()
+        result = await make_request()
+        self.latencies.setdefault(window, deque(maxlen=200)).append(time.monotonic() - t0)
+        return result
+
+    async def _hedged(self, make_request: Callable[[], Awaitable[T]], window: str) -> T:
+        delay = self.hedge_delay(window)
+        primary = asyncio.ensure_future(self._timed(make_request, window))
+        tasks = [primary]
+        winner = None
+        # Everything below runs under the finally, so a caller cancelled (or
+        # timed out) at any point never leaves a request running orphaned.
+        try:
+            if delay is None:
+                winner = primary
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                winner = primary
+                return primary.result()
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._timed(make_request, window))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        winner = task
+                        return task.result()
+                if not pending:
+                    # Both failed: surface the primary's error.
+                    return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif task is not winner and not task.cancelled() and task.exception() is None:
+                    # Finished in the same step as the winner: too late to cancel, so close what it returned.
+                    await _close_result(task.result())
+
+    async def run(self, make_request: Callable[[], Awaitable[T]], window: str = "default") -> T:
+        """
+        `make_request` is called once per attempt (and hedge) and must return
+        a fresh awaitable. `window` names the latency window it is timed in.
+        """
+        self.requests += 1
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                return await asyncio.wait_for(self._hedged(make_request, window), timeout)
+            except Exception as e:
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                last_attempt = attempt == self.max_attempts - 1 or time.monotonic() + backoff >= deadline
+                if last_attempt or not self.retryable(e):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.warning(f"Request failed ({type(e).__name__}: {e}), retrying in {backoff:.2f}s (attempt {attempt + 2}/{self.max_attempts})")
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "hedge_delay": {window: self.hedge_delay(window) for window in self.latencies},
+        }
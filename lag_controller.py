@@ -0,0 +1,81 @@
+import math
+import time
+
+# Degradation steps, mildest first. Each level also applies every level before it.
+#   skip_silence     send only a short pad of silence around speech to STT
+#   greedy_decoding  decode with beam_size=1
+#   merge_segments   translate everything queued as one request
+#   drop_stale       drop segments that are already further behind than the last threshold
+LEVELS = ("normal", "skip_silence", "greedy_decoding", "merge_segments", "drop_stale")
+SKIP_SILENCE, GREEDY_DECODING, MERGE_SEGMENTS, DROP_STALE = 1, 2, 3, 4
+
+
+class LagController:
+    """
+    Maps how far a session has fallen behind the live edge to a degradation
+    level.
+
+    `thresholds[i]` is the lag in seconds at which level i + 1 kicks in. The
+    level goes down (more degraded) as soon as the lag crosses a threshold,
+    and back up one step at a time once the lag has stayed below
+    `recover_ratio` x the current level's threshold for `min_dwell` seconds.
+    With `thresholds=None` it never degrades.
+    """
+
+    def __init__(self, thresholds=(15.0, 30.0, 60.0, 90.0), recover_ratio: float = 0.5, min_dwell: float = 10.0):
+        if thresholds is None:
+            thresholds = (math.inf,) * (len(LEVELS) - 1)
+        if len(thresholds) != len(LEVELS) - 1 or list(thresholds) != sorted(thresholds):
+            raise ValueError(f"Expected {len(LEVELS) - 1} increasing thresholds, got {thresholds}")
+
+        self.thresholds = tuple(thresholds)
+        self.recover_ratio = recover_ratio
+        self.min_dwell = min_dwell
+
+        self.level = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.below_since = None
+        self.step_downs = 0
+
+    @property
+    def name(self) -> str:
+        return LEVELS[self.level]
+
+    @property
+    def stale_after(self) -> float:
+        return self.thresholds[-1]
+
+    def update(self, lag: float, now: float | None = None) -> tuple[int, int] | None:
+        """Feeds the current lag. Returns (old level, new level) when the level changes."""
+        now = time.monotonic() if now is None else now
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+        target = sum(lag >= threshold for threshold in self.thresholds)
+        if target > self.level:
+            old, self.level = self.level, target
+            self.below_since = None
+            self.step_downs += target - old
+            return old, self.level
+
+        if self.level == 0 or lag >= self.thresholds[self.level - 1] * self.recover_ratio:
+            self.below_since = None
+            return None
+
+        if self.below_since is None:
+            self.below_since = now
+        if now - self.below_since < self.min_dwell:
+            return None
+
+        old, self.level = self.level, self.level - 1
+        self.below_since = None
+        return old, self.level
+
+    def stats(self) -> dict:
+        return {
+            "level": self.name,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "step_downs": self.step_downs,
+        }
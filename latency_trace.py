@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Marks a segment passes through, in pipeline order.
+#   audio_read        last speech chunk of the segment was read from the audio source
+#   vad_cut           VAD decided the utterance ended
+#   stt_queued        segment handed to the transcriber
+#   stt_start/end     decode started / finished
+#   translate_queued  transcript handed to the translate worker, in order
+#   llm_start/end     translation request sent / answered
+#   llm_first_token   first streamed token of the translation arrived (streaming only)
+#   first_text_sent   some translated text is visible in the chats (streaming: first edit)
+#   sent              message delivered to every subscribed chat
+STAGES = (
+    ("vad", "audio_read", "vad_cut"),
+    ("stt_queue", "stt_queued", "stt_start"),
+    ("stt", "stt_start", "stt_end"),
+    ("transcript_order", "stt_end", "translate_queued"),
+    ("translate_queue", "translate_queued", "llm_start"),
+    ("llm", "llm_start", "llm_end"),
+    ("llm_first_token", "llm_start", "llm_first_token"),
+    ("delivery", "llm_end", "sent"),
+    ("end_to_end", "audio_read", "sent"),
+    ("end_to_first_text", "audio_read", "first_text_sent"),
+)
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+class SegmentTrace:
+    """
+    Monotonic timestamps of one segment. The first mark of each name wins, so
+    a stage can be marked from several places and only the earliest counts.
+    Safe to mark from executor threads.
+    """
+
+    def __init__(self, room_id=None):
+        self.room_id = room_id
+        self.marks: dict[str, float] = {}
+
+    def mark(self, name: str, at: float | None = None):
+        self.marks.setdefault(name, time.monotonic() if at is None else at)
+
+    def durations(self) -> dict[str, float]:
+        return {
+            stage: self.marks[end] - self.marks[begin]
+            for stage, begin, end in STAGES
+            if begin in self.marks and end in self.marks
+        }
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram (as Prometheus expects) plus a window of recent values for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self, qs=(50, 95)) -> list[float]:
+        if not self.recent:
+            return [0.0 for _ in qs]
+        return list(np.percentile(self.recent, qs))
+
+
+class LatencyMetrics:
+    """
+    Collects finished SegmentTraces into one histogram per stage, and the
+    token spend of each LLM call (prompt tokens and the share of them taken
+    by translation context). Exporters (Prometheus text, periodic log
+    summaries) read from it.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1024):
+        self.histograms = {stage: LatencyHistogram(buckets, window) for stage, begin, end in STAGES}
+        self.segments = 0
+
+        self.prompt_tokens = LatencyHistogram(TOKEN_BUCKETS, window)
+        self.context_tokens = LatencyHistogram(TOKEN_BUCKETS, window)
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+
+        self.delivery_lag = LatencyHistogram(buckets, window)
+
+        self.gate_checked = 0
+        self.gate_rejected = 0
+
+    def observe(self, trace: SegmentTrace):
+        self.segments += 1
+        for stage, seconds in trace.durations().items():
+            self.histograms[stage].observe(seconds)
+
+    def observe_llm_call(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int, context_tokens: int):
+        self.prompt_tokens.observe(prompt_tokens)
+        self.context_tokens.observe(context_tokens)
+        self.cached_prompt_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+
+    def observe_delivery(self, lag_seconds: float):
+        """Time a message or edit waited in the delivery scheduler, rate limiting included."""
+        self.delivery_lag.observe(lag_seconds)
+
+    def observe_gate(self, rejected: bool):
+        """One VAD segment screened by the pre-STT speech gate."""
+        self.gate_checked += 1
+        self.gate_rejected += rejected
+
+    def token_summary(self) -> dict:
+        if not self.prompt_tokens.count:
+            return {}
+        prompt_p50, prompt_p95 = self.prompt_tokens.quantiles((50, 95))
+        return {
+            "calls": self.prompt_tokens.count,
+            "prompt_p50": prompt_p50,
+            "prompt_p95": prompt_p95,
+            "context_p50": self.context_tokens.quantiles((50,))[0],
+            "cached_share": self.cached_prompt_tokens / self.prompt_tokens.sum if self.prompt_tokens.sum else 0.0,
+            "completion_total": self.completion_tokens,
+        }
+
+    @staticmethod
+    def _render_histogram(lines: list[str], name: str, histogram: LatencyHistogram, labels: str = ""):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f'{name}_sum{suffix} {histogram.sum}')
+        lines.append(f'{name}_count{suffix} {histogram.count}')
+
+    def summary(self) -> dict[str, dict]:
+        result = {}
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                p50, p95 = histogram.quantiles((50, 95))
+                result[stage] = {"count": histogram.count, "p50": p50, "p95": p95, "max": max(histogram.recent)}
+        if self.delivery_lag.count:
+            p50, p95 = self.delivery_lag.quantiles((50, 95))
+            result["delivery_lag"] = {"count": self.delivery_lag.count, "p50": p50, "p95": p95, "max": max(self.delivery_lag.recent)}
+        return result
+
+    def render_prometheus(self, prefix: str = "livetrans") -> str:
+        name = f"{prefix}_stage_latency_seconds"
+        lines = [
+            f"# HELP {name} Time a segment spent in each pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in self.histograms.items():
+            self._render_histogram(lines, name, histogram, f'stage="{stage}"')
+
+        for metric, histogram, help_text in (
+            ("delivery_lag_seconds", self.delivery_lag, "Time Telegram messages and edits waited for the rate limiter."),
+            ("llm_prompt_tokens", self.prompt_tokens, "Prompt tokens of each translation request, as reported by the provider."),
+            ("llm_context_tokens", self.context_tokens, "Estimated tokens of translation context in each request."),
+        ):
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} histogram"]
+            self._render_histogram(lines, f"{prefix}_{metric}", histogram)
+
+        for metric, value, help_text in (
+            ("llm_cached_prompt_tokens_total", self.cached_prompt_tokens, "Prompt tokens served from the provider's prompt cache."),
+            ("llm_completion_tokens_total", self.completion_tokens, "Completion tokens of translation requests."),
+            ("stt_gate_checked_total", self.gate_checked, "VAD segments screened by the speech gate before STT."),
+            ("stt_gate_rejected_total", self.gate_rejected, "VAD segments the speech gate kept away from STT."),
+        ):
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} counter", f"{prefix}_{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+async def serve_prometheus(metrics: LatencyMetrics, host: str = "127.0.0.1", port: int = 9464):
+    """Answers every HTTP request on host:port with `metrics` in Prometheus text format. Runs until cancelled."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = metrics.render_prometheus().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Serving latency metrics on http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
+
+
+async def log_summaries(metrics: LatencyMetrics, interval: float = 300.0):
+    """Logs p50 / p95 / max of every stage each `interval` seconds. Runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        summary = metrics.summary()
+        if not summary:
+            continue
+        logger.info(
+            f"Latency ({metrics.segments} segments traced): " + ", ".join(
+                f"{stage} p50 {s['p50']:.2f}s p95 {s['p95']:.2f}s max {s['max']:.2f}s"
+                for stage, s in summary.items()
+            )
+        )
+        tokens = metrics.token_summary()
+        if tokens:
+            logger.info(
+                f"LLM tokens ({tokens['calls']} calls): prompt p50 {tokens['prompt_p50']:.0f} p95 {tokens['prompt_p95']:.0f}, "
+                f"context p50 {tokens['context_p50']:.0f}, {tokens['cached_share']:.0%} of prompt tokens cached, "
+                f"{tokens['completion_total']} completion tokens"
+            )
+        if metrics.gate_checked:
+            logger.info(
+                f"Speech gate: {metrics.gate_rejected} of {metrics.gate_checked} segments rejected before STT "
+                f"({metrics.gate_rejected / metrics.gate_checked:.0%})"
+            )
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from delivery_scheduler import DeliveryScheduler
+from latency_trace import SegmentTrace
+
+
+def format_translation(src_text: str, result: str) -> str:
+    return f"{src_text}\n---\n{result}"
+
+
+class LiveMessage:
+    """
+    One segment's message in every subscribed chat, posted as a placeholder
+    with the source text as soon as the transcript is ready and edited as the
+    translation streams in.
+
+    `update` may be called for every token: it only records the latest text,
+    and a background task queues an edit at most once per
+    `min_edit_interval` seconds. `finish` queues the final text. Sends and
+    edits go through the DeliveryScheduler, which keeps them in order per
+    chat and within Telegram's rate limits.
+    """
+
+    def __init__(self, delivery: DeliveryScheduler, chat_ids, src_text: str, trace: SegmentTrace | None = None, min_edit_interval: float = 1.0):
+        self.delivery = delivery
+        self.chat_ids = list(chat_ids)
+        self.src_text = src_text
+        self.trace = trace
+        self.min_edit_interval = min_edit_interval
+
+        self.messages: dict[int, asyncio.Future] = {}
+        self.shown_text: str | None = None
+        self.partial: str | None = None
+        self.dirty = asyncio.Event()
+        self.editor: asyncio.Task | None = None
+        self.last_edit = 0.0
+        self.edits = 0
+
+    def post(self):
+        text = format_translation(self.src_text, "…")
+        for chat_id in self.chat_ids:
+            self.messages[chat_id] = self.delivery.send(chat_id, text, coalesce=False)
+        self.shown_text = text
+        self.last_edit = time.monotonic()
+        self.editor = asyncio.create_task(self._edit_loop())
+
+    def update(self, partial: str):
+        if self.trace is not None:
+            self.trace.mark("llm_first_token")
+        self.partial = partial
+        self.dirty.set()
+
+    def _mark_shown(self, _):
+        if self.trace is not None:
+            self.trace.mark("first_text_sent")
+
+    def _edit(self, text: str, split: bool = False) -> asyncio.Future | None:
+        if text == self.shown_text or not self.messages:
+            return None
+        edits = asyncio.gather(*(
+            self.delivery.edit(chat_id, message, text, split=split) for chat_id, message in self.messages.items()
+        ))
+        self.shown_text = text
+        self.last_edit = time.monotonic()
+        self.edits += 1
+        return edits
+
+    async def _edit_loop(self):
+        while True:
+            await self.dirty.wait()
+            await asyncio.sleep(max(0.0, self.last_edit + self.min_edit_interval - time.monotonic()))
+            self.dirty.clear()
+            edits = self._edit(format_translation(self.src_text, self.partial + " …"))
+            if edits is not None:
+                edits.add_done_callback(self._mark_shown)
+
+    def cancel(self):
+        if self.editor is not None:
+            self.editor.cancel()
+
+    def finish(self, text: str) -> asyncio.Future:
+        """
+        Stops progressive edits and queues `text` (the full translation or an
+        error) in place of the placeholder. Text past one message's length
+        follows as new messages.
+        """
+        self.cancel()
+        edits = self._edit(text, split=True)
+        if edits is None:
+            edits = asyncio.gather(*self.messages.values())
+        return edits
@@ -0,0 +1,829 @@
+import asyncio
+import copy
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from telegram.ext import ExtBot
+
+from audio_buffer import AudioBuffer
+from cut_planner import CutPlanner
+from delivery_scheduler import DeliveryScheduler
+from live_message import LiveMessage, format_translation
+from lag_controller import LEVELS, SKIP_SILENCE, GREEDY_DECODING, MERGE_SEGMENTS, DROP_STALE, LagController
+from latency_trace import LatencyMetrics, SegmentTrace
+from model_registry import ModelRegistry
+from music_detector import MusicDetector
+from speech_gate import SpeechGate
+from streaming_vad import StreamingVAD
+from transcribe.async_transcriber import AsyncBlockTranscriber, AsyncTranscribeStream
+from transcribe.batch_scheduler import BatchedTranscribeScheduler
+from transcribe.hallucination_filter import HallucinationFilter
+from transcribe.overlap_stitch import stitch_overlap
+from transcribe.provider.faster_whisper import FasterWhisperBlockTranscriber, WhisperTranscribeStream
+from translate.llm_translate import OpenAICompatibleLLMProvider
+from translate.ordered_pipeline import OrderedTranslatePipeline
+from translate.translation_context import TranslationContext
+
+logger = logging.getLogger(__name__)
+
+SILENCE_PAD_SAMPLES = 4800 # Silence kept around speech once the session starts skipping silence
+STREAMING_MAX_DELIVERY_BACKLOG = 1 # Queued Telegram requests above which translations are sent whole instead of streamed
+
+
+class RoomSession:
+    """
+    One ffmpeg -> VAD -> STT -> translation pipeline for a room, fanned out to
+    every subscribed chat.
+
+    `config` keys: ffmpeg_path, vad_threshold, vad_cut_off_samples,
+    min_speech_samples, vad_samples_per_chunk, vad_batch_chunks,
+    translate_concurrency, translate_max_pending, translate_context_tokens,
+    translate_streaming, translate_edit_interval, stt_streaming,
+    stt_stream_iter_samples, lag_thresholds, speculative_cut_samples,
+    music_detection, music_action, hallucination_filter, speech_gate,
+    max_segment_samples, segment_overlap_samples, idle_reset_samples,
+    hibernate_samples.
+
+    With `stt_streaming`, the room is transcribed by a WhisperTranscribeStream
+    that emits each sentence as soon as it is confirmed, instead of waiting
+    for the VAD cut; the cut then only flushes the rest of the utterance.
+
+    A LagController watches how far the room is behind the live edge (unread
+    audio + queued STT audio + age of the oldest untranslated transcript) and
+    degrades the pipeline step by step, see lag_controller.LEVELS. Every step
+    down is announced to the room's chats.
+
+    With `speculative_cut_samples` (block mode only), decoding starts as soon
+    as that much silence follows enough speech. If the silence lasts until
+    the real cut, that early result is used; if speech resumes first, it is
+    cancelled and the utterance goes on. A cancelled decode that has already
+    started still runs to the end, its result is discarded.
+
+    Each line is translated with the room's recent translations as context,
+    up to `translate_context_tokens` (0 translates lines on their own).
+
+    With `translate_streaming`, each transcript is posted at once with a
+    placeholder, and the LLM's streamed output is edited into it at most
+    every `translate_edit_interval` seconds. While Telegram delivery is
+    backed up, translations are sent whole instead so they can be merged.
+
+    With `music_detection` (block mode), segments a MusicDetector flags as
+    music or singing are not transcribed. With `music_action="mark"` the
+    chats get a short note when music starts, with "drop" nothing.
+
+    Cuts are placed by a CutPlanner from the VAD probabilities and chunk
+    energies the AudioBuffer keeps: at the quietest point of a pause, without
+    leading silence, and, in block mode, at the quietest point near
+    `max_segment_samples` when speech runs on without a pause (None for no
+    limit). The segment after such a split starts `segment_overlap_samples`
+    before it, so words cut in half are heard whole once; the words both
+    transcripts share are removed from the second by stitch_overlap.
+
+    After `idle_reset_samples` of unbroken non-speech, the room drops what it
+    carries over between utterances: Silero's state, the buffered silence
+    (and arenas grown during long speech) and the streaming transcriber's
+    prompt. After `hibernate_samples` (an offline or paused stream), it also
+    releases its transcriber, so the Whisper model can be evicted once no
+    room holds it, and only runs the VAD until speech resumes; the
+    transcriber is then acquired again before the audio is buffered. None
+    disables either step.
+
+    With `speech_gate`, a SpeechGate screens every VAD segment before STT
+    (speech ratio, SNR against the room's noise floor, level) and noisy
+    segments unlikely to hold speech are not decoded.
+
+    With `hallucination_filter`, transcripts go through the manager's
+    HallucinationFilter: per segment inside the block transcriber, per
+    sentence in streaming mode. Rejected text is never translated or sent.
+    """
+
+    def __init__(self, manager: "SessionManager", room_id: int):
+        self.manager = manager
+        self.room_id = room_id
+        self.config = manager.config
+
+        self.chat_ids: set[int] = set()
+        self.task: asyncio.Task | None = None
+        self.stopping = False
+
+        self.lag = LagController(self.config["lag_thresholds"])
+        self.untranslated: dict[int, SegmentTrace] = {} # Transcripts queued for translation, oldest first
+        self.merged_segments = 0
+        self.dropped_segments = 0
+        self.speculation_hits = 0
+        self.speculation_misses = 0
+        self.forced_cuts = 0
+        self.stitched_segments = 0
+        self.idle_resets = 0
+        self.hibernations = 0
+        self.overlapped: set[int] = set() # id(trace) of segments starting with the tail of the previous one
+        self.context: TranslationContext | None = None
+        self.live_messages: dict[int, LiveMessage] = {} # Streaming placeholders by id(trace), until delivered
+        self.music = MusicDetector() if self.config["music_detection"] else None
+        self.in_music = False
+        self.gate = SpeechGate(
+            threshold=self.config["vad_threshold"],
+            samples_per_chunk=self.config["vad_samples_per_chunk"]
+        ) if self.config["speech_gate"] else None
+        self.cut_planner = CutPlanner(
+            threshold=self.config["vad_threshold"],
+            max_segment_samples=self.config["max_segment_samples"]
+        )
+
+    def broadcast(self, text: str) -> asyncio.Future:
+        """Queues `text` to every subscribed chat without waiting for it to be sent; the future resolves once it is."""
+        return self.manager.delivery.broadcast(self.chat_ids, text)
+
+    def on_sent(self, trace: SegmentTrace, sent: asyncio.Future):
+        if sent.cancelled():
+            return
+        trace.mark("first_text_sent")
+        trace.mark("sent")
+        self.manager.metrics.observe(trace)
+
+    async def translate_worker(self, queue: asyncio.Queue[tuple[str, SegmentTrace] | None]):
+        """Worker task to fetch text from queue, translate concurrently, and send to subscribers in order."""
+        room_id = self.room_id
+        logger.info(f"Translate worker started for room {room_id}")
+        self.context = TranslationContext(self.config["translate_context_tokens"], self.manager.metrics)
+
+        async def deliver(src_text: str, result: str | None, error: Exception | None, trace: SegmentTrace | None):
+            self.untranslated.pop(id(trace), None)
+            live = self.live_messages.pop(id(trace), None)
+            if error is not None:
+                logger.error(f"Error translating for room {room_id}: {error}", exc_info=error)
+                if live is not None:
+                    live.finish(format_translation(src_text, f"An error occurred during translation: {error}"))
+                else:
+                    self.broadcast(f"An error occurred during translation: {error}")
+                return
+
+            logger.info(f"Translation result for room {room_id}: {result[:50]}...")
+            self.context.add(src_text, result)
+
+            message_text = format_translation(src_text, result)
+            sent = live.finish(message_text) if live is not None else self.broadcast(message_text)
+            if trace is not None:
+                sent.add_done_callback(lambda sent, trace=trace: self.on_sent(trace, sent))
+
+        pipeline = OrderedTranslatePipeline(
+            lambda src_text, **kwargs: self.manager.llm_provider.translate(src_text, context=self.context, **kwargs),
+            deliver,
+            concurrency=self.config["translate_concurrency"],
+            max_pending=self.config["translate_max_pending"]
+        )
+
+        try:
+            while True:
+                item = await queue.get()
+                try:
+                    if item is None:
+                        logger.info(f"Translate worker for room {room_id} received stop signal.")
+                        break
+
+                    src_text, trace = item
+                    stop = False
+                    if self.lag.level >= MERGE_SEGMENTS:
+                        src_text, stop = self.take_queued(queue, src_text)
+
+                    if not src_text.strip():
+                        logger.info("Skipping empty source text.")
+                        self.untranslated.pop(id(trace), None)
+                        continue
+
+                    logger.info(f"Translating for room {room_id}: {src_text[:50]}... (pipeline: {pipeline.stats()})")
+                    # A placeholder and its edits cannot be merged with other messages, so stream only while delivery keeps up.
+                    if self.config["translate_streaming"] and self.manager.delivery.backlog(self.chat_ids) <= STREAMING_MAX_DELIVERY_BACKLOG:
+                        live = LiveMessage(self.manager.delivery, self.chat_ids, src_text, trace, self.config["translate_edit_interval"])
+                        self.live_messages[id(trace)] = live
+                        live.post()
+                        await pipeline.submit(src_text, trace, on_partial=live.update)
+                    else:
+                        await pipeline.submit(src_text, trace)
+                    if stop:
+                        logger.info(f"Translate worker for room {room_id} received stop signal.")
+                        break
+                finally:
+                    queue.task_done()
+
+            await pipeline.join()
+
+        except asyncio.CancelledError:
+            logger.info(f"Translate worker for room {room_id} cancelled.")
+            pipeline.cancel()
+            for live in self.live_messages.values():
+                live.cancel()
+            self.live_messages.clear()
+        if self.manager.llm_provider.cache is not None:
+            logger.info(f"Translate worker finished for room {room_id} (context: {self.context.stats()}, cache: {self.manager.llm_provider.cache.stats()})")
+        else:
+            logger.info(f"Translate worker finished for room {room_id} (context: {self.context.stats()})")
+
+    def take_queued(self, queue: asyncio.Queue[tuple[str, SegmentTrace] | None], src_text: str) -> tuple[str, bool]:
+        """
+        Appends every transcript already waiting in `queue` to `src_text`, so
+        they are translated as one request. Returns the merged text and whether
+        the stop signal was among them.
+        """
+        texts, stop = [src_text], False
+        while not queue.empty():
+            item = queue.get_nowait()
+            queue.task_done()
+            if item is None:
+                stop = True
+                break
+            texts.append(item[0])
+            self.untranslated.pop(id(item[1]), None)
+
+        self.merged_segments += len(texts) - 1
+        return " ".join(texts), stop
+
+    def lag_seconds(self, livestream, async_stt, stream_stt) -> float:
+        audio_lag = livestream.audio_buffer.backlog_seconds()
+        if async_stt is not None:
+            stt_lag = async_stt.backlog_seconds()
+        elif stream_stt is not None:
+            stt_lag = stream_stt.pending_samples / 16000
+        else:
+            stt_lag = 0.0 # Hibernating
+        translate_lag = 0.0
+        if self.untranslated:
+            oldest = next(iter(self.untranslated.values()))
+            translate_lag = time.monotonic() - oldest.marks["translate_queued"]
+        return audio_lag + stt_lag + translate_lag
+
+    async def report_lag_change(self, old: int, new: int, stream_stt: AsyncTranscribeStream | None):
+        if stream_stt is not None:
+            stream_stt.stream.beam_size = 1 if new >= GREEDY_DECODING else 5
+
+        if new > old:
+            logger.warning(f"Room {self.room_id} is {self.lag.lag:.1f}s behind, degrading: {LEVELS[old]} -> {LEVELS[new]} ({self.lag.stats()})")
+            self.broadcast(f"⚠️ Room {self.room_id} is {self.lag.lag:.0f}s behind the live stream, degrading to: {LEVELS[new]}.")
+        else:
+            logger.info(f"Room {self.room_id} lag is down to {self.lag.lag:.1f}s, recovering: {LEVELS[old]} -> {LEVELS[new]}")
+
+    async def acquire_transcriber(self) -> tuple[AsyncBlockTranscriber | BatchedTranscribeScheduler | None, AsyncTranscribeStream | None]:
+        """The room's transcriber as (block, streaming), one of them None. Pair with `release_transcriber`."""
+        if not self.config["stt_streaming"]:
+            return await self.manager.acquire_stt(), None
+        stream_stt = AsyncTranscribeStream(
+            WhisperTranscribeStream(model=await self.manager.model_registry.acquire_async("whisper")),
+            iter_samples=self.config["stt_stream_iter_samples"],
+            executor=self.manager.stream_executor
+        )
+        stream_stt.stream.beam_size = 1 if self.lag.level >= GREEDY_DECODING else 5
+        return None, stream_stt
+
+    async def release_transcriber(self, async_stt, stream_stt):
+        if async_stt:
+            await self.manager.release_stt()
+
+        if stream_stt:
+            stream_stt.close()
+            self.manager.model_registry.release("whisper")
+
+    def check_music(self, audio, commit: bool = True) -> bool:
+        """
+        Whether `audio` is music. Only a committed segment is counted in the
+        detector, moves `in_music` and may tell the chats; a speculative look
+        changes nothing.
+        """
+        if self.music is None:
+            return False
+        if not commit:
+            return self.music.classify(audio)
+
+        was_music, self.in_music = self.in_music, self.music.is_music(audio)
+        if self.in_music:
+            logger.info(f"Skipping {audio.shape[0] / 16000:.2f}s of music from room {self.room_id} ({self.music.stats()})")
+            if not was_music and self.config["music_action"] == "mark":
+                self.broadcast("🎵 [music]")
+        return self.in_music
+
+    async def submit_segment(self, async_stt, livestream, audio, trace: SegmentTrace, speculative: bool = False) -> asyncio.Future | None:
+        """
+        Queues `audio` for STT. Committed music segments resolve to an empty
+        transcript without a decode; speculative ones return None instead.
+        """
+        if self.check_music(audio, commit=not speculative):
+            if speculative:
+                return None
+            skipped = asyncio.get_running_loop().create_future()
+            skipped.set_result("")
+            return skipped
+
+        stt_stats = async_stt.stats()
+        logger.info(
+            f"Transcribing {audio.shape[0] / 16000:.2f}s of audio from room {self.room_id} "
+            f"(STT inflight: {stt_stats['inflight']}, backlog: {stt_stats['backlog_seconds']:.2f}s, "
+            f"audio backlog: {livestream.audio_buffer.backlog_seconds():.2f}s)..."
+        )
+        trace.mark("stt_queued")
+        return await async_stt.submit(
+            audio,
+            "",
+            segment_max_no_speech_prob=0.75,
+            segments_merge_fn=lambda x: " ".join(x),
+            language=None,
+            beam_size=1 if self.lag.level >= GREEDY_DECODING else 5,
+            trace=trace
+        )
+
+    def passes_gate(self, audio_buffer: AudioBuffer, start: int, end: int) -> bool:
+        """Whether the speech gate (if any) lets buffer samples `start:end` through to STT. Counted in the gate and the metrics."""
+        if self.gate is None:
+            return True
+        chunks = slice(audio_buffer.chunk_at(start), audio_buffer.chunk_at(end - 1) + 1)
+        passed = self.gate.check(audio_buffer.speech_probs()[chunks], audio_buffer.chunk_energy()[chunks])
+        self.manager.metrics.observe_gate(rejected=not passed)
+        if passed:
+            return True
+        logger.info(f"Speech gate rejected {(end - start) / 16000:.2f}s of audio from room {self.room_id} ({self.gate.stats()})")
+        return False
+
+    def speculation_stats(self) -> dict:
+        attempts = self.speculation_hits + self.speculation_misses
+        return {
+            "hits": self.speculation_hits,
+            "misses": self.speculation_misses,
+            "hit_rate": self.speculation_hits / attempts if attempts else 0.0,
+        }
+
+    async def transcript_worker(
+        self,
+        queue: asyncio.Queue[tuple[asyncio.Future, SegmentTrace] | None],
+        translate_queue: asyncio.Queue[tuple[str, SegmentTrace] | None]
+    ):
+        """Worker task to await transcriptions in submission order and forward them for translation."""
+        room_id = self.room_id
+        previous = "" # Transcript of the previous segment, for overlap stitching
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                break
+
+            transcript_future, trace = item
+            overlapped = id(trace) in self.overlapped
+            self.overlapped.discard(id(trace))
+            try:
+                transcript = await transcript_future
+                trace.mark("stt_end")
+                logger.info(f"Transcript (Room {room_id}): '{transcript}'")
+                if overlapped:
+                    stitched = stitch_overlap(previous, transcript)
+                    if stitched != transcript:
+                        self.stitched_segments += 1
+                        logger.info(f"Stitched overlap (Room {room_id}): '{stitched}'")
+                    previous, transcript = transcript, stitched
+                else:
+                    previous = transcript
+                if self.manager.hallucination_filter is not None and self.config["stt_streaming"] and transcript:
+                    # Block transcripts were already filtered segment by segment in the transcriber.
+                    transcript = self.manager.hallucination_filter.check(transcript) or ""
+                if (
+                    self.lag.level >= DROP_STALE and "audio_read" in trace.marks
+                    and time.monotonic() - trace.marks["audio_read"] > self.lag.stale_after
+                ):
+                    self.dropped_segments += 1
+                    logger.warning(f"Dropping stale transcript from room {room_id} ({self.dropped_segments} dropped so far).")
+                elif transcript and transcript.strip():
+                    trace.mark("translate_queued")
+                    self.untranslated[id(trace)] = trace
+                    await translate_queue.put((transcript.strip(), trace))
+                else:
+                     logger.warning(f"Empty transcript received from room {room_id}, skipping.")
+            except asyncio.CancelledError:
+                logger.info(f"Transcript worker for room {room_id} cancelled.")
+                break
+            except Exception as e:
+                logger.error(f"Transcription error (Room {room_id}): {e}", exc_info=True)
+                self.broadcast(f"Transcription error for room {room_id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def run(self):
+        room_id = self.room_id
+        config = self.config
+
+        translate_queue: asyncio.Queue[tuple[str, SegmentTrace] | None] = asyncio.Queue()
+        transcript_queue: asyncio.Queue[tuple[asyncio.Future, SegmentTrace] | None] = asyncio.Queue()
+        livestream = None
+        translate_task = None
+        transcript_task = None
+        async_stt = None
+        stream_stt = None
+        speculation = None
+        vad_acquired = False
+
+        try:
+            logger.info(f"Starting live translation process for room {room_id}")
+
+            translate_task = asyncio.create_task(self.translate_worker(translate_queue))
+
+            logger.info("Loading VAD model...")
+            # The weights are shared, but Silero keeps per-stream state, so each session gets its own copy.
+            vad_model = copy.deepcopy(await self.manager.model_registry.acquire_async("silero_vad"))
+            vad_acquired = True
+            samples_per_chunk = config["vad_samples_per_chunk"]
+            streaming_vad = StreamingVAD(vad_model, max_chunks=config["vad_batch_chunks"], samples_per_chunk=samples_per_chunk)
+            vad_config = {
+                "threshold": config["vad_threshold"],
+                "cut_off_samples": config["vad_cut_off_samples"],
+            }
+            logger.info("VAD model loaded.")
+
+            logger.info("Initializing transcriber...")
+            async_stt, stream_stt = await self.acquire_transcriber()
+            transcript_task = asyncio.create_task(self.transcript_worker(transcript_queue, translate_queue))
+            logger.info("Transcriber initialized.")
+
+            logger.info(f"Connecting to room {room_id}...")
+            livestream = self.manager.stream_factory(room_id)
+            await livestream.spin_ffmpeg(ffmpeg_path=config["ffmpeg_path"])
+            logger.info(f"Connected to room {room_id} and ffmpeg started.")
+
+            audio_buffer = AudioBuffer(samples_per_chunk=samples_per_chunk)
+            cont_non_speech = 0
+            idle_samples = 0 # Unbroken non-speech, unlike cont_non_speech not reset by cuts
+            idle_reset_at = config["idle_reset_samples"] or float("inf")
+            hibernate_at = config["hibernate_samples"] or float("inf")
+            hibernating = False
+            speech_read_at = None # When the last chunk above the VAD threshold was read
+            speculative_cut = config["speculative_cut_samples"] if stream_stt is None else None
+            music_pause = False # This pause's audio looked like music, so no speculative decode is tried for it
+            overlap_pending = False # The last segment was split off mid-speech and sent; the next one overlaps it
+
+            self.broadcast(f"✅ Live translation started for room {room_id}!")
+
+            while True:
+                audio_block = await livestream.read_audio(config["vad_batch_chunks"])
+                read_at = time.monotonic()
+                if audio_block is None:
+                    logger.warning(f"Received None from audio stream (room {room_id}), ending loop.")
+                    self.broadcast(f"Stream from room {room_id} seems to have ended.")
+                    break
+
+                skip_silence = self.lag.level >= SKIP_SILENCE
+                speech_probs = streaming_vad(audio_block)
+                if self.gate is not None:
+                    self.gate.observe(audio_block, speech_probs)
+                for chunk_idx, speech_prob in enumerate(speech_probs.tolist()):
+                    audio = audio_block[chunk_idx * samples_per_chunk:(chunk_idx + 1) * samples_per_chunk]
+                    if hibernating:
+                        if speech_prob < vad_config["threshold"]:
+                            continue
+                        logger.info(f"Speech resumed in room {room_id}, reacquiring the transcriber.")
+                        # The ffmpeg ring keeps buffering meanwhile, nothing is lost unless loading takes longer than it holds.
+                        async_stt, stream_stt = await self.acquire_transcriber()
+                        hibernating = False
+                    audio_buffer.submit(audio, speech_prob)
+
+                    if speech_prob < vad_config["threshold"]:
+                        cont_non_speech += len(audio)
+                        idle_samples += len(audio)
+                    else:
+                        cont_non_speech = 0
+                        idle_samples = 0
+                        speech_read_at = read_at
+                        music_pause = False
+                        if speculation is not None:
+                            # Speech resumed before the cut, the early decode is wasted.
+                            speculation[0].cancel()
+                            speculation = None
+                            self.speculation_misses += 1
+
+                    if stream_stt is not None and not (skip_silence and cont_non_speech > SILENCE_PAD_SAMPLES):
+                        stream_stt.submit_audio(audio)
+
+                    if skip_silence and stream_stt is None and SILENCE_PAD_SAMPLES < cont_non_speech == audio_buffer.n_samples():
+                        # Nothing but silence buffered: drop it in bulk instead of waiting for the cut.
+                        audio_buffer.trim_head(cont_non_speech - SILENCE_PAD_SAMPLES)
+                        cont_non_speech = SILENCE_PAD_SAMPLES
+
+                    start = self.cut_planner.speech_start(audio_buffer)
+
+                    if (
+                        speculative_cut is not None and speculation is None and not music_pause and self.lag.level == 0
+                        and speculative_cut < cont_non_speech <= vad_config["cut_off_samples"]
+                        and audio_buffer.n_samples() - cont_non_speech - start >= config["min_speech_samples"]
+                        and (self.gate is None or self.gate.passes(audio_buffer.speech_probs(), audio_buffer.chunk_energy()))
+                    ):
+                        # Not while lagging: misses cost extra decodes.
+                        trace = SegmentTrace(room_id)
+                        trace.mark("audio_read", speech_read_at)
+                        speculative_audio = audio_buffer.as_nparray()[start:].copy()
+                        speculative_future = await self.submit_segment(async_stt, livestream, speculative_audio, trace, speculative=True)
+                        if speculative_future is not None:
+                            speculation = (speculative_future, trace, speculative_audio)
+                        else:
+                            music_pause = True
+
+                    forced_split = self.cut_planner.forced_cut(audio_buffer, start) if stream_stt is None else None
+                    if cont_non_speech > vad_config["cut_off_samples"] or forced_split is not None:
+                        if cont_non_speech > vad_config["cut_off_samples"] and skip_silence:
+                            # A short pad of silence on each side of the cut.
+                            end = audio_buffer.n_samples() - cont_non_speech + SILENCE_PAD_SAMPLES
+                            split = audio_buffer.n_samples() - SILENCE_PAD_SAMPLES
+                        elif cont_non_speech > vad_config["cut_off_samples"]:
+                            end = split = self.cut_planner.silence_cut(audio_buffer, cont_non_speech)
+                        else:
+                            # Speech ran on without a long enough pause: split at its quietest point, and start the next segment a bit before it.
+                            end = forced_split
+                            split = max(start, end - config["segment_overlap_samples"])
+                            self.forced_cuts += 1
+                            if speculation is not None:
+                                speculation[0].cancel()
+                                speculation = None
+                                self.speculation_misses += 1
+                        speech_samples = min(end, audio_buffer.n_samples() - cont_non_speech) - start
+                        transcribe = speech_samples >= config["min_speech_samples"] and self.passes_gate(audio_buffer, start, end)
+                        if speculation is not None and not transcribe:
+                            # Started before the gate saw the whole segment.
+                            speculation[0].cancel()
+                            speculation = None
+                        trace = SegmentTrace(room_id) if speculation is None else speculation[1]
+                        if speech_read_at is not None:
+                            trace.mark("audio_read", speech_read_at)
+                        trace.mark("vad_cut")
+                        if overlap_pending and stream_stt is None and (speculation is not None or transcribe):
+                            self.overlapped.add(id(trace))
+                        overlap_pending = False
+                        if speculation is not None:
+                            self.speculation_hits += 1
+                            # Counted only now that the speculative audio is the committed segment (it was not music when started).
+                            self.check_music(speculation[2])
+                            await transcript_queue.put(speculation[:2])
+                            speculation = None
+                        elif stream_stt is not None:
+                            # Sentences already emitted by poll() are queued ahead of the flush, so order holds.
+                            trace.mark("stt_queued")
+                            await transcript_queue.put((stream_stt.flush(discard=not transcribe), trace))
+                        elif (
+                            self.lag.level >= DROP_STALE
+                            and transcribe
+                            and async_stt.backlog_seconds() > self.lag.stale_after
+                        ):
+                            self.dropped_segments += 1
+                            logger.warning(f"STT backlog too long, dropping segment from room {room_id} ({self.dropped_segments} dropped so far).")
+                        elif transcribe:
+                            # Copy: the buffer keeps being written while the segment is decoded.
+                            speech_audio_np = audio_buffer.as_nparray()[start:end].copy()
+                            transcript_future = await self.submit_segment(async_stt, livestream, speech_audio_np, trace)
+                            await transcript_queue.put((transcript_future, trace))
+                            overlap_pending = forced_split is not None and cont_non_speech <= vad_config["cut_off_samples"]
+
+                        audio_buffer.trim_head(split)
+                        cont_non_speech = min(cont_non_speech, audio_buffer.n_samples())
+
+                    if idle_samples - len(audio) < idle_reset_at <= idle_samples:
+                        # Long silence: nothing said before it helps with what comes after.
+                        streaming_vad.reset()
+                        audio_buffer.trim_head(max(0, audio_buffer.n_samples() - SILENCE_PAD_SAMPLES))
+                        audio_buffer.shrink()
+                        cont_non_speech = audio_buffer.n_samples()
+                        if stream_stt is not None:
+                            stream_stt.reset()
+                        self.idle_resets += 1
+                        logger.info(f"Room {room_id} idle for {idle_samples / 16000:.0f}s, state reset.")
+
+                    if idle_samples - len(audio) < hibernate_at <= idle_samples:
+                        audio_buffer.clear()
+                        audio_buffer.shrink()
+                        cont_non_speech = 0
+                        await self.release_transcriber(async_stt, stream_stt)
+                        async_stt, stream_stt = None, None
+                        hibernating = True
+                        self.hibernations += 1
+                        logger.info(f"Room {room_id} idle for {idle_samples / 16000:.0f}s, hibernating until speech resumes.")
+
+                if stream_stt is not None:
+                    for sentence in stream_stt.poll():
+                        sentence_future = asyncio.get_running_loop().create_future()
+                        sentence_future.set_result(sentence)
+                        trace = SegmentTrace(room_id)
+                        trace.mark("stt_end")
+                        await transcript_queue.put((sentence_future, trace))
+
+                change = self.lag.update(self.lag_seconds(livestream, async_stt, stream_stt))
+                if change is not None:
+                    await self.report_lag_change(*change, stream_stt)
+
+        except asyncio.CancelledError:
+            logger.info(f"Live translation task cancelled for room {room_id}.")
+            self.broadcast(f"⏹️ Live translation stopped for room {room_id}.")
+        except Exception as e:
+            logger.error(f"Error in live translation task for room {room_id}: {e}", exc_info=True)
+            self.broadcast(f"❌ An error occurred in the live translation process for room {room_id}: {e}")
+        finally:
+            logger.info(f"Cleaning up resources for room {room_id}...")
+            if speculation is not None:
+                speculation[0].cancel()
+            if config["speculative_cut_samples"] is not None:
+                logger.info(f"Speculative transcription for room {room_id}: {self.speculation_stats()}")
+            if self.music is not None:
+                realtime_factor = async_stt.stats()["realtime_factor"] if async_stt is not None else 0.0
+                logger.info(
+                    f"Music detection for room {room_id}: {self.music.stats()}, "
+                    f"~{self.music.music_seconds * realtime_factor:.1f}s of STT decode saved"
+                )
+            if self.gate is not None:
+                logger.info(f"Speech gate for room {room_id}: {self.gate.stats()}")
+            if self.forced_cuts:
+                logger.info(
+                    f"Room {room_id}: {self.forced_cuts} segments split at max_segment_samples, "
+                    f"{self.stitched_segments} overlaps stitched"
+                )
+            if self.idle_resets:
+                logger.info(f"Room {room_id}: {self.idle_resets} idle resets, {self.hibernations} hibernations")
+            if self.manager.hallucination_filter is not None:
+                logger.info(f"Hallucination filter (all rooms): {self.manager.hallucination_filter.stats()}")
+            if livestream:
+                logger.info(f"Stopping ffmpeg for room {room_id}...")
+                try:
+                    await asyncio.wait_for(livestream.stop_ffmpeg(), timeout=5.0)
+                except Exception as e:
+                    logger.error(f"Error stopping ffmpeg (room {room_id}): {e}", exc_info=True)
+
+            if transcript_task:
+                if not transcript_task.done():
+                    await transcript_queue.put(None)
+                try:
+                    await asyncio.wait_for(transcript_task, timeout=60.0)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timeout waiting for pending transcriptions (room {room_id}). Cancelling them.")
+                    transcript_task.cancel()
+                except Exception as e:
+                     logger.error(f"Error waiting for transcript worker (room {room_id}): {e}")
+
+            await self.release_transcriber(async_stt, stream_stt)
+
+            if vad_acquired:
+                self.manager.model_registry.release("silero_vad")
+
+            if translate_task and not translate_task.done():
+                try:
+                    await translate_queue.put(None)
+                except Exception as qe:
+                     logger.error(f"Error putting None sentinel in queue for room {room_id}: {qe}")
+
+            if translate_task:
+                try:
+                    logger.info(f"Waiting for translate worker to finish for room {room_id}...")
+                    await asyncio.wait_for(translate_task, timeout=10.0)
+                    logger.info(f"Translate worker finished gracefully for room {room_id}.")
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timeout waiting for translate worker (room {room_id}). Cancelling it.")
+                    translate_task.cancel()
+                except asyncio.CancelledError:
+                     logger.info(f"Translate worker (room {room_id}) was already cancelled.")
+                except Exception as e:
+                     logger.error(f"Error waiting for translate worker (room {room_id}): {e}")
+
+
+class SessionManager:
+    """
+    Keeps one RoomSession per room, however many chats subscribe to it, and
+    one transcriber shared by all sessions.
+
+    A session starts with its first subscriber and is stopped when the last
+    one leaves. The shared transcriber holds the registry's "whisper" model
+    while at least one session is running. With `stt_batch_size` > 1 it is a
+    BatchedTranscribeScheduler that decodes segments from all rooms together
+    (while only one room runs, segments are decoded as they come, unbatched),
+    otherwise segments are decoded one at a time.
+
+    Every segment carries a SegmentTrace that is collected into `metrics`
+    once its translation has been sent.
+
+    With `config["hallucination_filter"]`, one HallucinationFilter is shared
+    by the transcriber and all streaming sessions, so its counters cover
+    every room.
+
+    All messages go out through one DeliveryScheduler (by default one
+    created with the default Telegram rate limits), shared by all rooms.
+    """
+
+    def __init__(
+            self,
+            bot: ExtBot,
+            stream_factory: Callable,
+            llm_provider: OpenAICompatibleLLMProvider,
+            model_registry: ModelRegistry,
+            config: dict,
+            stt_max_inflight: int = 2,
+            stt_batch_size: int = 1,
+            stt_batch_max_wait: float = 0.3,
+            metrics: LatencyMetrics | None = None,
+            delivery: DeliveryScheduler | None = None
+        ):
+        self.bot = bot
+        self.stream_factory = stream_factory
+        self.llm_provider = llm_provider
+        self.model_registry = model_registry
+        self.config = config
+        self.stt_max_inflight = stt_max_inflight
+        self.stt_batch_size = stt_batch_size
+        self.stt_batch_max_wait = stt_batch_max_wait
+        self.metrics = metrics if metrics is not None else LatencyMetrics()
+        self.delivery = delivery if delivery is not None else DeliveryScheduler(bot, self.metrics)
+        self.hallucination_filter = HallucinationFilter() if config["hallucination_filter"] else None
+
+        self.sessions: dict[int, RoomSession] = {}
+
+        self.stt: AsyncBlockTranscriber | BatchedTranscribeScheduler | None = None
+        self.stt_users = 0
+        self.stt_lock = asyncio.Lock()
+
+        # Streaming sessions run their incremental decodes here, one at a time across rooms.
+        self.stream_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-stream")
+
+    async def acquire_stt(self) -> AsyncBlockTranscriber | BatchedTranscribeScheduler:
+        async with self.stt_lock:
+            if self.stt is None:
+                model = await self.model_registry.acquire_async("whisper")
+                transcriber = FasterWhisperBlockTranscriber(model=model, hallucination_filter=self.hallucination_filter)
+                if self.stt_batch_size > 1:
+                    self.stt = BatchedTranscribeScheduler(
+                        transcriber,
+                        max_batch_size=self.stt_batch_size,
+                        max_wait=self.stt_batch_max_wait,
+                        max_inflight=self.stt_max_inflight
+                    )
+                else:
+                    self.stt = AsyncBlockTranscriber(transcriber, max_inflight=self.stt_max_inflight)
+            self.stt_users += 1
+            if isinstance(self.stt, BatchedTranscribeScheduler):
+                self.stt.streams = self.stt_users
+            return self.stt
+
+    async def release_stt(self):
+        async with self.stt_lock:
+            self.stt_users -= 1
+            if self.stt_users == 0:
+                self.stt.close()
+                self.stt = None
+                self.model_registry.release("whisper")
+            elif isinstance(self.stt, BatchedTranscribeScheduler):
+                self.stt.streams = self.stt_users
+
+    def subscribe(self, room_id: int, chat_id: int) -> bool:
+        """Adds `chat_id` to the room's session, starting it if needed. Returns False if already subscribed."""
+        session = self.sessions.get(room_id)
+        if session is None or session.stopping:
+            session = RoomSession(self, room_id)
+            session.chat_ids.add(chat_id)
+            self.sessions[room_id] = session
+
+            logger.info(f"Starting session for room {room_id}.")
+            session.task = asyncio.create_task(session.run())
+            session.task.add_done_callback(lambda task: self._on_session_done(session, task))
+            return True
+
+        if chat_id in session.chat_ids:
+            return False
+
+        session.chat_ids.add(chat_id)
+        logger.info(f"Chat {chat_id} joined running session for room {room_id} ({len(session.chat_ids)} chats).")
+        return True
+
+    def unsubscribe(self, room_id: int, chat_id: int) -> bool:
+        """Removes `chat_id` from the room's session and stops it if nobody is left."""
+        session = self.sessions.get(room_id)
+        if session is None or session.stopping or chat_id not in session.chat_ids:
+            return False
+
+        session.chat_ids.discard(chat_id)
+        if not session.chat_ids and session.task and not session.task.done():
+            logger.info(f"Last chat left room {room_id}, stopping its session.")
+            session.stopping = True
+            session.task.cancel()
+        return True
+
+    def rooms_for_chat(self, chat_id: int) -> list[int]:
+        return [
+            room_id for room_id, session in self.sessions.items()
+            if not session.stopping and chat_id in session.chat_ids
+        ]
+
+    async def stop_all(self):
+        tasks = [session.task for session in self.sessions.values() if session.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.delivery.join(timeout=10.0)
+        logger.info(f"Delivery: {self.delivery.stats()}")
+        self.delivery.close()
+
+    def _on_session_done(self, session: RoomSession, task: asyncio.Task):
+        try:
+            exception = task.exception()
+            if exception:
+                logger.error(f"Session for room {session.room_id} failed with exception: {exception}", exc_info=exception)
+        except asyncio.CancelledError:
+            logger.info(f"Session for room {session.room_id} was cancelled.")
+        finally:
+            if self.sessions.get(session.room_id) is session:
+                del self.sessions[session.room_id]
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], warmup: Callable[[Any], None] | None):
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.refcount = 0
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of heavy models shared by all sessions.
+
+    Models are registered by key with a loader and are loaded lazily on first
+    `acquire`. Every `acquire` must be paired with a `release`; a model nobody
+    holds is evicted once it has been idle for `idle_timeout` seconds
+    (None keeps it forever).
+    """
+
+    def __init__(self, idle_timeout: float | None = 600.0):
+        self.idle_timeout = idle_timeout
+        self.entries: dict[str, _Entry] = {}
+
+    def register(self, key: str, loader: Callable[[], Any], warmup: Callable[[Any], None] | None = None):
+        if key in self.entries:
+            raise ValueError(f"Model {key!r} is already registered")
+        self.entries[key] = _Entry(loader, warmup)
+
+    def _load(self, entry: _Entry, take_ref: bool = False):
+        with entry.lock:
+            if entry.model is None:
+                model = entry.loader()
+                if entry.warmup is not None:
+                    entry.warmup(model)
+                entry.model = model
+                entry.last_used = time.monotonic()
+            if take_ref:
+                entry.refcount += 1
+                entry.last_used = time.monotonic()
+            return entry.model
+
+    def acquire(self, key: str):
+        return self._load(self.entries[key], take_ref=True)
+
+    async def acquire_async(self, key: str):
+        """Same as `acquire`, but loads the model off the event loop."""
+        return await asyncio.to_thread(self._load, self.entries[key], True)
+
+    def release(self, key: str):
+        entry = self.entries[key]
+        with entry.lock:
+            if entry.refcount <= 0:
+                raise RuntimeError(f"Model {key!r} released more often than acquired")
+            entry.refcount -= 1
+            entry.last_used = time.monotonic()
+
+    def preload(self, *keys: str):
+        """Loads (and warms up) models ahead of the first session."""
+        for key in keys or list(self.entries):
+            self._load(self.entries[key])
+
+    async def preload_async(self, *keys: str):
+        await asyncio.to_thread(self.preload, *keys)
+
+    def is_loaded(self, key: str) -> bool:
+        return self.entries[key].model is not None
+
+    def evict_idle(self, now: float | None = None) -> list[str]:
+        if self.idle_timeout is None:
+            return []
+
+        now = time.monotonic() if now is None else now
+        evicted = []
+        for key, entry in self.entries.items():
+            with entry.lock:
+                if entry.model is not None and entry.refcount == 0 and now - entry.last_used >= self.idle_timeout:
+                    entry.model = None
+                    evicted.append(key)
+        return evicted
+
+    async def run_idle_eviction(self, interval: float = 60.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def stats(self) -> dict:
+        return {
+            key: {"loaded": entry.model is not None, "refcount": entry.refcount}
+            for key, entry in self.entries.items()
+        }
+
+
+registry = ModelRegistry()
@@ -1,19 +1,20 @@
-import asyncio
 import requests
-import numpy as np
-from queue import SimpleQueue
+
+from net_stream.pcm_ingest import FFmpegPCMReader, PCMRing
 
 class BilibiliLive:
-    def __init__(self, room_id):
+    def __init__(self, room_id, buffer_seconds: float = 60.0, overflow: str = "drop_oldest"):
+        # Audio not yet consumed is kept up to `buffer_seconds`; see PCMRing for the overflow policies.
         self.room_id = room_id
+        self.buffer_seconds = buffer_seconds
+        self.overflow = overflow
         def default_read_audio():
             raise RuntimeError("You should call spin_ffmpeg first.")
         
         self.default_read_audio = default_read_audio
         self.read_audio = default_read_audio
 
-        self.process = None
-        self.reader_task = None
+        self.reader = None
         
         self.ua = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/59.0.3071.115 Safari/537.36"
         self.stream_play_url = "http://api.live.bilibili.com/room/v1/Room/playUrl"
@@ -44,45 +45,20 @@ class BilibiliLive:
             "pipe:1"
         ]
 
-        self.audio_buffer = asyncio.Queue()
-        self.process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-
-        bytes_per_chunk = 2 * samples_per_chunk
-
-        async def reader_worker():
-            while True:
-                buf = bytearray()
-
-                while len(buf) < bytes_per_chunk:
-                    piece = await self.process.stdout.read(bytes_per_chunk - len(buf))
-                    if not piece: break
-                    buf.extend(piece)
-
-                if not buf: break
-
-                await self.audio_buffer.put(bytes(buf))
-
-        self.reader_task = asyncio.create_task(reader_worker())
+        self.audio_buffer = PCMRing(int(self.buffer_seconds * sampling_rate), overflow=self.overflow, sampling_rate=sampling_rate)
+        self.reader = FFmpegPCMReader(command, self.audio_buffer)
+        await self.reader.start()
 
         async def read_audio(n_chunk=1):
-            chunks = [await self.audio_buffer.get() for _ in range(n_chunk)]
-            arrays = [np.frombuffer(c, dtype=np.int16) for c in chunks]
-            return np.concatenate(arrays).astype(np.float32) / 32768.0
+            # A view that is only valid until the next call; None once ffmpeg has exited.
+            return await self.audio_buffer.read(n_chunk * samples_per_chunk)
 
         self.read_audio = read_audio
 
     async def stop_ffmpeg(self):
-        if self.process is not None:
-            self.process.terminate()
-            await self.process.wait()
-            self.process = None
-        if self.reader_task is not None:
-            await self.reader_task
-            self.reader_task = None
+        if self.reader is not None:
+            await self.reader.stop()
+            self.reader = None
             
         self.read_audio = self.default_read_audio
 
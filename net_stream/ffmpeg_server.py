@@ -1,20 +1,21 @@
-import asyncio
 import requests
-import numpy as np
-from queue import SimpleQueue
+
+from net_stream.pcm_ingest import FFmpegPCMReader, PCMRing
 
 class FFmpegServer:
-    def __init__(self, bind_ip: str, bind_port: int):
+    def __init__(self, bind_ip: str, bind_port: int, buffer_seconds: float = 60.0, overflow: str = "drop_oldest"):
+        # Audio not yet consumed is kept up to `buffer_seconds`; see PCMRing for the overflow policies.
         self.ip = bind_ip
         self.port = bind_port
+        self.buffer_seconds = buffer_seconds
+        self.overflow = overflow
         def default_read_audio():
             raise RuntimeError("You should call spin_ffmpeg first.")
         
         self.default_read_audio = default_read_audio
         self.read_audio = default_read_audio
 
-        self.process = None
-        self.reader_task = None
+        self.reader = None
 
     async def spin_ffmpeg(self, ffmpeg_path: str, sampling_rate=16000, samples_per_chunk=512):
         command = [
@@ -28,45 +29,20 @@ class FFmpegServer:
             "pipe:1"
         ]
 
-        self.audio_buffer = asyncio.Queue()
-        self.process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.DEVNULL
-        )
-
-        bytes_per_chunk = 2 * samples_per_chunk
-
-        async def reader_worker():
-            while True:
-                buf = bytearray()
-
-                while len(buf) < bytes_per_chunk:
-                    piece = await self.process.stdout.read(bytes_per_chunk - len(buf))
-                    if not piece: break
-                    buf.extend(piece)
-
-                if not buf: break
-
-                await self.audio_buffer.put(bytes(buf))
-
-        self.reader_task = asyncio.create_task(reader_worker())
+        self.audio_buffer = PCMRing(int(self.buffer_seconds * sampling_rate), overflow=self.overflow, sampling_rate=sampling_rate)
+        self.reader = FFmpegPCMReader(command, self.audio_buffer)
+        await self.reader.start()
 
         async def read_audio(n_chunk=1):
-            chunks = [await self.audio_buffer.get() for _ in range(n_chunk)]
-            arrays = [np.frombuffer(c, dtype=np.int16) for c in chunks]
-            return np.concatenate(arrays).astype(np.float32) / 32768.0
+            # A view that is only valid until the next call; None once ffmpeg has exited.
+            return await self.audio_buffer.read(n_chunk * samples_per_chunk)
 
         self.read_audio = read_audio
 
     async def stop_ffmpeg(self):
-        if self.process is not None:
-            self.process.terminate()
-            await self.process.wait()
-            self.process = None
-        if self.reader_task is not None:
-            await self.reader_task
-            self.reader_task = None
+        if self.reader is not None:
+            await self.reader.stop()
+            self.reader = None
             
         self.read_audio = self.default_read_audio
 
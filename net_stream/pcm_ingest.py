@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import subprocess
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PCM_SCALE = np.float32(1 / 32768)
+
+
+class PCMRing:
+    """
+    Bounded ring of s16le PCM shared by the audio sources.
+
+    A producer thread fills it with `readinto_from` (straight from a pipe, no
+    intermediate bytes) or `write`; the event loop consumes it with `read`,
+    which converts a whole block to float32 in one vectorized pass into a
+    reused output buffer.
+
+    When full, `overflow="drop_oldest"` discards the oldest unread audio (the
+    consumer falls behind by at most `capacity_samples`) and `overflow="block"`
+    makes the producer wait for the consumer.
+    """
+
+    def __init__(self, capacity_samples: int = 16000 * 60, overflow: str = "drop_oldest", sampling_rate: int = 16000, max_read_samples: int = 4096):
+        if overflow not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+
+        self.capacity = capacity_samples
+        self.overflow = overflow
+        self.sampling_rate = sampling_rate
+        self.max_read_bytes = 2 * max_read_samples
+
+        self.raw = bytearray(2 * capacity_samples)
+        self.pcm = np.frombuffer(self.raw, dtype=np.int16)
+        self.out = np.empty(0, dtype=np.float32)
+
+        # Totals since creation; positions in the ring are taken modulo its size.
+        self.written_bytes = 0
+        self.read_samples = 0
+        self.dropped_samples = 0
+        self.closed = False
+
+        self.cond = threading.Condition()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.data_ready: asyncio.Event | None = None
+
+    def available(self) -> int:
+        return self.written_bytes // 2 - self.read_samples
+
+    def backlog_seconds(self) -> float:
+        return self.available() / self.sampling_rate
+
+    def _free_bytes(self) -> int:
+        return len(self.raw) - (self.written_bytes - 2 * self.read_samples)
+
+    def _reserve(self, max_bytes: int) -> int:
+        # Called with the lock held. Returns how many bytes can be written contiguously at the write position.
+        need = min(max_bytes, len(self.raw) - self.written_bytes % len(self.raw))
+        while self._free_bytes() < need and not self.closed:
+            if self.overflow == "block":
+                self.cond.wait()
+            else:
+                drop = min(self.available(), (need - self._free_bytes() + 1) // 2)
+                if drop == 0:
+                    break
+                self.read_samples += drop
+                self.dropped_samples += drop
+        return min(need, self._free_bytes())
+
+    def _commit(self, n_bytes: int):
+        with self.cond:
+            self.written_bytes += n_bytes
+        self._wake_consumer()
+
+    def _wake_consumer(self):
+        with self.cond:
+            loop, data_ready = self.loop, self.data_ready
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(data_ready.set)
+            except RuntimeError:
+                pass # The loop is already closed, nobody is waiting
+
+    def readinto_from(self, stream) -> int:
+        """Reads once from a raw binary stream (e.g. an unbuffered pipe) directly into the ring. Returns 0 at EOF."""
+        with self.cond:
+            n_bytes = self._reserve(self.max_read_bytes)
+            if self.closed:
+                return 0
+            start = self.written_bytes % len(self.raw)
+
+        # The reserved region is past the write position, so the consumer never touches it.
+        n_read = stream.readinto(memoryview(self.raw)[start:start + n_bytes])
+        if n_read:
+            self._commit(n_read)
+        return n_read or 0
+
+    def write(self, pcm: np.ndarray):
+        """Copies int16 samples into the ring, waiting or dropping per the overflow policy."""
+        data = memoryview(np.ascontiguousarray(pcm, dtype=np.int16)).cast("B")
+        while data:
+            with self.cond:
+                n_bytes = self._reserve(len(data))
+                if self.closed:
+                    return
+                start = self.written_bytes % len(self.raw)
+                self.raw[start:start + n_bytes] = data[:n_bytes]
+                self.written_bytes += n_bytes
+            self._wake_consumer()
+            data = data[n_bytes:]
+
+    def close(self):
+        """Marks the end of the stream: pending audio can still be read, then `read` returns None."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self._wake_consumer()
+
+    def _convert(self, n_samples: int) -> np.ndarray:
+        if self.out.shape[0] < n_samples:
+            self.out = np.empty(n_samples, dtype=np.float32)
+
+        start = self.read_samples % self.capacity
+        first = min(n_samples, self.capacity - start)
+        np.multiply(self.pcm[start:start + first], PCM_SCALE, out=self.out[:first], dtype=np.float32)
+        if first < n_samples:
+            np.multiply(self.pcm[:n_samples - first], PCM_SCALE, out=self.out[first:n_samples], dtype=np.float32)
+
+        self.read_samples += n_samples
+        self.cond.notify_all()
+        return self.out[:n_samples]
+
+    async def read(self, n_samples: int) -> np.ndarray | None:
+        """
+        Waits for `n_samples` and returns them as float32 in [-1, 1). The array
+        is a view into a buffer reused by the next `read`, so copy what must
+        outlive it. After `close`, returns what is left, then None.
+        """
+        if self.loop is None:
+            # Published together, so the producer never sees the loop without its event.
+            with self.cond:
+                self.data_ready = asyncio.Event()
+                self.loop = asyncio.get_running_loop()
+
+        while True:
+            self.data_ready.clear()
+            with self.cond:
+                available = self.available()
+                if available >= n_samples:
+                    return self._convert(n_samples)
+                if self.closed:
+                    return self._convert(available) if available else None
+            await self.data_ready.wait()
+
+    def stats(self) -> dict:
+        return {
+            "backlog_seconds": self.backlog_seconds(),
+            "capacity_seconds": self.capacity / self.sampling_rate,
+            "dropped_seconds": self.dropped_samples / self.sampling_rate,
+        }
+
+
+class FFmpegPCMReader:
+    """
+    Runs an ffmpeg command writing s16le to stdout and pumps its output into
+    a PCMRing from a reader thread. The thread is its own daemon thread, not
+    one of the default executor's, which it would hold for the whole stream.
+    """
+
+    def __init__(self, command: list[str], ring: PCMRing):
+        self.command = command
+        self.ring = ring
+        self.process: subprocess.Popen | None = None
+        self.reader_thread: threading.Thread | None = None
+
+    def _pump(self):
+        stdout = self.process.stdout
+        while self.ring.readinto_from(stdout):
+            pass
+        self.ring.close()
+        stdout.close()
+
+    async def start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self.reader_thread = threading.Thread(target=self._pump, name="ffmpeg-pcm-reader", daemon=True)
+        self.reader_thread.start()
+
+    async def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.ring.close()
+            await asyncio.to_thread(self.process.wait)
+            self.process = None
+        if self.reader_thread is not None:
+            # Ends right away: ffmpeg's stdout is at EOF and the ring is closed.
+            await asyncio.to_thread(self.reader_thread.join)
+            self.reader_thread = None
+        if self.ring.dropped_samples:
+            logger.warning(f"Audio ring overflowed, {self.ring.dropped_samples / self.ring.sampling_rate:.1f}s of audio dropped in total.")
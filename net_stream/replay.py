@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import soundfile as sf
+
+from net_stream.pcm_ingest import PCMRing
+
+class ReplayStream:
+    """
+    Feeds a local 16 kHz mono WAV file (or raw s16le PCM) through the same
+    spin_ffmpeg / read_audio / stop_ffmpeg interface as BilibiliLive and
+    FFmpegServer, for offline runs and benchmarks.
+
+    `speed` is the pace relative to real time (0 = as fast as possible).
+    read_audio returns None once the file is exhausted. By default the
+    replay waits for a slow consumer instead of dropping audio, so runs are
+    reproducible.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, buffer_seconds: float = 60.0, overflow: str = "block"):
+        self.path = path
+        self.speed = speed
+        self.buffer_seconds = buffer_seconds
+        self.overflow = overflow
+        def default_read_audio():
+            raise RuntimeError("You should call spin_ffmpeg first.")
+
+        self.default_read_audio = default_read_audio
+        self.read_audio = default_read_audio
+
+        self.reader_thread: threading.Thread | None = None
+        self.stopped = False
+        self.duration = 0.0
+
+    def load_pcm(self, sampling_rate: int) -> np.ndarray:
+        if self.path.endswith(".pcm") or self.path.endswith(".raw"):
+            return np.fromfile(self.path, dtype=np.int16)
+
+        audio, file_sampling_rate = sf.read(self.path, dtype="int16")
+        if file_sampling_rate != sampling_rate or audio.ndim != 1:
+            raise ValueError(f"{self.path}: expected {sampling_rate} Hz mono audio, got {file_sampling_rate} Hz with shape {audio.shape}")
+        return audio
+
+    async def spin_ffmpeg(self, ffmpeg_path: str = None, sampling_rate=16000, samples_per_chunk=512):
+        # ffmpeg_path is accepted for interface compatibility and ignored.
+        pcm = self.load_pcm(sampling_rate)
+        self.duration = pcm.shape[0] / sampling_rate
+
+        self.audio_buffer = PCMRing(int(self.buffer_seconds * sampling_rate), overflow=self.overflow, sampling_rate=sampling_rate)
+        self.stopped = False
+
+        def reader_worker():
+            start = time.monotonic()
+            for i in range(0, pcm.shape[0], samples_per_chunk):
+                if self.stopped:
+                    break
+                if self.speed > 0:
+                    delay = start + i / sampling_rate / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                self.audio_buffer.write(pcm[i:i + samples_per_chunk])
+
+            self.audio_buffer.close()
+
+        # Its own daemon thread: it runs for the whole replay and would otherwise hold a default executor worker.
+        self.reader_thread = threading.Thread(target=reader_worker, name="replay-reader", daemon=True)
+        self.reader_thread.start()
+
+        async def read_audio(n_chunk=1):
+            # A view that is only valid until the next call.
+            return await self.audio_buffer.read(n_chunk * samples_per_chunk)
+
+        self.read_audio = read_audio
+
+    async def stop_ffmpeg(self):
+        if self.reader_thread is not None:
+            self.stopped = True
+            self.audio_buffer.close()
+            await asyncio.to_thread(self.reader_thread.join)
+            self.reader_thread = None
+
+        self.read_audio = self.default_read_audio
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def chunk_energy(audio: np.ndarray, samples_per_chunk: int = 512) -> np.ndarray:
+    """Mean square of each whole `samples_per_chunk` chunk of `audio`, in one vectorized pass."""
+    n_chunks = audio.shape[0] // samples_per_chunk
+    frames = audio[:n_chunks * samples_per_chunk].reshape(n_chunks, samples_per_chunk)
+    return np.mean(frames * frames, axis=1)
+
+
+def levels_db(energy: np.ndarray) -> np.ndarray:
+    return 10 * np.log10(energy + 1e-10)
+
+
+class SpeechGate:
+    """
+    Cheap check in front of Whisper for VAD segments that are unlikely to
+    hold real speech: noise bursts, clicks and game sounds that Silero
+    scored just above its threshold. They cost a full decode and mostly come
+    back empty or hallucinated.
+
+    `observe` is fed every block the session reads and keeps a running noise
+    floor, the mean level of chunks the VAD scored as non-speech (an
+    exponential average with weight `noise_alpha` per block). `check` looks
+    at one segment through the VAD probabilities and chunk energies already
+    computed for it (an AudioBuffer timeline) and rejects it when
+
+    speech_ratio  between its first and last speech chunk, less than
+                  `min_speech_ratio` of the chunks are speech (isolated
+                  spikes rather than talk),
+    snr           its speech chunks are less than `min_snr_db` above the
+                  noise floor,
+    level         its speech chunks are quieter than `min_level_db` dBFS.
+
+    Costs a few microseconds per segment.
+    """
+
+    REASONS = ("speech_ratio", "snr", "level")
+
+    def __init__(
+            self,
+            threshold: float = 0.5,
+            min_speech_ratio: float = 0.25,
+            min_snr_db: float = 3.0,
+            min_level_db: float = -55.0,
+            noise_alpha: float = 0.05,
+            samples_per_chunk: int = 512,
+            sampling_rate: int = 16000
+        ):
+        self.threshold = threshold
+        self.min_speech_ratio = min_speech_ratio
+        self.min_snr_db = min_snr_db
+        self.min_level_db = min_level_db
+        self.noise_alpha = noise_alpha
+        self.samples_per_chunk = samples_per_chunk
+        self.sampling_rate = sampling_rate
+
+        self.noise_floor_db: float | None = None
+
+        self.checked = 0
+        self.rejected = 0
+        self.rejected_seconds = 0.0
+        self.counts = dict.fromkeys(self.REASONS, 0)
+
+    def observe(self, audio: np.ndarray, speech_probs: np.ndarray):
+        levels = levels_db(chunk_energy(audio, self.samples_per_chunk))
+        noise = levels[speech_probs[:levels.shape[0]] < self.threshold]
+        if noise.shape[0] == 0:
+            return
+        level = float(noise.mean())
+        if self.noise_floor_db is None:
+            self.noise_floor_db = level
+        else:
+            self.noise_floor_db += self.noise_alpha * (level - self.noise_floor_db)
+
+    def _reason(self, speech_probs: np.ndarray, energy: np.ndarray) -> str | None:
+        speech = speech_probs >= self.threshold
+        indices = np.flatnonzero(speech)
+        if indices.shape[0] == 0:
+            return "speech_ratio"
+        if speech[indices[0]:indices[-1] + 1].mean() < self.min_speech_ratio:
+            return "speech_ratio"
+
+        # Power mean, so a few loud syllables are not drowned by quiet ones.
+        speech_level = levels_db(np.mean(energy[speech]))
+        if speech_level < self.min_level_db:
+            return "level"
+        if self.noise_floor_db is not None and speech_level - self.noise_floor_db < self.min_snr_db:
+            return "snr"
+        return None
+
+    def passes(self, speech_probs: np.ndarray, energy: np.ndarray) -> bool:
+        """Same decision as `check`, without counting it (for a look at a segment that is still growing)."""
+        return self._reason(speech_probs, energy) is None
+
+    def check(self, speech_probs: np.ndarray, energy: np.ndarray) -> bool:
+        """True if the segment should be transcribed. Takes the VAD probability and mean square of each of its chunks."""
+        self.checked += 1
+        reason = self._reason(speech_probs, energy)
+        if reason is None:
+            return True
+        self.rejected += 1
+        self.rejected_seconds += speech_probs.shape[0] * self.samples_per_chunk / self.sampling_rate
+        self.counts[reason] += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "reject_rate": self.rejected / self.checked if self.checked else 0.0,
+            "rejected_seconds": self.rejected_seconds,
+            "noise_floor_db": self.noise_floor_db,
+            **self.counts,
+        }
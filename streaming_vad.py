@@ -0,0 +1,53 @@
+import numpy as np
+import torch
+
+
+def warmup_vad_model(model, samples_per_chunk: int = 512, sampling_rate: int = 16000):
+    with torch.inference_mode():
+        for _ in range(4):
+            model(torch.zeros(1, samples_per_chunk), sampling_rate)
+    model.reset_states()
+
+
+class StreamingVAD:
+    """
+    Scores a block of consecutive chunks with a stateful Silero VAD model.
+
+    The chunks are fed through the model one after another (its LSTM state
+    carries over exactly as with per-chunk calls), but inside one inference
+    context, from a preallocated input tensor, and with a single host sync for
+    the whole block instead of one `.item()` per chunk.
+    """
+
+    def __init__(self, model, max_chunks: int = 8, samples_per_chunk: int = 512, sampling_rate: int = 16000):
+        self.model = model
+        self.max_chunks = max_chunks
+        self.samples_per_chunk = samples_per_chunk
+        self.sampling_rate = sampling_rate
+
+        self.input = torch.zeros(max_chunks, samples_per_chunk)
+        self.output = torch.zeros(max_chunks)
+
+    def reset(self):
+        self.model.reset_states()
+
+    def __call__(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Returns one speech probability per `samples_per_chunk` samples of `audio`.
+        A trailing partial chunk is zero-padded.
+        """
+        n_chunks = -(-audio.shape[0] // self.samples_per_chunk)
+        if n_chunks > self.max_chunks:
+            raise ValueError(f"Got {n_chunks} chunks, but StreamingVAD was built for at most {self.max_chunks}")
+
+        n_full = audio.shape[0] // self.samples_per_chunk
+        flat_input = self.input.view(-1)
+        flat_input[:audio.shape[0]].copy_(torch.from_numpy(audio))
+        if n_chunks > n_full:
+            self.input[n_full, audio.shape[0] - n_full * self.samples_per_chunk:].zero_()
+
+        with torch.inference_mode():
+            for i in range(n_chunks):
+                self.output[i] = self.model(self.input[i:i + 1], self.sampling_rate)[0, 0]
+
+        return self.output[:n_chunks].numpy().copy()
@@ -1,14 +1,18 @@
 import logging
-import asyncio
-import torch
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes, ApplicationBuilder, ExtBot
+from telegram.ext import Application, CommandHandler, ContextTypes, ApplicationBuilder
 
 from net_stream.bilibli_live import BilibiliLive
 from silero_vad import load_silero_vad
 from translate.llm_translate import OpenAICompatibleLLMProvider
-from transcribe.provider.faster_whisper import FasterWhisperBlockTranscriber
-from audio_buffer import AudioBuffer
+from faster_whisper import WhisperModel
+from transcribe.provider.faster_whisper import warmup_whisper_model
+from streaming_vad import warmup_vad_model
+from model_registry import registry as model_registry
+from live_session import SessionManager
+from latency_trace import LatencyMetrics, log_summaries, serve_prometheus
+from http_client import RequestPolicy, client_pool
+from translate.translation_cache import TranslationCache
 
 # --- Configuration ---
 TELEGRAM_BOT_TOKEN = "..."
@@ -16,10 +20,69 @@ FFMPEG_PATH = "..." # Or None if ffmpeg is in PATH
 TRANSLATE_API_KEY = "..."
 TRANSLATE_BASE_URL = "..."
 TRANSLATE_MODEL = "..."
+TRANSLATE_TIMEOUT = 20.0 # Seconds per LLM attempt
+TRANSLATE_MAX_ATTEMPTS = 3 # Attempts per translation, with jittered backoff between them
+TRANSLATE_HEDGE = True # Send a duplicate request when one is slower than the p95 of recent ones
+TRANSLATE_CACHE_SIZE = 2048 # Short lines cached in memory; None disables the cache
+TRANSLATE_CACHE_TTL = 7 * 86400.0
+TRANSLATE_CACHE_PATH = "./translate_cache.sqlite3" # Persistent cache shared across sessions and restarts; None keeps it in memory
 
 VAD_THRESHOLD = 0.25
 VAD_CUT_OFF_SAMPLES = 38000
 MIN_SPEECH_SAMPLES = 4000
+SPECULATIVE_CUT_SAMPLES = 12000 # Start decoding after this much silence, used if it lasts until VAD_CUT_OFF_SAMPLES; None disables
+WHISPER_MODEL_CONFIG = {"model_size_or_path": "large-v2", "download_root": "./whisper_cache/"}
+PRELOAD_MODELS = True # Load & warm up models at bot startup instead of on the first /start
+MODEL_IDLE_TIMEOUT = 600.0 # Seconds an unused model stays loaded after the last session ends
+VAD_SAMPLES_PER_CHUNK = 512
+VAD_BATCH_CHUNKS = 8 # Chunks scored per VAD call; adds up to 32 ms * (n - 1) of cut latency
+STT_MAX_INFLIGHT = 8 # Segments queued or decoding at once, shared by all rooms
+STT_BATCH_SIZE = 4 # Segments from different rooms decoded together; 1 disables batching
+STT_BATCH_MAX_WAIT = 0.3 # Max seconds a segment waits for others to fill its batch
+STT_STREAMING = False # Emit sentences as soon as Whisper confirms them instead of waiting for the VAD cut
+STT_STREAM_ITER_SAMPLES = 16000 # New audio between two streaming decodes
+TRANSLATE_CONCURRENCY = 4
+TRANSLATE_MAX_PENDING = 16
+TRANSLATE_STREAMING = True # Post each transcript at once and edit the translation in as the LLM streams it
+TRANSLATE_EDIT_INTERVAL = 1.0 # Min seconds between edits of one message
+TRANSLATE_CONTEXT_TOKENS = 1500 # Recent translations sent along as context, in estimated tokens; 0 translates each line on its own
+MUSIC_DETECTION = True # Skip transcription of segments that sound like music or singing (block mode)
+MUSIC_ACTION = "mark" # "mark": tell the chats when music starts; "drop": skip silently
+MAX_SEGMENT_SAMPLES = 16000 * 25 # Segments longer than this are split at their quietest point (block mode); None disables
+SEGMENT_OVERLAP_SAMPLES = 16000 # Audio repeated at the start of the segment after such a split; duplicated words are stitched out
+IDLE_RESET_SAMPLES = 16000 * 30 # Non-speech after which VAD state, buffers and the streaming prompt are reset; None disables
+HIBERNATE_SAMPLES = 16000 * 600 # Non-speech after which the room releases its transcriber until speech resumes; None disables
+SPEECH_GATE = True # Skip STT for VAD segments too sparse, quiet or close to the noise floor to be speech
+HALLUCINATION_FILTER = True # Drop known Whisper hallucinations, looping and low-confidence segments before translation
+LAG_THRESHOLDS = (15.0, 30.0, 60.0, 90.0) # Seconds behind live at which to skip silence / decode greedily / merge translations / drop stale segments; None disables
+METRICS_LOG_INTERVAL = 300.0 # Seconds between per-stage latency summaries in the log; None disables them
+METRICS_PROMETHEUS_PORT = None # e.g. 9464 to serve per-stage latency histograms for Prometheus on localhost
+
+SESSION_CONFIG = {
+    "ffmpeg_path": FFMPEG_PATH,
+    "vad_threshold": VAD_THRESHOLD,
+    "vad_cut_off_samples": VAD_CUT_OFF_SAMPLES,
+    "min_speech_samples": MIN_SPEECH_SAMPLES,
+    "vad_samples_per_chunk": VAD_SAMPLES_PER_CHUNK,
+    "vad_batch_chunks": VAD_BATCH_CHUNKS,
+    "translate_concurrency": TRANSLATE_CONCURRENCY,
+    "translate_max_pending": TRANSLATE_MAX_PENDING,
+    "translate_context_tokens": TRANSLATE_CONTEXT_TOKENS,
+    "translate_streaming": TRANSLATE_STREAMING,
+    "translate_edit_interval": TRANSLATE_EDIT_INTERVAL,
+    "stt_streaming": STT_STREAMING,
+    "stt_stream_iter_samples": STT_STREAM_ITER_SAMPLES,
+    "lag_thresholds": LAG_THRESHOLDS,
+    "speculative_cut_samples": SPECULATIVE_CUT_SAMPLES,
+    "music_detection": MUSIC_DETECTION,
+    "music_action": MUSIC_ACTION,
+    "hallucination_filter": HALLUCINATION_FILTER,
+    "speech_gate": SPEECH_GATE,
+    "max_segment_samples": MAX_SEGMENT_SAMPLES,
+    "segment_overlap_samples": SEGMENT_OVERLAP_SAMPLES,
+    "idle_reset_samples": IDLE_RESET_SAMPLES,
+    "hibernate_samples": HIBERNATE_SAMPLES,
+}
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -29,222 +92,23 @@ logging.basicConfig(
 logging.getLogger("httpx").setLevel(logging.WARNING) # Reduce httpx verbosity
 logger = logging.getLogger(__name__)
 
-# --- Global State ---
-target_chat_id: int | None = None
-target_room_id: int | None = None
-translation_task: asyncio.Task | None = None
-
-
-async def translate_worker(
-    queue: asyncio.Queue[str | None],
-    bot: ExtBot,
-    chat_id: int,
-    llm_provider: OpenAICompatibleLLMProvider
-):
-    """Worker task to fetch text from queue, translate, and send to Telegram."""
-    logger.info(f"Translate worker started for chat {chat_id}")
-    while True:
-        try:
-            src_text = await queue.get()
-            if src_text is None:
-                logger.info(f"Translate worker for chat {chat_id} received stop signal.")
-                queue.task_done()
-                break
-
-            if not src_text.strip():
-                logger.info("Skipping empty source text.")
-                queue.task_done()
-                continue
-
-            logger.info(f"Translating for chat {chat_id}: {src_text[:50]}...")
-            result = await llm_provider.translate(src_text)
-            logger.info(f"Translation result for chat {chat_id}: {result[:50]}...")
-
-            message_text = f"{src_text}\n---\n{result}"
-            if len(message_text) > 4096:
-                 logger.warning(f"Message too long ({len(message_text)} chars), sending truncated.")
-                 message_text = message_text[:4090] + "\n[...]"
-
-            await bot.send_message(chat_id=chat_id, text=message_text)
-
-            queue.task_done()
-
-        except asyncio.CancelledError:
-            logger.info(f"Translate worker for chat {chat_id} cancelled.")
-            break
-        except Exception as e:
-            logger.error(f"Error in translate worker for chat {chat_id}: {e}", exc_info=True)
-            try:
-
-                await bot.send_message(chat_id=chat_id, text=f"An error occurred during translation: {e}")
-            except Exception as send_e:
-                logger.error(f"Failed to send error message to chat {chat_id}: {send_e}")
-            if 'src_text' in locals() and src_text is not None:
-                 try:
-                     queue.task_done()
-                 except ValueError:
-                     pass
-    logger.info(f"Translate worker finished for chat {chat_id}")
-
-
-async def run_live_translation(bot: ExtBot, chat_id: int, room_id: int):
-    global target_chat_id, target_room_id, translation_task
-
-    translate_queue: asyncio.Queue[str | None] = asyncio.Queue()
-    bilibili_live = None
-    translate_task = None
-
-    try:
-        logger.info(f"Starting live translation process for chat {chat_id}, room {room_id}")
+# --- Shared Models ---
+model_registry.idle_timeout = MODEL_IDLE_TIMEOUT
+model_registry.register("whisper", lambda: WhisperModel(**WHISPER_MODEL_CONFIG), warmup=warmup_whisper_model)
+model_registry.register("silero_vad", load_silero_vad, warmup=warmup_vad_model)
 
-        llm_provider = OpenAICompatibleLLMProvider(
-            base_url=TRANSLATE_BASE_URL,
-            api_key=TRANSLATE_API_KEY,
-            model=TRANSLATE_MODEL
-        )
-        translate_task = asyncio.create_task(
-            translate_worker(translate_queue, bot, chat_id, llm_provider)
-        )
+# --- Global State ---
+session_manager: SessionManager | None = None
+latency_metrics = LatencyMetrics()
 
-        logger.info("Loading VAD model...")
-        vad_model = load_silero_vad()
-        vad_config = {
-            "threshold": VAD_THRESHOLD,
-            "cut_off_samples": VAD_CUT_OFF_SAMPLES,
-        }
-        logger.info("VAD model loaded.")
-
-        logger.info("Initializing transcriber...")
-        faster_whisper_stt = FasterWhisperBlockTranscriber(
-            {"model_size_or_path": "large-v2", "download_root": "./whisper_cache/"}
-        )
-        logger.info("Transcriber initialized.")
-
-        logger.info(f"Connecting to Bilibili room {room_id}...")
-        bilibili_live = BilibiliLive(room_id=room_id)
-        await bilibili_live.spin_ffmpeg(ffmpeg_path=FFMPEG_PATH)
-        logger.info(f"Connected to Bilibili room {room_id} and ffmpeg started.")
-
-        audio_buffer = AudioBuffer()
-        cont_non_speech = 0
-
-        await bot.send_message(chat_id=chat_id, text=f"✅ Live translation started for room {room_id}!")
-
-        while True:
-            audio = await bilibili_live.read_audio()
-            if audio is None:
-                logger.warning(f"Received None from Bilibili audio stream (room {room_id}), ending loop.")
-                await bot.send_message(chat_id=chat_id, text=f"Stream from room {room_id} seems to have ended.")
-                break
-
-            audio_buffer.submit(audio)
-            audio_tensor = torch.from_numpy(audio.astype('float32'))
-            speech_prob = vad_model(audio_tensor, 16000).item()
-
-            if speech_prob < vad_config["threshold"]:
-                cont_non_speech += len(audio)
-            else:
-                cont_non_speech = 0
-
-            if cont_non_speech > vad_config["cut_off_samples"]:
-                speech_samples = audio_buffer.n_samples() - cont_non_speech
-                if speech_samples >= MIN_SPEECH_SAMPLES:
-                    speech_audio_np = audio_buffer.as_nparray()[:-cont_non_speech // 2]
-                    logger.info(f"Transcribing {speech_audio_np.shape[0] / 16000:.2f}s of audio from room {room_id}...")
-                    try:
-                        transcript = faster_whisper_stt.transcribe(
-                            speech_audio_np,
-                            "",
-                            segment_max_no_speech_prob=0.75,
-                            segments_merge_fn=lambda x: " ".join(x),
-                            language=None
-                        )
-                        logger.info(f"Transcript (Room {room_id}): '{transcript}'")
-                        if transcript and transcript.strip():
-                            await translate_queue.put(transcript.strip())
-                        else:
-                             logger.warning(f"Empty transcript received from room {room_id}, skipping.")
-                    except Exception as e:
-                        logger.error(f"Transcription error (Room {room_id}): {e}", exc_info=True)
-                        try:
-                            await bot.send_message(chat_id=chat_id, text=f"Transcription error for room {room_id}: {e}")
-                        except Exception as send_e:
-                            logger.error(f"Failed to send transcription error message to chat {chat_id}: {send_e}")
-
-                audio_buffer.trim_head(audio_buffer.n_samples() - cont_non_speech // 2)
-                cont_non_speech = audio_buffer.n_samples()
-
-    except asyncio.CancelledError:
-        logger.info(f"Live translation task cancelled for chat {chat_id}, room {room_id}.")
-        try:
-            await bot.send_message(chat_id=chat_id, text=f"⏹️ Live translation stopped for room {room_id}.")
-        except Exception as send_e:
-            logger.error(f"Failed to send stop confirmation to chat {chat_id}: {send_e}")
-    except Exception as e:
-        logger.error(f"Error in live translation task for chat {chat_id}, room {room_id}: {e}", exc_info=True)
-        try:
-            await bot.send_message(chat_id=chat_id, text=f"❌ An error occurred in the live translation process for room {room_id}: {e}")
-        except Exception as send_e:
-             logger.error(f"Failed to send error message to chat {chat_id}: {send_e}")
-    finally:
-        logger.info(f"Cleaning up resources for chat {chat_id}, room {room_id}...")
-        if 'translate_queue' in locals() and translate_task and not translate_task.done():
-            try:
-                await translate_queue.put(None)
-            except Exception as qe:
-                 logger.error(f"Error putting None sentinel in queue for chat {chat_id}: {qe}")
-
-        if translate_task:
-            try:
-                logger.info(f"Waiting for translate worker to finish for chat {chat_id}...")
-                await asyncio.wait_for(translate_task, timeout=10.0)
-                logger.info(f"Translate worker finished gracefully for chat {chat_id}.")
-            except asyncio.TimeoutError:
-                logger.warning(f"Timeout waiting for translate worker (chat {chat_id}). Cancelling it.")
-                translate_task.cancel()
-            except asyncio.CancelledError:
-                 logger.info(f"Translate worker (chat {chat_id}) was already cancelled.")
-            except Exception as e:
-                 logger.error(f"Error waiting for translate worker (chat {chat_id}): {e}")
-
-        if bilibili_live:
-            logger.info(f"Closing Bilibili connection for room {room_id}...")
-            try:
-                if hasattr(bilibili_live, 'close') and asyncio.iscoroutinefunction(bilibili_live.close):
-                     await bilibili_live.close()
-                elif hasattr(bilibili_live, 'close'):
-                     bilibili_live.close()
-                elif bilibili_live.ffmpeg_process and bilibili_live.ffmpeg_process.returncode is None:
-                     logger.info(f"Terminating ffmpeg process for room {room_id}...")
-                     bilibili_live.ffmpeg_process.terminate()
-                     try:
-                         await asyncio.wait_for(bilibili_live.ffmpeg_process.wait(), timeout=5.0)
-                         logger.info(f"ffmpeg process terminated for room {room_id}.")
-                     except asyncio.TimeoutError:
-                         logger.warning(f"ffmpeg (room {room_id}) did not terminate gracefully, killing.")
-                         bilibili_live.ffmpeg_process.kill()
-                     except Exception as e:
-                          logger.error(f"Error waiting for ffmpeg termination (room {room_id}): {e}")
-                else:
-                     logger.info(f"ffmpeg process already terminated or not found for room {room_id}.")
-            except Exception as e:
-                logger.error(f"Error closing Bilibili connection (room {room_id}): {e}", exc_info=True)
-
-        current_task = asyncio.current_task()
-        if target_chat_id == chat_id and translation_task is current_task:
-             logger.info(f"Resetting global state as task for chat {chat_id}, room {room_id} ends.")
-             target_chat_id = None
-             target_room_id = None
-             translation_task = None
-        else:
-             logger.warning(f"Task for chat {chat_id}, room {room_id} ended, but global state indicates different target ({target_chat_id}, {target_room_id}) or task ({translation_task}). State not reset by this task.")
+def stream_factory(room_id: int) -> BilibiliLive:
+    return BilibiliLive(room_id=room_id)
 
 
 # --- Telegram Command Handlers ---
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the /start command with a room_id argument."""
-    global target_chat_id, target_room_id, translation_task
     current_chat_id = update.effective_chat.id
     user = update.effective_user
 
@@ -269,86 +133,125 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
         return
 
-    if target_chat_id is None:
-        target_chat_id = current_chat_id
-        target_room_id = room_id_to_start
+    if room_id_to_start in session_manager.rooms_for_chat(current_chat_id):
+        logger.info(f"Ignoring /start from chat {current_chat_id}, already subscribed to room {room_id_to_start}.")
         await update.message.reply_text(
-            f"Hi {user.first_name}! Received /start command for room {target_room_id}.\n"
-            f"Starting live translation stream to this chat ({target_chat_id}).\n"
-            "Use /stop to end the translation."
+             f"Live translation is already running for room {room_id_to_start} in this chat. Use /stop to end it."
         )
-        logger.info(f"Set target chat ID to {target_chat_id} and room ID to {target_room_id}. Starting background task.")
+        return
 
-        translation_task = asyncio.create_task(
-            run_live_translation(context.bot, target_chat_id, target_room_id)
-        )
-        translation_task.add_done_callback(handle_task_completion)
+    already_running = room_id_to_start in session_manager.sessions
+    session_manager.subscribe(room_id_to_start, current_chat_id)
+    logger.info(f"Subscribed chat {current_chat_id} to room {room_id_to_start} (session already running: {already_running}).")
 
-    elif current_chat_id == target_chat_id:
-        logger.info(f"Ignoring /start from target chat {current_chat_id}, already running for room {target_room_id}.")
+    if already_running:
         await update.message.reply_text(
-             f"Live translation is already running for room {target_room_id} in this chat. Use /stop to end it."
+            f"Hi {user.first_name}! Room {room_id_to_start} is already being translated, "
+            f"this chat ({current_chat_id}) will receive it from now on.\n"
+            "Use /stop to end the translation."
         )
     else:
-        logger.info(f"Ignoring /start from chat {current_chat_id}, currently serving chat {target_chat_id} (room {target_room_id}).")
         await update.message.reply_text(
-            f"Sorry, the bot is currently busy translating for room {target_room_id} in another chat. Please try again later."
+            f"Hi {user.first_name}! Received /start command for room {room_id_to_start}.\n"
+            f"Starting live translation stream to this chat ({current_chat_id}).\n"
+            "Use /stop to end the translation."
         )
 
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handles the /stop command."""
-    global target_chat_id, target_room_id, translation_task
+    """Handles the /stop command, optionally with a room_id argument."""
     current_chat_id = update.effective_chat.id
     user = update.effective_user
 
-    logger.info(f"Received /stop command from user {user.id} in chat {current_chat_id}")
+    logger.info(f"Received /stop command from user {user.id} in chat {current_chat_id} with args: {context.args}")
 
-    if target_chat_id is None:
+    rooms = session_manager.rooms_for_chat(current_chat_id)
+    if context.args:
+        try:
+            rooms = [room_id for room_id in rooms if room_id == int(context.args[0])]
+        except ValueError:
+            await update.message.reply_text("Invalid Room ID. Example: /stop 123456")
+            return
+
+    if not rooms:
         await update.message.reply_text("No translation is currently running.")
-    elif current_chat_id == target_chat_id:
-        if translation_task and not translation_task.done():
-            logger.info(f"Stopping translation task for chat {current_chat_id}, room {target_room_id}.")
-            await update.message.reply_text(f"Stopping live translation for room {target_room_id}...")
-            translation_task.cancel()
-        else:
-            logger.warning(f"Stop command received for chat {current_chat_id}, but task is already done or None.")
-            await update.message.reply_text("Translation seems to have already stopped.")
-            target_chat_id = None
-            target_room_id = None
-            translation_task = None
-    else:
-        logger.info(f"Ignoring /stop from chat {current_chat_id}, currently serving chat {target_chat_id} (room {target_room_id}).")
-        await update.message.reply_text(
-            f"You can only stop the translation from the chat where it was started (currently chat ID {target_chat_id})."
-        )
+        return
 
+    for room_id in rooms:
+        logger.info(f"Unsubscribing chat {current_chat_id} from room {room_id}.")
+        session_manager.unsubscribe(room_id, current_chat_id)
 
-def handle_task_completion(task: asyncio.Task) -> None:
-    """Callback function to handle when the background task finishes or fails."""
-    global target_chat_id, target_room_id, translation_task
-    try:
-        exception = task.exception()
-        if exception:
-            logger.error(f"Translation task failed with exception: {exception}", exc_info=exception)
-    except asyncio.CancelledError:
-        logger.info("Translation task was cancelled (detected in completion handler).")
-    finally:
-        if translation_task is task:
-             logger.info("Resetting global state via task completion handler.")
-             target_chat_id = None
-             target_room_id = None
-             translation_task = None
-        else:
-             logger.warning("A task completed, but it wasn't the currently tracked translation_task. State not reset by handler.")
+    await update.message.reply_text(
+        f"⏹️ Live translation stopped for room {', '.join(str(room_id) for room_id in rooms)}."
+    )
 
 
 # --- Main Bot Execution ---
 
+async def post_init(application: Application) -> None:
+    """Creates the session manager, preloads shared models and starts idle model eviction and latency reporting."""
+    global session_manager
+    llm_provider = OpenAICompatibleLLMProvider(
+        base_url=TRANSLATE_BASE_URL,
+        api_key=TRANSLATE_API_KEY,
+        model=TRANSLATE_MODEL,
+        policy=RequestPolicy(
+            attempt_timeout=TRANSLATE_TIMEOUT,
+            max_attempts=TRANSLATE_MAX_ATTEMPTS,
+            hedge=TRANSLATE_HEDGE
+        ),
+        cache=TranslationCache(
+            max_entries=TRANSLATE_CACHE_SIZE,
+            ttl=TRANSLATE_CACHE_TTL,
+            disk_path=TRANSLATE_CACHE_PATH,
+            namespace=TRANSLATE_MODEL
+        ) if TRANSLATE_CACHE_SIZE else None
+    )
+    session_manager = SessionManager(
+        application.bot,
+        stream_factory,
+        llm_provider,
+        model_registry,
+        SESSION_CONFIG,
+        stt_max_inflight=STT_MAX_INFLIGHT,
+        stt_batch_size=STT_BATCH_SIZE,
+        stt_batch_max_wait=STT_BATCH_MAX_WAIT,
+        metrics=latency_metrics
+    )
+
+    if PRELOAD_MODELS:
+        logger.info("Preloading models...")
+        await model_registry.preload_async()
+        logger.info(f"Models preloaded: {model_registry.stats()}")
+    application.create_task(model_registry.run_idle_eviction())
+    if METRICS_LOG_INTERVAL:
+        application.create_task(log_summaries(latency_metrics, METRICS_LOG_INTERVAL))
+    if METRICS_PROMETHEUS_PORT:
+        application.create_task(serve_prometheus(latency_metrics, port=METRICS_PROMETHEUS_PORT))
+
+
+async def post_shutdown(application: Application) -> None:
+    """Stops every running session and closes the shared HTTP clients."""
+    if session_manager is not None:
+        await session_manager.stop_all()
+        llm_provider = session_manager.llm_provider
+        logger.info(f"Translation requests: {llm_provider.policy.stats()}")
+        if llm_provider.cache is not None:
+            logger.info(f"Translation cache: {llm_provider.cache.stats()}")
+            llm_provider.cache.close()
+    await client_pool.aclose()
+
+
 def main() -> None:
     """Starts the bot."""
     logger.info("Starting bot...")
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("stop", stop))
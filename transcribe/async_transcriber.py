@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SKIPPED = object()
+
+
+class AsyncBlockTranscriber:
+    """
+    Runs a blocking block transcriber (e.g. FasterWhisperBlockTranscriber) on a
+    dedicated executor so the asyncio loop keeps reading audio and running VAD
+    while a segment is being decoded.
+
+    At most `max_inflight` segments are queued or decoding at once; `submit`
+    waits for a free slot, which is the backpressure towards the caller.
+
+    Cancelling a returned future skips the decode if it has not started yet.
+    A decode already running cannot be stopped: it keeps its slot until it
+    ends, and its result is thrown away and counted as `wasted`.
+    """
+
+    def __init__(self, transcriber, max_inflight: int = 2, executor: ThreadPoolExecutor = None, sampling_rate: int = 16000):
+        self.transcriber = transcriber
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt")
+        self.max_inflight = max_inflight
+        self.sampling_rate = sampling_rate
+
+        self.slots = asyncio.Semaphore(max_inflight)
+
+        self.inflight = 0
+        self.inflight_samples = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.wasted = 0
+        self.decode_seconds = 0.0
+        self.decoded_audio_seconds = 0.0
+
+    def _run(self, audio, args, kwargs, trace, future):
+        # Cancelled while still queued (e.g. a speculative decode that missed): never decoded.
+        if future.cancelled():
+            return SKIPPED
+
+        t0 = time.monotonic()
+        if trace is not None:
+            trace.mark("stt_start", t0)
+        try:
+            return self.transcriber.transcribe(audio, *args, **kwargs)
+        finally:
+            t1 = time.monotonic()
+            if trace is not None:
+                trace.mark("stt_end", t1)
+            self.decode_seconds += t1 - t0
+            self.decoded_audio_seconds += audio.shape[0] / self.sampling_rate
+
+    async def submit(self, audio, *args, trace=None, **kwargs) -> asyncio.Future:
+        """
+        Queue `audio` for transcription and return a future for the result once
+        a slot is free. `audio` must not be modified afterwards, so pass a copy
+        rather than a view into an AudioBuffer. `trace` (a SegmentTrace) gets
+        the decode's stt_start / stt_end marks.
+        """
+        await self.slots.acquire()
+
+        n_samples = audio.shape[0]
+        self.inflight += 1
+        self.inflight_samples += n_samples
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # The slot and the accounting follow the executor's job, not `future`:
+        # cancelling `future` does not stop a decode that is already running.
+        job = self.executor.submit(self._run, audio, args, kwargs, trace, future)
+
+        def on_done(job: Future):
+            self.inflight -= 1
+            self.inflight_samples -= n_samples
+            if job.cancelled() or (job.exception() is None and job.result() is SKIPPED):
+                self.cancelled += 1
+                future.cancel()
+            elif future.cancelled():
+                self.wasted += 1
+            elif job.exception() is not None:
+                self.failed += 1
+                future.set_exception(job.exception())
+            else:
+                self.completed += 1
+                future.set_result(job.result())
+            self.slots.release()
+
+        def on_job_done(job: Future):
+            try:
+                loop.call_soon_threadsafe(on_done, job)
+            except RuntimeError:
+                pass # The loop is already closed, nobody is waiting
+
+        job.add_done_callback(on_job_done)
+        return future
+
+    async def transcribe(self, audio, *args, **kwargs):
+        return await (await self.submit(audio, *args, **kwargs))
+
+    def backlog_seconds(self) -> float:
+        return self.inflight_samples / self.sampling_rate
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "backlog_seconds": self.backlog_seconds(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "wasted": self.wasted,
+            "realtime_factor": self.decode_seconds / self.decoded_audio_seconds if self.decoded_audio_seconds else 0.0,
+        }
+
+    def close(self):
+        if self.own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+SENTENCE_END = re.compile(r"[.!?。！？…]+[\"'”」』)]*")
+
+
+class AsyncTranscribeStream:
+    """
+    Drives a WhisperTranscribeStream from the event loop.
+
+    Audio is handed to the stream only between iterations, and an iteration
+    is started on the executor whenever `iter_samples` of new audio have
+    arrived. Confirmed words are collected and `poll` returns them as soon as
+    they complete a sentence; `flush` ends the utterance and returns the rest.
+    Iterations and flushes run strictly one after another.
+    """
+
+    def __init__(self, stream, iter_samples: int = 16000, executor: ThreadPoolExecutor = None):
+        self.stream = stream
+        self.iter_samples = iter_samples
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-stream")
+
+        self.pending: list[np.ndarray] = []
+        self.pending_samples = 0
+        self.busy: asyncio.Future | None = None
+        self.text = ""
+
+    def submit_audio(self, audio: np.ndarray):
+        # Copied: sources hand out views into buffers they reuse.
+        self.pending.append(audio.copy())
+        self.pending_samples += audio.shape[0]
+
+    def _take_pending(self) -> list[np.ndarray]:
+        pending, self.pending, self.pending_samples = self.pending, [], 0
+        return pending
+
+    def _feed(self, pending: list[np.ndarray]):
+        if pending:
+            self.stream.submit_audio(np.concatenate(pending))
+
+    def _append(self, words):
+        self.text += "".join(text for text, begin, end in words)
+
+    async def _iterate(self):
+        words = await asyncio.get_running_loop().run_in_executor(self.executor, self.stream.do_whisper_iter)
+        self._append(words)
+
+    def _take_sentences(self) -> list[str]:
+        ends = [m.end() for m in SENTENCE_END.finditer(self.text)]
+        if not ends:
+            return []
+
+        sentences, self.text = self.text[:ends[-1]].strip(), self.text[ends[-1]:]
+        return [sentences] if sentences else []
+
+    def poll(self) -> list[str]:
+        """Collects a finished iteration, starts the next one if enough audio is pending, returns complete sentences."""
+        if self.busy is not None:
+            if not self.busy.done():
+                return []
+            if not self.busy.cancelled() and self.busy.exception() is not None:
+                logger.error(f"Streaming transcription failed: {self.busy.exception()}")
+            self.busy = None
+
+        sentences = self._take_sentences()
+
+        if self.pending_samples >= self.iter_samples:
+            self._feed(self._take_pending())
+            self.busy = asyncio.ensure_future(self._iterate())
+
+        return sentences
+
+    def flush(self, discard: bool = False) -> asyncio.Future:
+        """
+        Ends the current utterance after any running iteration and returns a
+        future for the remaining text. With `discard`, the buffered audio is
+        dropped instead of transcribed.
+        """
+        previous = self.busy
+        pending = self._take_pending()
+
+        async def do_flush():
+            if previous is not None:
+                try:
+                    await previous
+                except Exception:
+                    pass
+
+            self._feed(pending)
+            loop = asyncio.get_running_loop()
+            if discard:
+                await loop.run_in_executor(self.executor, self.stream.skip)
+                text, self.text = "", ""
+            else:
+                self._append(await loop.run_in_executor(self.executor, self.stream.flush))
+                text, self.text = self.text.strip(), ""
+            return text
+
+        self.busy = asyncio.ensure_future(do_flush())
+        return self.busy
+
+    def reset(self) -> asyncio.Future:
+        """
+        Drops pending audio, unconfirmed text and the prompt carried over
+        from earlier utterances, after any running iteration or flush.
+        """
+        previous = self.busy
+        self._take_pending()
+
+        async def do_reset():
+            if previous is not None:
+                try:
+                    await previous
+                except Exception:
+                    pass
+
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.stream.reset_states)
+            self.text = ""
+
+        self.busy = asyncio.ensure_future(do_reset())
+        return self.busy
+
+    def close(self):
+        if self.busy is not None:
+            self.busy.cancel()
+        if self.own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
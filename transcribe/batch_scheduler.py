@@ -0,0 +1,221 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Request:
+    def __init__(self, audio, prompt, segment_max_no_speech_prob, segments_merge_fn, language, beam_size, future, trace):
+        self.audio = audio
+        self.prompt = prompt
+        self.segment_max_no_speech_prob = segment_max_no_speech_prob
+        self.segments_merge_fn = segments_merge_fn
+        self.language = language
+        self.beam_size = beam_size
+        self.future = future
+        self.trace = trace
+        self.enqueued_at = time.monotonic()
+
+
+class BatchedTranscribeScheduler:
+    """
+    Gathers segments submitted by all streams and decodes them together with
+    the transcriber's `transcribe_batch` (see FasterWhisperBlockTranscriber).
+
+    A batch is dispatched as soon as `max_batch_size` segments are waiting or
+    the oldest one has waited `max_wait` seconds, whichever comes first, so the
+    added latency is bounded by `max_wait` plus the decode of the batch ahead.
+    Segments only share a batch when their prompt, language and beam size match.
+
+    `streams` is how many streams submit to the scheduler, kept up to date by
+    its owner (None when unknown). With a single stream no partner can arrive,
+    so segments are dispatched without waiting. A batch of one is decoded with
+    the transcriber's regular `transcribe`, so its result is exactly the
+    unbatched one (temperature fallback included).
+
+    Exposes the same `submit` / `transcribe` / `stats` / `close` surface as
+    AsyncBlockTranscriber.
+    """
+
+    def __init__(
+            self,
+            transcriber,
+            max_batch_size: int = 8,
+            max_wait: float = 0.3,
+            max_inflight: int = 16,
+            executor: ThreadPoolExecutor = None,
+            sampling_rate: int = 16000,
+            streams: int | None = None
+        ):
+        self.transcriber = transcriber
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_inflight = max_inflight
+        self.sampling_rate = sampling_rate
+        self.streams = streams
+
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-batch")
+
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.pending: list[_Request] = []
+        self.pending_changed = asyncio.Event()
+        self.dispatcher_task: asyncio.Task | None = None
+
+        self.inflight = 0
+        self.inflight_samples = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.batches = 0
+        self.batched_segments = 0
+        self.decode_seconds = 0.0
+        self.decoded_audio_seconds = 0.0
+
+    async def submit(self, audio, prompt, segment_max_no_speech_prob, segments_merge_fn, language=None, beam_size=5, trace=None) -> asyncio.Future:
+        """
+        Queue `audio` for transcription and return a future for the merged
+        result once a slot is free. `audio` must not be modified afterwards.
+        `trace` (a SegmentTrace) gets the batch's stt_start / stt_end marks.
+        """
+        await self.slots.acquire()
+
+        loop = asyncio.get_running_loop()
+        if self.dispatcher_task is None:
+            self.dispatcher_task = loop.create_task(self._dispatcher())
+
+        request = _Request(audio, prompt, segment_max_no_speech_prob, segments_merge_fn, language, beam_size, loop.create_future(), trace)
+        self.inflight += 1
+        self.inflight_samples += audio.shape[0]
+        self.pending.append(request)
+        self.pending_changed.set()
+
+        return request.future
+
+    async def transcribe(self, audio, *args, **kwargs):
+        return await (await self.submit(audio, *args, **kwargs))
+
+    def _release(self, request: _Request):
+        self.inflight -= 1
+        self.inflight_samples -= request.audio.shape[0]
+        self.slots.release()
+
+    def _drop_cancelled(self):
+        # Requests cancelled while waiting (e.g. a speculative decode that missed) are never decoded.
+        for request in self.pending:
+            if request.future.cancelled():
+                self.cancelled += 1
+                self._release(request)
+        self.pending = [r for r in self.pending if not r.future.cancelled()]
+
+    def _take_batch(self) -> list[_Request]:
+        head = self.pending[0]
+        key = (head.prompt, head.language, head.beam_size)
+        batch = [r for r in self.pending if (r.prompt, r.language, r.beam_size) == key][:self.max_batch_size]
+        taken = set(map(id, batch))
+        self.pending = [r for r in self.pending if id(r) not in taken]
+        return batch
+
+    def _run_batch(self, batch: list[_Request]):
+        t0 = time.monotonic()
+        for r in batch:
+            if r.trace is not None:
+                r.trace.mark("stt_start", t0)
+        try:
+            if len(batch) == 1:
+                r = batch[0]
+                return [self.transcriber.transcribe(
+                    r.audio,
+                    r.prompt,
+                    r.segment_max_no_speech_prob,
+                    r.segments_merge_fn,
+                    language=r.language,
+                    beam_size=r.beam_size
+                )]
+            return self.transcriber.transcribe_batch(
+                [r.audio for r in batch],
+                batch[0].prompt,
+                [r.segment_max_no_speech_prob for r in batch],
+                [r.segments_merge_fn for r in batch],
+                language=batch[0].language,
+                batch_size=self.max_batch_size,
+                sampling_rate=self.sampling_rate,
+                beam_size=batch[0].beam_size
+            )
+        finally:
+            t1 = time.monotonic()
+            for r in batch:
+                if r.trace is not None:
+                    r.trace.mark("stt_end", t1)
+            self.decode_seconds += t1 - t0
+            self.decoded_audio_seconds += sum(r.audio.shape[0] for r in batch) / self.sampling_rate
+
+    async def _dispatcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.pending:
+                self.pending_changed.clear()
+                await self.pending_changed.wait()
+
+            # Wait for a full batch or for the oldest request's deadline.
+            deadline = self.pending[0].enqueued_at + self.max_wait
+            while len(self.pending) < self.max_batch_size and self.streams != 1:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                self.pending_changed.clear()
+                try:
+                    await asyncio.wait_for(self.pending_changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            self._drop_cancelled()
+            if not self.pending:
+                continue
+
+            batch = self._take_batch()
+            self.batches += 1
+            self.batched_segments += len(batch)
+
+            try:
+                results = await loop.run_in_executor(self.executor, self._run_batch, batch)
+                for request, result in zip(batch, results):
+                    if not request.future.done():
+                        request.future.set_result(result)
+                self.completed += len(batch)
+            except asyncio.CancelledError:
+                for request in batch:
+                    request.future.cancel()
+                raise
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                self.failed += len(batch)
+            finally:
+                for request in batch:
+                    self._release(request)
+
+    def backlog_seconds(self) -> float:
+        return self.inflight_samples / self.sampling_rate
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "backlog_seconds": self.backlog_seconds(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "mean_batch_size": self.batched_segments / self.batches if self.batches else 0.0,
+            "realtime_factor": self.decode_seconds / self.decoded_audio_seconds if self.decoded_audio_seconds else 0.0,
+        }
+
+    def close(self):
+        if self.dispatcher_task is not None:
+            self.dispatcher_task.cancel()
+            self.dispatcher_task = None
+        for request in self.pending:
+            request.future.cancel()
+        self.pending = []
+        if self.own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
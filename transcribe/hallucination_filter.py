@@ -0,0 +1,240 @@
+import re
+import zlib
+
+from translate.translation_cache import normalize_text, normalize_text_with_ends
+
+# Lines Whisper is known to produce from silence, noise, music or the end of
+# a stream: outros, subtitle credits and channel plugs it learned from video
+# captions. Matched as substrings of the normalized text (see normalize_text),
+# so they are written here without spaces or punctuation.
+KNOWN_HALLUCINATIONS = (
+    # ja
+    "ご視聴ありがとうございました",
+    "ご視聴ありがとうございます",
+    "最後までご視聴いただきありがとうございます",
+    "チャンネル登録お願いします",
+    "チャンネル登録よろしくお願いします",
+    "チャンネル登録と高評価",
+    "高評価とチャンネル登録",
+    "次の動画でお会いしましょう",
+    "おやすみなさいまたね",
+    # zh
+    "请不吝点赞订阅转发打赏支持明镜与点点栏目",
+    "明镜与点点栏目",
+    "谢谢观看",
+    "感谢观看",
+    "谢谢大家观看",
+    "订阅我的频道",
+    "点赞订阅",
+    "字幕由amaraorg社区提供",
+    "小编字幕由",
+    # ko
+    "시청해주셔서감사합니다",
+    "구독과좋아요",
+    # en
+    "thanksforwatching",
+    "thankyouforwatching",
+    "thankyousomuchforwatching",
+    "pleasesubscribe",
+    "likeandsubscribe",
+    "dontforgettosubscribe",
+    "subtitlesbytheamaraorgcommunity",
+)
+
+# Patterns for the hallucinations that vary in their details, matched against
+# the normalized text as one compiled alternation.
+HALLUCINATION_PATTERNS = (
+    r"amaraorg",
+    r"(?:中文|日文|双语)?字幕(?:制作|翻译|校对|提供|由|by)",
+    r"(?:subtitles?|captions?|transcription)by",
+    r"(?:作詞|作曲|編曲|作词|编曲)\D{0,12}(?:作詞|作曲|編曲|作词|编曲)",
+    r"^(?:you|bye|byebye|thankyou|ありがとうございました)$",
+)
+
+
+class AhoCorasick:
+    """
+    Finds every occurrence of a fixed set of phrases in one pass over the
+    text, however many phrases there are. The automaton is built once.
+    """
+
+    def __init__(self, phrases):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[int] = [0] # Length of the longest phrase ending at the state, 0 if none
+
+        for phrase in phrases:
+            state = 0
+            for char in phrase:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(0)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.out[state] = max(self.out[state], len(phrase))
+
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = max(self.out[child], self.out[self.fail[child]])
+
+    def find(self, text: str) -> list[tuple[int, int]]:
+        """(start, end) of the longest phrase ending at each position where one does."""
+        spans = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.out[state]:
+                spans.append((i + 1 - self.out[state], i + 1))
+        return spans
+
+
+def compression_ratio(text: str) -> float:
+    """Same measure as Whisper's: UTF-8 length over zlib-compressed length. Looping output compresses well."""
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data))
+
+
+def _merged(spans) -> list[tuple[int, int]]:
+    merged = []
+    for start, stop in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _covered(spans) -> int:
+    return sum(stop - start for start, stop in _merged(spans))
+
+
+class HallucinationFilter:
+    """
+    Post-STT filter for Whisper hallucinations, run on every segment before
+    it can reach the translate queue. Rules, cheapest first:
+
+    compression_ratio  above `max_compression_ratio` (Whisper's own 2.4):
+                       the decoder looped. Computed from the text when the
+                       backend does not report it.
+    avg_logprob        below `min_avg_logprob` (Whisper's -1.0): the decoder
+                       was guessing.
+    blocklist          phrases in KNOWN_HALLUCINATIONS (Aho-Corasick) cover
+                       at least `min_blocked_share` of the normalized text.
+                       Below that, the phrases are cut out of the line and
+                       the rest is kept ("blocklist_trimmed"), so a real
+                       sentence around an outro phrase survives.
+    pattern            HALLUCINATION_PATTERNS (one compiled regex) cover at
+                       least `min_pattern_share` of the normalized text.
+    repetition         a unit of up to `max_unit_chars` characters (digits
+                       excluded, so 10000 stays 10000) repeated
+                       `min_repeats` times or more covers at least
+                       `min_repetition_share` of the text and at least
+                       `min_loop_chars` normalized characters. Other runs,
+                       like laughter or "そうそうそうそう", are cut down to
+                       `min_repeats` - 1 copies instead
+                       ("repetition_trimmed"), and the line is kept.
+
+    `check` returns the (possibly trimmed) text, or None if it was rejected.
+    Every rule that fires is counted in `counts`.
+    """
+
+    RULES = ("compression_ratio", "avg_logprob", "blocklist", "pattern", "repetition", "blocklist_trimmed", "repetition_trimmed")
+
+    def __init__(
+            self,
+            max_compression_ratio: float = 2.4,
+            min_avg_logprob: float = -1.0,
+            min_blocked_share: float = 0.8,
+            min_pattern_share: float = 0.5,
+            min_repeats: int = 4,
+            max_unit_chars: int = 12,
+            min_repetition_share: float = 0.6,
+            min_loop_chars: int = 20,
+            phrases=KNOWN_HALLUCINATIONS,
+            patterns=HALLUCINATION_PATTERNS
+        ):
+        self.max_compression_ratio = max_compression_ratio
+        self.min_avg_logprob = min_avg_logprob
+        self.min_blocked_share = min_blocked_share
+        self.min_pattern_share = min_pattern_share
+        self.min_repeats = min_repeats
+        self.min_repetition_share = min_repetition_share
+        self.min_loop_chars = min_loop_chars
+
+        self.phrases = AhoCorasick(normalize_text(phrase) for phrase in phrases)
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+        self.repeat = re.compile(rf"(\D{{1,{max_unit_chars}}}?)\1{{{min_repeats - 1},}}")
+
+        self.checked = 0
+        self.rejected = 0
+        self.rejected_chars = 0
+        self.counts = dict.fromkeys(self.RULES, 0)
+
+    def _rule(self, text: str, avg_logprob: float | None, compression: float | None) -> str | None:
+        if compression is None:
+            compression = compression_ratio(text)
+        if compression > self.max_compression_ratio:
+            return "compression_ratio"
+        if avg_logprob is not None and avg_logprob < self.min_avg_logprob:
+            return "avg_logprob"
+
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        if _covered(self.phrases.find(normalized)) >= self.min_blocked_share * len(normalized):
+            return "blocklist"
+        if _covered(m.span() for m in self.pattern.finditer(normalized)) >= self.min_pattern_share * len(normalized):
+            return "pattern"
+        repeated = sum(m.end() - m.start() for m in self.repeat.finditer(normalized))
+        if repeated >= max(self.min_loop_chars, self.min_repetition_share * len(normalized)):
+            return "repetition"
+        return None
+
+    def _cut_phrases(self, text: str) -> str:
+        normalized, ends = normalize_text_with_ends(text)
+        spans = _merged(self.phrases.find(normalized))
+        if not spans:
+            return text
+
+        self.counts["blocklist_trimmed"] += 1
+        pieces, last = [], 0
+        for start, stop in spans:
+            # ends[start] - 1 is where the character that starts the phrase is in `text`.
+            pieces.append(text[last:ends[start] - 1])
+            last = ends[stop - 1]
+        pieces.append(text[last:])
+        return "".join(pieces).strip(" 、，,")
+
+    def _trim(self, match: re.Match) -> str:
+        self.counts["repetition_trimmed"] += 1
+        return match.group(1) * (self.min_repeats - 1)
+
+    def check(self, text: str, avg_logprob: float | None = None, compression_ratio: float | None = None) -> str | None:
+        self.checked += 1
+        if not text.strip():
+            return text
+        rule = self._rule(text, avg_logprob, compression_ratio)
+        if rule is not None:
+            self.counts[rule] += 1
+            self.rejected += 1
+            self.rejected_chars += len(text)
+            return None
+        return self.repeat.sub(self._trim, self._cut_phrases(text))
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "reject_rate": self.rejected / self.checked if self.checked else 0.0,
+            "rejected_chars": self.rejected_chars,
+            **self.counts,
+        }
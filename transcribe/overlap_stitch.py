@@ -0,0 +1,34 @@
+from difflib import SequenceMatcher
+
+from translate.translation_cache import normalize_text, normalize_text_with_ends
+
+
+def stitch_overlap(previous: str, current: str, max_chars: int = 48, min_match: int = 3, slack: int = 6) -> str:
+    """
+    Drops the start of `current` that repeats the end of `previous`, for two
+    transcripts of segments whose audio overlaps.
+
+    Both sides are compared normalized (see normalize_text), so punctuation
+    and spacing Whisper placed differently do not matter. The longest common
+    run of the last `max_chars` of `previous` and the first `max_chars` of
+    `current` counts as the overlap when it is at least `min_match` long and
+    lies within `slack` characters of the end of `previous` and the start of
+    `current`; the words at the cut are often half heard on one side. A cut
+    inside a Latin word is moved back to the start of the word, so a word
+    that only shares a prefix with the previous tail ("cat" / "cathedral")
+    is kept. Returns `current` unchanged when no overlap is found.
+    """
+    tail = normalize_text(previous)[-max_chars:]
+    head, ends = normalize_text_with_ends(current)
+    head, ends = head[:max_chars], ends[:max_chars]
+    if not tail or not head:
+        return current
+
+    match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+    if match.size < min_match or len(tail) - (match.a + match.size) > slack or match.b > slack:
+        return current
+
+    cut = ends[match.b + match.size - 1]
+    while 0 < cut < len(current) and current[cut - 1].isascii() and current[cut - 1].isalnum() and current[cut].isascii() and current[cut].isalnum():
+        cut -= 1
+    return current[cut:].lstrip(" 、。，,.!?！？")
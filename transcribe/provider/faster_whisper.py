@@ -1,11 +1,32 @@
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 import numpy as np
+from bisect import bisect_right
 from typing import List, Tuple, Callable
+from audio_buffer import AudioBuffer
+from transcribe.hallucination_filter import HallucinationFilter
+
+
+def warmup_whisper_model(model: WhisperModel, sampling_rate=16000):
+    # Runs one short decode so the first real segment doesn't pay for lazy init.
+    segments, _ = model.transcribe(np.zeros(sampling_rate, dtype=np.float32), language="en")
+    list(segments)
 
 
 class FasterWhisperBlockTranscriber:
-    def __init__(self, whisper_model_config):
-        self.model = WhisperModel(**whisper_model_config)
+    def __init__(self, whisper_model_config=None, model: WhisperModel=None, hallucination_filter: HallucinationFilter=None):
+        # Pass `model` to share an already loaded WhisperModel (e.g. from the model registry).
+        # With `hallucination_filter`, every segment is checked by it after the no_speech_prob cut.
+        self.model = model if model is not None else WhisperModel(**whisper_model_config)
+        self.hallucination_filter = hallucination_filter
+        self.batched_pipeline = None
+
+    def segment_text(self, segment, max_no_speech_prob):
+        # The segment's text, or None if it is probably not speech.
+        if segment.no_speech_prob >= max_no_speech_prob:
+            return None
+        if self.hallucination_filter is None:
+            return segment.text
+        return self.hallucination_filter.check(segment.text, segment.avg_logprob, segment.compression_ratio)
 
     def transcribe(
             self,
@@ -13,74 +34,238 @@ class FasterWhisperBlockTranscriber:
             prompt,
             segment_max_no_speech_prob,
             segments_merge_fn,
-            language=None
+            language=None,
+            beam_size=5
         ):
         # segment_merge_fn: List[str] -> T and this function return T
+        # beam_size=1 decodes greedily, which is noticeably faster under load.
 
-        transribe_result, transcription_info = self.model.transcribe(audio, initial_prompt=prompt, language=language)
+        transribe_result, transcription_info = self.model.transcribe(audio, initial_prompt=prompt, language=language, beam_size=beam_size)
 
-        segments = [segment.text for segment in transribe_result if segment.no_speech_prob < segment_max_no_speech_prob]
+        texts = (self.segment_text(segment, segment_max_no_speech_prob) for segment in transribe_result)
+        segments = [text for text in texts if text is not None]
 
         return segments_merge_fn(segments)
 
+    def transcribe_batch(
+            self,
+            audios: List[np.ndarray],
+            prompt,
+            segment_max_no_speech_probs: List[float],
+            segments_merge_fns: List[Callable],
+            language=None,
+            batch_size=8,
+            sampling_rate=16000,
+            beam_size=5
+        ):
+        # Decodes several independent segments (e.g. from different streams) as batched encoder/decoder
+        # passes. Segments are laid end to end and handed to the batched pipeline as clips of at most 30 s,
+        # then the resulting segments are routed back to their source by clip offset. Language is detected
+        # per clip when `language` is None. Returns one merged result per input, in order.
+
+        if self.batched_pipeline is None:
+            self.batched_pipeline = BatchedInferencePipeline(self.model)
+
+        max_clip_samples = 30 * sampling_rate
+        clip_timestamps, clip_seeks, clip_owners = [], [], []
+        offset = 0
+        for i, audio in enumerate(audios):
+            for start in range(0, audio.shape[0], max_clip_samples):
+                end = min(audio.shape[0], start + max_clip_samples)
+                clip_timestamps.append({"start": (offset + start) / sampling_rate, "end": (offset + end) / sampling_rate})
+                clip_seeks.append((offset + start) * self.model.frames_per_second // sampling_rate)
+                clip_owners.append(i)
+            offset += audio.shape[0]
+
+        texts = [[] for _ in audios]
+        if clip_timestamps:
+            transribe_result, transcription_info = self.batched_pipeline.transcribe(
+                np.concatenate(audios),
+                language=language or "en",
+                multilingual=language is None,
+                initial_prompt=prompt,
+                clip_timestamps=clip_timestamps,
+                without_timestamps=False,
+                vad_filter=False,
+                batch_size=batch_size,
+                beam_size=beam_size
+            )
+
+            for segment in transribe_result:
+                # +1 absorbs float rounding of the clip offset inside the pipeline.
+                owner = clip_owners[bisect_right(clip_seeks, segment.seek + 1) - 1]
+                text = self.segment_text(segment, segment_max_no_speech_probs[owner])
+                if text is not None:
+                    texts[owner].append(text)
+
+        return [merge_fn(segments) for merge_fn, segments in zip(segments_merge_fns, texts)]
 
-##########################################
-################## TODO ##################
-##########################################
 
 def longest_common_prefix(x: List, y: List, fn_same: Callable) -> List:
-    raise NotImplementedError()
+    n = 0
+    for a, b in zip(x, y):
+        if not fn_same(a, b):
+            break
+        n += 1
+
+    return x[:n]
+
+
+def same_word(a: Tuple[str, float, float], b: Tuple[str, float, float]) -> bool:
+    return a[0].strip().lower() == b[0].strip().lower()
+
 
 class WhisperTranscribeStream:
-    def __init__(self, whisper_model_config, max_prompt_cache_len=200):
-        self.model = WhisperModel(**whisper_model_config)
+    """
+    Streaming transcriber using LocalAgreement-2: the whole audio buffer is
+    re-transcribed on every iteration, and words are confirmed once two
+    consecutive hypotheses agree on them.
+
+    |---------------------|-----------------------|
+    ^buffer begin         ^confirmed end          ^buffer end
+
+    Once the buffer grows past `max_buffer_samples`, it is trimmed at the last
+    segment start before the confirmed end, and the confirmed text before that
+    point moves into the prompt cache.
+    """
+
+    def __init__(
+            self,
+            whisper_model_config=None,
+            max_prompt_cache_len=200,
+            model: WhisperModel=None,
+            max_buffer_samples=16000 * 15,
+            segment_max_no_speech_prob=0.9,
+            language=None,
+            sampling_rate=16000,
+            beam_size=5
+        ):
+        self.model = model if model is not None else WhisperModel(**whisper_model_config)
         self.max_prompt_cache_len = max_prompt_cache_len
+        self.beam_size = beam_size # May be changed between iterations
+        self.max_buffer_samples = max_buffer_samples
+        self.segment_max_no_speech_prob = segment_max_no_speech_prob
+        self.language = language
+        self.sampling_rate = sampling_rate
 
         self.reset_states()
 
     def reset_states(self):
-        """
-        |---------------------|-----------------------|
-        ^buffer begin         ^confirmed end          ^buffer end
-        """
+        self.prompt_cache: str = "" # cache the text before audio buffer to provide to the model
+        self.reset_buffer()
 
-        self.audio_buffer: np.ndarray = np.array([], dtype=np.float32)
-        
-        self.confirmed_end: int = 0 # 0 is the begin of audio buffer
+    def reset_buffer(self):
+        self.audio_buffer = AudioBuffer()
+        self.buffer_offset: int = 0 # samples trimmed from the buffer since the start of the stream
 
-        self.text_buffer: List[Tuple[str, float, float]] = [] # list of (text: str, begin: float, end: float)
-        self.text_confirmed_end: int = 0
+        self.confirmed_end: int = 0 # 0 is the begin of audio buffer
 
-        self.prompt_cache: str = "" # cache the text before audio buffer to provide to the model
+        # Words as (text: str, begin: float, end: float), in seconds from the buffer begin.
+        self.text_buffer: List[Tuple[str, float, float]] = [] # confirmed words still inside the audio buffer
+        self.hypothesis: List[Tuple[str, float, float]] = [] # unconfirmed words of the previous iteration
 
         # We need to save the segment points to trim the audio buffer when necessary.
         # t = 0 -> the begin of the audio buffer
         self.segment_points: List[int] = []
 
     def submit_audio(self, audio: np.ndarray):
-        self.audio_buffer = np.concatenate([self.audio_buffer, audio])
+        self.audio_buffer.submit(audio)
+
+    def n_samples(self):
+        return self.audio_buffer.n_samples()
+
+    def _to_stream_time(self, words: List[Tuple[str, float, float]]):
+        offset = self.buffer_offset / self.sampling_rate
+        return [(text, begin + offset, end + offset) for text, begin, end in words]
+
+    def _drop_confirmed(self, words: List[Tuple[str, float, float]]):
+        # The buffer still holds audio of confirmed words, so the new hypothesis starts by repeating them.
+        confirmed_end = self.confirmed_end / self.sampling_rate
+        words = [w for w in words if w[1] >= confirmed_end - 0.1]
+
+        for n in range(min(5, len(words), len(self.text_buffer)), 0, -1):
+            if all(same_word(a, b) for a, b in zip(words[:n], self.text_buffer[-n:])):
+                return words[n:]
+
+        return words
+
+    def do_whisper_iter(self) -> List[Tuple[str, float, float]]:
+        """Transcribes the buffer once and returns the newly confirmed words, timed from the stream start."""
 
-    def do_whisper_iter(self):
         # trim the prompt cache
         if len(self.prompt_cache) > self.max_prompt_cache_len:
             self.prompt_cache = self.prompt_cache[-self.max_prompt_cache_len:]
 
         # immediately transcribe the whole audio buffer
         transribe_result, transcribe_info = self.model.transcribe(
-            self.audio_buffer,
+            self.audio_buffer.as_nparray(),
             initial_prompt=self.prompt_cache,
-            beam_size=5,
+            language=self.language,
+            beam_size=self.beam_size,
             word_timestamps=True,
             condition_on_previous_text=True
         )
 
         transribe_transformed = []
+        self.segment_points = []
         for segment in transribe_result:
-            if segment.no_speech_prob > 0.9: continue  # TODO: make this threshold configurable
+            if segment.no_speech_prob > self.segment_max_no_speech_prob: continue
 
-            segment_start_sample = segment.start * 16000
+            segment_start_sample = int(segment.start * self.sampling_rate)
             self.segment_points.append(segment_start_sample)
 
             for word in segment.words:
                 transribe_transformed.append((word.word, word.start, word.end))
 
+        words = self._drop_confirmed(transribe_transformed)
+        confirmed = longest_common_prefix(words, self.hypothesis, same_word)
+        self.hypothesis = words[len(confirmed):]
+
+        if confirmed:
+            self.text_buffer.extend(confirmed)
+            self.confirmed_end = int(confirmed[-1][2] * self.sampling_rate)
+
+        result = self._to_stream_time(confirmed)
+        self.trim()
+        return result
+
+    def trim(self):
+        if self.audio_buffer.n_samples() <= self.max_buffer_samples:
+            return
+
+        candidates = [p for p in self.segment_points if 0 < p <= self.confirmed_end]
+        cut = max(candidates) if candidates else self.confirmed_end
+        if cut <= 0:
+            return
+
+        cut_time = cut / self.sampling_rate
+        self.prompt_cache += "".join(text for text, begin, end in self.text_buffer if end <= cut_time)
+
+        def shift(words):
+            return [(text, begin - cut_time, end - cut_time) for text, begin, end in words if end > cut_time]
+
+        self.text_buffer = shift(self.text_buffer)
+        self.hypothesis = shift(self.hypothesis)
+        self.segment_points = [p - cut for p in self.segment_points if p > cut]
+
+        self.audio_buffer.trim_head(cut)
+        self.buffer_offset += cut
+        self.confirmed_end -= cut
+
+    def flush(self) -> List[Tuple[str, float, float]]:
+        """
+        Call at the end of an utterance: runs a last iteration, confirms the
+        remaining hypothesis and clears the audio buffer (the prompt cache is kept).
+        """
+        words = self.do_whisper_iter() + self._to_stream_time(self.hypothesis)
+
+        self.prompt_cache += "".join(text for text, begin, end in self.text_buffer + self.hypothesis)
+        self.skip()
+
+        return words
+
+    def skip(self):
+        """Drops the buffered audio and hypothesis without transcribing them (the prompt cache is kept)."""
+        buffer_end = self.buffer_offset + self.audio_buffer.n_samples()
+        self.reset_buffer()
+        self.buffer_offset = buffer_end
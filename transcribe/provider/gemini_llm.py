@@ -1,12 +1,19 @@
 from google import genai
 from google.genai import types as genai_types
-from utils import np_to_wav
+from http_client import RequestPolicy
+from transcribe.hallucination_filter import HallucinationFilter
+from utils import encode_audio
 
 class GeminiBlockTranscriber:
-    def __init__(self, api_key):
+    def __init__(self, api_key, encoding="flac", policy: RequestPolicy = None, hallucination_filter: HallucinationFilter = None):
+        # encoding: upload format, one of utils.AUDIO_ENCODINGS (Gemini takes wav, flac and ogg)
+        # hallucination_filter: checks the returned text (no logprobs here); rejected text comes back as ""
         self.genai_client = genai.Client(
             api_key=api_key
         )
+        self.encoding = encoding
+        self.policy = policy or RequestPolicy()
+        self.hallucination_filter = hallucination_filter
 
     @staticmethod
     def build_prompt(
@@ -42,17 +49,21 @@ class GeminiBlockTranscriber:
         ):
 
         prompt = self.build_prompt(ctx=ctx, language=language)
+        data, mime_type, _ = encode_audio(audio, 16000, self.encoding)
 
-        response = await self.genai_client.aio.models.generate_content(
+        response = await self.policy.run(lambda: self.genai_client.aio.models.generate_content(
             model=model,
             contents=[
                 prompt,
                 genai_types.Part.from_bytes(
-                    data=np_to_wav(audio, 16000),
-                    mime_type="audio/wav"
+                    data=data,
+                    mime_type=mime_type
                 )
             ],
             config=genai_types.GenerateContentConfig(temperature=temperature)
-        )
+        ))
+
+        if self.hallucination_filter is not None:
+            return self.hallucination_filter.check(response.text or "") or ""
 
         return response.text
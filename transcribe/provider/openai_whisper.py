@@ -1,10 +1,16 @@
-from openai import AsyncOpenAI
 from openai.types.audio.transcription_verbose import TranscriptionVerbose
-from utils import np_to_wav
+from http_client import RequestPolicy, client_pool
+from transcribe.hallucination_filter import HallucinationFilter
+from utils import encode_audio
 
 class OpenAIWhisperBlockTranscriber:
-    def __init__(self, base_url, api_key):
-        self.openai_client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+    def __init__(self, base_url, api_key, encoding="flac", policy: RequestPolicy = None, hallucination_filter: HallucinationFilter = None):
+        # encoding: upload format, one of utils.AUDIO_ENCODINGS (the API takes wav, flac and ogg)
+        # hallucination_filter: checks every segment that passes the no_speech_prob cut
+        self.openai_client = client_pool.openai(base_url, api_key)
+        self.encoding = encoding
+        self.policy = policy or RequestPolicy()
+        self.hallucination_filter = hallucination_filter
 
     async def transcribe(
             self,
@@ -16,8 +22,10 @@ class OpenAIWhisperBlockTranscriber:
             language=None
         ):
 
+        data, mime_type, file_name = encode_audio(audio, 16000, self.encoding)
+
         target_params = {
-            "file": np_to_wav(audio, 16000),
+            "file": (file_name, data, mime_type),
             "model": model,
             "prompt": prompt,
             "language": language,
@@ -28,10 +36,13 @@ class OpenAIWhisperBlockTranscriber:
             k: v for k, v in target_params.items() if v is not None
         }
 
-        transribe_result: TranscriptionVerbose = await self.openai_client.audio.transcriptions.create(
-            **target_params_none_wrapped
+        transribe_result: TranscriptionVerbose = await self.policy.run(
+            lambda: self.openai_client.audio.transcriptions.create(**target_params_none_wrapped)
         )
 
-        segments = [segment.text for segment in transribe_result.segments if segment.no_speech_prob < segment_min_no_speech_prob]
+        segments = [segment for segment in transribe_result.segments if segment.no_speech_prob < segment_min_no_speech_prob]
+        texts = [segment.text for segment in segments]
+        if self.hallucination_filter is not None:
+            texts = [self.hallucination_filter.check(segment.text, segment.avg_logprob, segment.compression_ratio) for segment in segments]
 
-        return segments_merge_fn(segments)
\ No newline at end of file
+        return segments_merge_fn([text for text in texts if text is not None])
\ No newline at end of file
@@ -1,4 +1,9 @@
-from openai import AsyncOpenAI
+import asyncio
+from typing import Callable
+
+from http_client import RequestPolicy, client_pool
+from translate.translation_cache import TranslationCache
+from translate.translation_context import TranslationContext
 
 class OpenAICompatibleLLMProvider:
     def __init__(
@@ -7,35 +12,104 @@ class OpenAICompatibleLLMProvider:
             api_key: str,
             model: str,
             system_prompt: str=None,
-            temperature: float=0.5
+            temperature: float=0.5,
+            policy: RequestPolicy=None,
+            cache: TranslationCache=None
         ) -> None:
-        self.openai = AsyncOpenAI(base_url=base_url, api_key=api_key)
+        # The client comes from the shared pool, so providers for the same endpoint reuse connections.
+        self.openai = client_pool.openai(base_url, api_key)
+        self.policy = policy or RequestPolicy()
+        self.cache = cache
 
         self.translate_prompt = """你正在翻译一个在线直播，请将下面文本翻译为中文，仅输出翻译结果：{src_text}"""
+        # With context, the instruction goes in the system message once and each turn is a bare line,
+        # so the prefix (system + earlier turns) stays identical between requests.
+        self.context_prompt = """你正在翻译一个在线直播。用户的每条消息是直播中的一句话，请将其翻译为中文，仅输出翻译结果。之前的对话是已翻译的上文，仅供参考。"""
 
         self.model = model
         self.system_prompt = system_prompt
         self.temperature = temperature
 
-    async def translate(self, src_text: str) -> str:
-        prompt = self.translate_prompt.format(src_text=src_text)
+    async def translate(self, src_text: str, context: TranslationContext=None, on_partial: Callable[[str], None]=None) -> str:
+        """
+        With `on_partial`, the completion is streamed and `on_partial` is
+        called with the text so far after every token. A cache hit returns
+        the full text without partials.
+        """
+        if self.cache is not None:
+            return await self.cache.lookup(src_text, lambda text: self.translate_uncached(text, context, on_partial))
+        return await self.translate_uncached(src_text, context, on_partial)
+
+    def build_messages(self, src_text: str, context: TranslationContext=None) -> list[dict]:
+        if context is None or not context.enabled:
+            messages = []
+            if self.system_prompt:
+                messages.append({
+                    "role": "system",
+                    "content": self.system_prompt
+                })
 
-        messages = []
-        if self.system_prompt:
             messages.append({
-                "role": "system",
-                "content": self.system_prompt
+                "role": "user",
+                "content": self.translate_prompt.format(src_text=src_text)
             })
+            return messages
 
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        system_prompt = f"{self.system_prompt}\n\n{self.context_prompt}" if self.system_prompt else self.context_prompt
+        return [
+            {"role": "system", "content": system_prompt},
+            *context.messages(),
+            {"role": "user", "content": src_text}
+        ]
 
-        result = (await self.openai.chat.completions.create(
+    async def stream_completion(self, messages: list[dict], on_partial: Callable[[str], None]):
+        # Retries and hedging cover the request up to the response headers; a stream
+        # that breaks halfway fails the segment rather than repeating half a line.
+        stream = await self.policy.run(lambda: self.openai.chat.completions.create(
             model=self.model,
             messages=messages,
-            temperature=self.temperature
-        )).choices[0].message.content
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        ), window="stream")
+
+        parts = []
+        usage = None
+
+        async def consume():
+            nonlocal usage
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    on_partial("".join(parts))
+
+        # The client has no read timeout, so a stalled stream would otherwise hang the room's ordered delivery.
+        try:
+            await asyncio.wait_for(consume(), self.policy.attempt_timeout)
+        except asyncio.TimeoutError:
+            await stream.close()
+            raise asyncio.TimeoutError(f"Translation stream stalled, no end after {self.policy.attempt_timeout:.0f}s") from None
+        return "".join(parts), usage
+
+    async def translate_uncached(self, src_text: str, context: TranslationContext=None, on_partial: Callable[[str], None]=None) -> str:
+        messages = self.build_messages(src_text, context)
+        context_tokens = context.tokens if context is not None else 0
+
+        if on_partial is not None:
+            result, usage = await self.stream_completion(messages, on_partial)
+        else:
+            response = await self.policy.run(lambda: self.openai.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature
+            ))
+            result, usage = response.choices[0].message.content, response.usage
+
+        if context is not None and usage is not None:
+            # OpenAI reports prompt cache hits in prompt_tokens_details, DeepSeek in prompt_cache_hit_tokens.
+            cached_tokens = getattr(usage.prompt_tokens_details, "cached_tokens", None) or getattr(usage, "prompt_cache_hit_tokens", None) or 0
+            context.record_call(usage.prompt_tokens, cached_tokens, usage.completion_tokens, context_tokens)
 
         return result
\ No newline at end of file
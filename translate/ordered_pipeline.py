@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from latency_trace import SegmentTrace
+
+logger = logging.getLogger(__name__)
+
+
+class OrderedTranslatePipeline:
+    """
+    Translates up to `concurrency` segments at once and hands the results to
+    `sink` strictly in submission order.
+
+    Finished results wait in a reorder buffer keyed by sequence number until
+    every earlier segment has been delivered. `submit` blocks once
+    `max_pending` segments are translating or waiting for delivery.
+
+    sink(src_text, result, error, trace) is awaited once per segment; exactly
+    one of `result` / `error` is not None. `trace` is the SegmentTrace given
+    to `submit` (or None), with llm_start / llm_end marked.
+    """
+
+    def __init__(
+            self,
+            translate: Callable[[str], Awaitable[str]],
+            sink: Callable[[str, str | None, Exception | None, SegmentTrace | None], Awaitable[None]],
+            concurrency: int = 4,
+            max_pending: int = 16
+        ) -> None:
+        self.translate = translate
+        self.sink = sink
+
+        self.concurrency = asyncio.Semaphore(concurrency)
+        self.pending_slots = asyncio.Semaphore(max_pending)
+        self.deliver_lock = asyncio.Lock()
+
+        self.next_seq = 0
+        self.next_deliver_seq = 0
+        self.reorder_buffer: dict[int, tuple[str, str | None, Exception | None, SegmentTrace | None]] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+        self.n_translating = 0
+
+    async def submit(self, src_text: str, trace: SegmentTrace | None = None, **translate_kwargs) -> int:
+        """Queues `src_text`; extra keyword arguments are passed on to `translate` for this segment only."""
+        await self.pending_slots.acquire()
+
+        seq = self.next_seq
+        self.next_seq += 1
+
+        task = asyncio.create_task(self._run(seq, src_text, trace, translate_kwargs))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        return seq
+
+    async def _run(self, seq: int, src_text: str, trace: SegmentTrace | None, translate_kwargs: dict):
+        result, error = None, None
+        try:
+            async with self.concurrency:
+                self.n_translating += 1
+                if trace is not None:
+                    trace.mark("llm_start")
+                try:
+                    result = await self.translate(src_text, **translate_kwargs)
+                finally:
+                    self.n_translating -= 1
+                    if trace is not None:
+                        trace.mark("llm_end")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+
+        self.reorder_buffer[seq] = (src_text, result, error, trace)
+        await self._flush()
+
+    async def _flush(self):
+        async with self.deliver_lock:
+            while self.next_deliver_seq in self.reorder_buffer:
+                src_text, result, error, trace = self.reorder_buffer.pop(self.next_deliver_seq)
+                self.next_deliver_seq += 1
+                try:
+                    await self.sink(src_text, result, error, trace)
+                except Exception as e:
+                    logger.error(f"Translation sink failed: {e}", exc_info=True)
+                finally:
+                    self.pending_slots.release()
+
+    async def join(self):
+        """Waits until every submitted segment has been delivered."""
+        while self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.next_seq,
+            "delivered": self.next_deliver_seq,
+            "translating": self.n_translating,
+            "waiting_for_order": len(self.reorder_buffer),
+        }
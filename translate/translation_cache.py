@@ -0,0 +1,166 @@
+import asyncio
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+
+def normalize_text(text: str) -> str:
+    """
+    Cache key for a source line: NFKC (folds full/half width), case-folded,
+    with whitespace, punctuation and symbols removed, so "ありがとうございます！"
+    and "ありがとうございます。" share an entry.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(c for c in text if unicodedata.category(c)[0] not in "PZSC")
+
+
+def normalize_text_with_ends(text: str) -> tuple[str, list[int]]:
+    """normalize_text of `text`, and for each of its characters the index in `text` just past the character it came from."""
+    chars, ends = [], []
+    for i, c in enumerate(text):
+        for n in normalize_text(c):
+            chars.append(n)
+            ends.append(i + 1)
+    return "".join(chars), ends
+
+
+class TranslationCache:
+    """
+    LRU cache of translations with a TTL, keyed on `normalize_text` of the
+    source, in front of an LLM provider.
+
+    With `disk_path`, entries are also kept in an SQLite file that outlives
+    the process and is shared by every session and bot using it; memory
+    misses fall back to it before calling the LLM. Lines longer than
+    `max_chars` are not cached, they practically never repeat. Concurrent
+    lookups of the same key share one LLM call.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 2048,
+            ttl: float = 86400.0,
+            disk_path: str | None = None,
+            namespace: str = "",
+            max_chars: int = 100
+        ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self.max_chars = max_chars
+
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.inflight: dict[str, asyncio.Future] = {}
+
+        self.db = None
+        if disk_path is not None:
+            self.db = sqlite3.connect(disk_path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, result TEXT, stored_at REAL)")
+            self.db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.llm_seconds = 0.0
+
+    def _key(self, src_text: str) -> str | None:
+        if len(src_text) > self.max_chars:
+            return None
+        key = normalize_text(src_text)
+        return f"{self.namespace}\x00{key}" if key else None
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if now - entry[1] < self.ttl:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            del self.entries[key]
+
+        if self.db is not None:
+            row = self.db.execute("SELECT result, stored_at FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += 1
+                return row[0]
+        return None
+
+    def _remember(self, key: str, result: str, stored_at: float):
+        self.entries[key] = (result, stored_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def put(self, key: str, result: str):
+        now = time.time()
+        self._remember(key, result, now)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", (key, result, now))
+            self.db.commit()
+
+    async def lookup(self, src_text: str, translate: Callable[[str], Awaitable[str]]) -> str:
+        """Returns the cached translation of `src_text`, calling `translate` on a miss."""
+        key = self._key(src_text)
+        if key is None:
+            self.uncacheable += 1
+            return await translate(src_text)
+
+        result = self.get(key)
+        if result is not None:
+            return result
+        if key in self.inflight:
+            future = self.inflight[key]
+            try:
+                result = await asyncio.shield(future)
+                self.memory_hits += 1
+                return result
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The session that owned the call was stopped; make our own.
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        t0 = time.monotonic()
+        try:
+            result = await translate(src_text)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Waiters get the error; don't warn if there are none
+            raise
+        finally:
+            del self.inflight[key]
+        self.llm_seconds += time.monotonic() - t0
+        future.set_result(result)
+        self.put(key, result)
+        return result
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses + self.uncacheable
+        llm_calls = self.misses + self.uncacheable
+        return {
+            "entries": len(self.entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            # Estimated as one average cached-miss LLM call per hit.
+            "saved_seconds": hits * self.llm_seconds / self.misses if self.misses else 0.0,
+            "llm_calls": llm_calls,
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,82 @@
+from collections import deque
+
+from latency_trace import LatencyMetrics
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer: one per CJK character, one per four other characters."""
+    cjk = sum(1 for c in text if c >= "\u3000")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TranslationContext:
+    """
+    Rolling window of a room's recent (source, translation) pairs, sent
+    ahead of each new line so the LLM can resolve names, omitted subjects
+    and running jokes.
+
+    The window is bounded to `max_tokens` (estimated). It only grows at the
+    end, and when it overflows it is cut back to half the budget in one go,
+    so consecutive requests share a long, unchanged message prefix that
+    provider-side prompt caching can reuse. `max_tokens=0` disables context
+    but still accounts token spend.
+
+    The provider reports each call's usage through `record_call`, which
+    also feeds `metrics` if given.
+    """
+
+    def __init__(self, max_tokens: int = 1500, metrics: LatencyMetrics | None = None):
+        self.max_tokens = max_tokens
+        self.metrics = metrics
+
+        self.pairs: deque[tuple[str, str, int]] = deque()
+        self.tokens = 0
+        self.trims = 0
+
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens > 0
+
+    def add(self, src_text: str, result: str):
+        """Appends a delivered pair, in delivery order."""
+        if not self.enabled:
+            return
+        tokens = estimate_tokens(src_text) + estimate_tokens(result)
+        self.pairs.append((src_text, result, tokens))
+        self.tokens += tokens
+        if self.tokens > self.max_tokens:
+            while self.pairs and self.tokens > self.max_tokens // 2:
+                self.tokens -= self.pairs.popleft()[2]
+            self.trims += 1
+
+    def messages(self) -> list[dict]:
+        """The window as alternating user / assistant chat messages, oldest first."""
+        messages = []
+        for src_text, result, _ in self.pairs:
+            messages.append({"role": "user", "content": src_text})
+            messages.append({"role": "assistant", "content": result})
+        return messages
+
+    def record_call(self, prompt_tokens: int, cached_tokens: int, completion_tokens: int, context_tokens: int):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+        if self.metrics is not None:
+            self.metrics.observe_llm_call(prompt_tokens, cached_tokens, completion_tokens, context_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "window_pairs": len(self.pairs),
+            "window_tokens": self.tokens,
+            "trims": self.trims,
+            "calls": self.calls,
+            "prompt_tokens_per_call": self.prompt_tokens / self.calls if self.calls else 0.0,
+            "cached_prompt_share": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "completion_tokens": self.completion_tokens,
+        }
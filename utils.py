@@ -2,13 +2,37 @@ import soundfile as sf
 import numpy as np
 import io
 
-def np_to_wav(audio: np.ndarray, sampling_rate: int):
-    is_audio_range_valid = np.all(np.logical_and(-1.0 <= audio, audio <= 1.0))
+# name -> (soundfile container format, subtype, mime type, file extension)
+AUDIO_ENCODINGS = {
+    "wav": ("WAV", "PCM_16", "audio/wav", "wav"),
+    "flac": ("FLAC", "PCM_16", "audio/flac", "flac"),
+    "ogg_opus": ("OGG", "OPUS", "audio/ogg", "ogg"),
+    "ogg_vorbis": ("OGG", "VORBIS", "audio/ogg", "ogg"),
+}
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    # Clips to [-1, 1] and scales to int16 without the boolean temporaries of a separate range check.
+    clipped = np.clip(audio, -1.0, 1.0, dtype=np.float32)
+    pcm = np.empty(audio.shape, dtype=np.int16)
+    np.multiply(clipped, 32767.0, out=pcm, casting="unsafe")
+    return pcm
+
 
-    if not is_audio_range_valid:
-        raise ValueError("Audio range must be in [-1, 1]")
-    
-    wav_buffer = io.BytesIO()
-    sf.write(wav_buffer, audio, sampling_rate, format="WAV")
+def encode_audio(audio: np.ndarray, sampling_rate: int, encoding: str = "wav") -> tuple[bytes, str, str]:
+    """
+    Encodes float audio in memory. Samples outside [-1, 1] are clipped.
+    Returns (data, mime type, file name); `encoding` is a key of AUDIO_ENCODINGS.
+    """
+    if encoding not in AUDIO_ENCODINGS:
+        raise ValueError(f"Unknown audio encoding {encoding!r}, expected one of {list(AUDIO_ENCODINGS)}")
+    container, subtype, mime_type, extension = AUDIO_ENCODINGS[encoding]
 
-    return wav_buffer.getvalue()
\ No newline at end of file
+    buffer = io.BytesIO()
+    sf.write(buffer, to_pcm16(audio), sampling_rate, format=container, subtype=subtype)
+
+    return buffer.getvalue(), mime_type, f"audio.{extension}"
+
+
+def np_to_wav(audio: np.ndarray, sampling_rate: int):
+    return encode_audio(audio, sampling_rate, "wav")[0]
\ No newline at end of file